@@ -1,3 +1,9 @@
+from __future__ import annotations  # 型注釈で pandas を import させない（起動高速化）
+
+import time
+import threading
+_STARTUP_T0 = time.perf_counter()  # 起動タイムラインの基準（できるだけ先頭で取る）
+
 import tkinter as tk
 import ctypes
 import sys
@@ -23,16 +29,44 @@ def resource_path(relative_path):
 
 # 3. その他のインポート
 from tkinter import ttk, filedialog, messagebox, colorchooser
-import pandas as pd
-import urllib.parse
 import webbrowser
 import re
 # import os  ← 下の方にあったら削除またはコメントアウト
-import string
 import configparser
 from pathlib import Path
 import logging
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
+
+import aisv_core as core
+from aisv_core import safe_text, get_excel_header, extract_url, display_text
+import aisv_perf
+from aisv_perf import timed
+import aisv_startup
+import aisv_session
+import aisv_journal
+import aisv_profiles
+import aisv_sqlstore
+import aisv_arrowcache
+import aisv_workbook
+import aisv_csv
+
+# pandas / openpyxl は重いので遅延 import（ウィンドウ表示後に別スレッドで先読み）
+pd = aisv_startup.LazyModule("pandas")
+PRELOAD_MODULES = ("pandas", "openpyxl")
+JOURNAL_SYNC_MS = 1000  # 編集ジャーナルを fsync する間隔
+LARGE_MODE_ROWS = 300_000  # これ以上の行数のシートは大容量モード（SQLite）を提案（ini の large_mode_rows、0=提案しない）
+AUTOFIT_SAMPLE_ROWS = 2000  # 大容量モードの列幅自動調整で SQLite から読む行数（全行から等間隔）
+# 大きな表は見えている行・列だけ Treeview に入れ、スクロールで入れ替える
+WINDOW_ROWS_MIN = 2000  # 表示行（見出し行より上を含む）がこれより多ければ行を間引く（大容量モードは常に）
+WINDOW_COLS_MIN = 40    # 列がこれより多ければ列も間引く（行も間引く）
+WINDOW_COL_MARGIN = 2   # 見えている列の右に余分に入れておく列数
+DEFAULT_COL_WIDTH = 150
+OPEN_FILETYPES = [
+    ("Excel / CSV", "*.xlsx *.xls *.csv *.tsv *.txt"),
+    ("Excel files", "*.xlsx *.xls"),
+    ("CSV / TSV", "*.csv *.tsv *.txt"),
+]
+_STARTUP_IMPORTS_DONE = time.perf_counter()
 # =====================
 # ログ設定
 # =====================
@@ -45,43 +79,13 @@ logging.basicConfig(
 # =====================
 # Utility Functions
 # =====================
-def safe_text(v):
-    return "" if pd.isna(v) else str(v)
+# safe_text / get_excel_header / extract_url / display_text は aisv_core から import
 
 def ai_url(text):
-    text = safe_text(text)
-    if text:
-        return f'=HYPERLINK("https://www.perplexity.ai/search?q={urllib.parse.quote(text)}","AI検索")'
-    return ""
+    return core.make_hyperlink_formula(text, core.DEFAULT_AI_TEMPLATE, core.AI_COL)
 
 def google_url(text):
-    text = safe_text(text)
-    if text:
-        return f'=HYPERLINK("https://www.google.com/search?q={urllib.parse.quote(text)}","Google検索")'
-    return ""
-
-def extract_url(v):
-    if isinstance(v, str):
-        m = re.search(r'HYPERLINK\("(.+?)"', v)
-        if m:
-            return m.group(1)
-    return None
-
-def display_text(v):
-    if pd.isna(v):
-        return ""
-    if isinstance(v, str) and v.startswith("=HYPERLINK"):
-        m = re.search(r',"(.+?)"\)', v)
-        if m:
-            return m.group(1)
-    return v
-
-def get_excel_header(col_index):
-    result = ""
-    while col_index > 0:
-        col_index, rem = divmod(col_index - 1, 26)
-        result = string.ascii_uppercase[rem] + result
-    return result
+    return core.make_hyperlink_formula(text, core.DEFAULT_GOOGLE_TEMPLATE, core.GOOGLE_COL)
 
 
 def normalize_row_values(row, ncols: int):
@@ -102,27 +106,33 @@ def normalize_row_values(row, ncols: int):
 # ToolTip Class
 # =====================
 class ToolTip:
-    def __init__(self, widget, text):
+    """widget にマウスを置くと text を出す。bind=False なら呼び出し側が text を入れて show(x, y) する（セルの全文など）。"""
+
+    WRAP_PX = 600  # 長い文は折り返す
+
+    def __init__(self, widget, text, bind: bool = True):
         self.widget = widget
         self.text = text
         self.tip = None
         self.id = None
-        self.widget.bind("<Enter>", self.schedule)
-        self.widget.bind("<Leave>", self.hide)
+        if bind:
+            self.widget.bind("<Enter>", self.schedule)
+            self.widget.bind("<Leave>", self.hide)
 
     def schedule(self, event=None):
         self.id = self.widget.after(500, self.show)
 
-    def show(self):
-        if self.tip:
+    def show(self, x=None, y=None):
+        if self.tip or not self.text:
             return
-        x = self.widget.winfo_rootx() + self.widget.winfo_width()
-        y = self.widget.winfo_rooty() + self.widget.winfo_height()
+        if x is None or y is None:
+            x = self.widget.winfo_rootx() + self.widget.winfo_width()
+            y = self.widget.winfo_rooty() + self.widget.winfo_height()
         self.tip = tw = tk.Toplevel(self.widget)
         tw.wm_overrideredirect(True)
         tw.wm_geometry(f"+{x}+{y}")
         tk.Label(
-            tw, text=self.text, background="#ffffe0",
+            tw, text=self.text, background="#ffffe0", wraplength=self.WRAP_PX,
             relief="solid", borderwidth=1, font=("Segoe UI", 9), justify="left"
         ).pack(ipadx=4, ipady=2)
 
@@ -145,9 +155,8 @@ class ExcelViewerApp:
         self.root.geometry("1400x800")
         self.root.minsize(1100, 650)
 
-        self.current_df: Optional[pd.DataFrame] = None
-        self.raw_df: Optional[pd.DataFrame] = None
-        self.header_row_current: int = int(getattr(self, "header_row_default", 1) or 1)
+        # 文書モデル（raw_df / current_df / 見出し行 / Undo・Redo は aisv_core 側で保持）
+        self.doc = core.SearchDocument()
         self.excel_path: Optional[str] = None
         self.base_col_name: Optional[str] = None
         self.base_col_names: List[str] = []  # 複数検索語句列
@@ -163,10 +172,9 @@ class ExcelViewerApp:
         self._edit_data_index = -1
         self._edit_raw_col = None
 
-        # Undo / Redo / 状態
-        self.undo_stack: List[pd.DataFrame] = []
-        self.redo_stack: List[pd.DataFrame] = []
+        # 状態（Undo / Redo は self.doc.undo_stack / redo_stack）
         self.unsaved_changes = False
+        self._workbook_loss_ok = set()  # 図・書式などが失われても保存してよいと確認した (元ブック, シート)
 
         # ヘッダークリックの遅延ソート制御（ダブルクリックでキャンセルする）
         self._header_click_job = None
@@ -175,12 +183,52 @@ class ExcelViewerApp:
         # フロー改善
         self._onboard_shown = False
         self.op_history: List[str] = []  # 操作履歴（Undo単位）
+        self.perf = aisv_perf.PerfRecorder()  # 処理時間の記録（表示 → パフォーマンス）
+        self._display_cache = core.DisplayCache()  # 列ごとの表示文字列（列が変わるまで再描画で使い回す）
+        # 起動タイムライン（imports → window → pandas_ready → first_row をログへ）
+        self.startup = aisv_startup.StartupTimeline(_STARTUP_T0)
+        self.startup.mark("imports", _STARTUP_IMPORTS_DONE)
+        # 「次の操作をプロファイル」（cProfile・1回だけ。結果はログと同じフォルダ）
+        self.profiler = aisv_perf.ProfileCapture(
+            context_fn=self._perf_context, on_done=self._on_profile_saved
+        )
 
         # config
         self.config_path = os.path.join(os.path.expanduser("~"), ".ai_search_viewer.ini")
+        # 前回セッションのスナップショット（「最後に開いたファイルを自動で開く」が ON の時だけ使う）
+        self.session_path = os.path.join(os.path.dirname(self.config_path), aisv_session.DEFAULT_SNAPSHOT_NAME)
+        # 読み込みプロファイル（ファイル別 / 見出しテンプレート別に見出し行・検索語句列などを記憶）
+        self.profiles = aisv_profiles.ProfileStore(
+            os.path.join(os.path.dirname(self.config_path), aisv_profiles.DEFAULT_PROFILES_NAME)
+        )
+        # 編集ジャーナル（異常終了時の復旧用。保存済み・正常終了なら消える）
+        self.journal = aisv_journal.EditJournal(
+            os.path.join(os.path.dirname(self.config_path), aisv_journal.JOURNAL_DIRNAME)
+        )
+        # 大容量モード（行数の多いシートを SQLite に置いて、見えている行だけ表示する）
+        self.store: Optional[aisv_sqlstore.SqliteSheet] = None
+        self.store_folder = os.path.join(os.path.dirname(self.config_path), aisv_sqlstore.STORE_DIRNAME)
+        # 表示範囲（行・列を間引いて表示するときの先頭と、Treeview に入っていない列の分も含めた列幅）
+        self._window = (False, False)  # (行を間引く, 列を間引く)
+        self._view_top = 0
+        self._col_first = 0
+        self._col_px: List[int] = []
+        self._col_keys: List = []
+        self._col_labels: List[str] = []
+        # 複数シートのブック：シート名の一覧と、開いたことのあるシートの状態（表示中のシート以外）
+        self.sheets: List[str] = []
+        self.sheet_states: dict = {}
+        self._sheet_jobs: dict = {}  # 裏で解析中のシート
+        self._sheet_gen = 0          # 別のファイルを開いたら増やす（古い解析結果を捨てる）
         self.config = configparser.ConfigParser()
         self.confirm_rebuild = True  # 既定：確認あり
         self.load_config()
+        # 解析済みシートのキャッシュ（pyarrow があるときだけ。次回は Excel を解析せず mmap で開く）
+        self.sheet_cache = aisv_arrowcache.SheetCache(
+            os.path.join(os.path.dirname(self.config_path), aisv_arrowcache.CACHE_DIRNAME),
+            max_bytes=int(self.cache_mb) * 1024 * 1024,
+        )
+        self.doc.raw_cache = self.sheet_cache if self.sheet_cache.enabled else None
 
         # --- 表示色の既定値 ---
         if "Colors" not in self.config:
@@ -199,8 +247,67 @@ class ExcelViewerApp:
         self.setup_treeview_style()
         self.setup_menu()
         self.setup_ui()
+        # イベントループ遅延（フリーズ）の計測
+        self.stall_monitor = aisv_perf.StallMonitor(
+            self.perf, stall_ms=int(getattr(self, "stall_threshold_ms", 250) or 250), context_fn=self._perf_context
+        )
+        self.stall_monitor.start(self.root.after)
+        self.root.after_idle(self._on_window_ready)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(JOURNAL_SYNC_MS, self._journal_tick)
         self.root.after(100, self.load_once)
 
+    # ---------------------
+    # 文書モデル（aisv_core.SearchDocument）への委譲
+    # ---------------------
+    @property
+    def raw_df(self) -> Optional[pd.DataFrame]:
+        return self.doc.raw_df
+
+    @raw_df.setter
+    def raw_df(self, value):
+        self.doc.raw_df = value
+
+    @property
+    def current_df(self) -> Optional[pd.DataFrame]:
+        return self.doc.current_df
+
+    @current_df.setter
+    def current_df(self, value):
+        self.doc.set_table(value)
+
+    @property
+    def header_row_current(self) -> int:
+        return self.doc.header_row
+
+    @header_row_current.setter
+    def header_row_current(self, value):
+        self.doc.header_row = int(value or 1)
+
+    @property
+    def undo_stack(self) -> list:
+        store = getattr(self, "store", None)
+        return store.undo_stack if store is not None else self.doc.undo_stack
+
+    @property
+    def redo_stack(self) -> list:
+        store = getattr(self, "store", None)
+        return store.redo_stack if store is not None else self.doc.redo_stack
+
+    def _table_columns(self) -> List[str]:
+        """表示中の表の列（大容量モードは SQLite 側の列 + リンク列）。"""
+        if getattr(self, "store", None) is not None:
+            return self.store.display_columns()
+        return list(self.current_df.columns) if self.current_df is not None else []
+
+    @property
+    def _current_columns(self) -> List[str]:
+        return self.doc.source_columns
+
+    @property
+    def _header_vals_raw(self) -> List[str]:
+        return self.doc.header_vals
+
     # ---------------------
     # Style
     # ---------------------
@@ -246,6 +353,17 @@ class ExcelViewerApp:
         self.link_insert_mode = "fixed2"  # fixed2 / after_base / rightmost
         # Undo 最大数
         self.undo_limit = 20
+        # UIフリーズ検出（この時間以上イベントループが止まったら記録）
+        self.stall_threshold_ms = 250
+        self.large_mode_rows = LARGE_MODE_ROWS
+        # 解析済みシートのキャッシュ（Arrow / 大容量モードの DB）の上限 MB（0=キャッシュしない）
+        self.cache_mb = aisv_arrowcache.MAX_CACHE_MB
+        # 見出し行 / 検索語句列を先頭の数行から自動検出して初期値にする
+        self.auto_detect_layout = True
+        # Parquet / Feather の圧縮（zstd / lz4 / none）
+        self.export_compression = "zstd"
+        # 1セルに表示する最大文字数（超える分は … にしてツールチップで全文。0=制限なし）
+        self.cell_display_chars = core.DISPLAY_MAX_CHARS
         if os.path.exists(self.config_path):
             try:
                 self.config.read(self.config_path, encoding="utf-8")
@@ -288,6 +406,13 @@ class ExcelViewerApp:
                 self.ai_url_template = self.config.get("Settings", "ai_url_template", fallback="https://www.perplexity.ai/search?q={q}")
                 # Undo
                 self.undo_limit = self.config.getint("Settings", "undo_limit", fallback=20)
+                self.stall_threshold_ms = self.config.getint("Settings", "stall_threshold_ms", fallback=250)
+                self.large_mode_rows = self.config.getint("Settings", "large_mode_rows", fallback=LARGE_MODE_ROWS)
+                self.cache_mb = self.config.getint("Settings", "cache_mb", fallback=aisv_arrowcache.MAX_CACHE_MB)
+                self.auto_detect_layout = self.config.getboolean("Settings", "auto_detect_layout", fallback=True)
+                comp = self.config.get("Settings", "export_compression", fallback="zstd").strip().lower()
+                self.export_compression = comp if comp in core.COLUMNAR_COMPRESSIONS else "zstd"
+                self.cell_display_chars = max(0, self.config.getint("Settings", "cell_display_chars", fallback=core.DISPLAY_MAX_CHARS))
             except Exception as e:
                 logging.error(f"Config error: {e}")
     def save_config(self):
@@ -308,6 +433,12 @@ class ExcelViewerApp:
                 s["confirm_rebuild"] = "1" if bool(getattr(self, "confirm_rebuild", False)) else "0"
             if hasattr(self, "preview_rows_default"):
                 s["preview_rows"] = str(getattr(self, "preview_rows_default", 20) or 20)
+            if hasattr(self, "auto_detect_layout"):
+                s["auto_detect_layout"] = "1" if bool(getattr(self, "auto_detect_layout", True)) else "0"
+            if hasattr(self, "export_compression"):
+                s["export_compression"] = str(getattr(self, "export_compression", "zstd") or "zstd")
+            if hasattr(self, "cell_display_chars"):
+                s["cell_display_chars"] = str(int(getattr(self, "cell_display_chars", core.DISPLAY_MAX_CHARS) or 0))
 
             # 起動時
             if hasattr(self, "startup_open_last"):
@@ -348,10 +479,28 @@ class ExcelViewerApp:
         view = tk.Menu(menubar, tearoff=0)
         view.add_command(label="使い方", command=self.show_help_window)
         view.add_command(label="操作履歴", command=self.show_history_window)
+        view.add_command(label="パフォーマンス", command=self.show_perf_window)
+        self.var_profile_next = tk.BooleanVar(value=False)
+        view.add_checkbutton(
+            label="次の操作をプロファイル",
+            variable=self.var_profile_next,
+            command=lambda: self.arm_profiler(bool(self.var_profile_next.get())),
+        )
+        view.add_separator()
+        view.add_command(label="次のシート", accelerator="Ctrl+PgDn", command=lambda: self.next_sheet(1))
+        view.add_command(label="前のシート", accelerator="Ctrl+PgUp", command=lambda: self.next_sheet(-1))
+        self.root.bind("<Control-Next>", lambda e: self.next_sheet(1))
+        self.root.bind("<Control-Prior>", lambda e: self.next_sheet(-1))
+        view.add_separator()
+        view.add_command(label="絞り込み（大容量モード）…", command=self.filter_large_sheet)
         menubar.add_cascade(label="表示", menu=view)
 
         settings_menu = tk.Menu(menubar, tearoff=0)
         settings_menu.add_command(label="環境設定…", command=self.open_settings_dialog)
+        settings_menu.add_separator()
+        settings_menu.add_command(label="このファイルの読み込み設定を忘れる", command=self.forget_load_profile)
+        settings_menu.add_command(label="読み込み設定の記憶をすべて消去", command=self.clear_load_profiles)
+        settings_menu.add_command(label="解析済みシートのキャッシュを消去", command=self.clear_sheet_cache)
         menubar.add_cascade(label="設定", menu=settings_menu)
 
         self.root.config(menu=menubar)
@@ -371,6 +520,7 @@ class ExcelViewerApp:
         var_basecol = tk.IntVar(value=int(getattr(self, "base_col_index_default", 1)))
         var_preview = tk.IntVar(value=int(getattr(self, "preview_rows_default", 20)))
         var_confirm = tk.BooleanVar(value=bool(getattr(self, "confirm_rebuild", True)))
+        var_auto_detect = tk.BooleanVar(value=bool(getattr(self, "auto_detect_layout", True)))
 
         # 起動時の動作
         var_startup_open_last = tk.BooleanVar(value=bool(getattr(self, 'startup_open_last', False)))
@@ -384,6 +534,7 @@ class ExcelViewerApp:
 
         # Undo
         var_undo_limit = tk.IntVar(value=int(getattr(self, 'undo_limit', 20) or 20))
+        var_cell_chars = tk.IntVar(value=int(getattr(self, 'cell_display_chars', core.DISPLAY_MAX_CHARS) or 0))
 
         ttk.Label(frm, text="見出し行（初期値）").grid(row=0, column=0, sticky="w", pady=(0, 6))
         ttk.Spinbox(frm, from_=1, to=1000, width=8, textvariable=var_header).grid(row=0, column=1, sticky="w", pady=(0, 6), padx=(8, 0))
@@ -394,30 +545,37 @@ class ExcelViewerApp:
         ttk.Label(frm, text="プレビュー行数（初期値）").grid(row=2, column=0, sticky="w", pady=(0, 10))
         ttk.Spinbox(frm, from_=5, to=200, width=8, textvariable=var_preview).grid(row=2, column=1, sticky="w", pady=(0, 10), padx=(8, 0))
 
-        ttk.Checkbutton(frm, text="検索語句更新の前に確認する", variable=var_confirm).grid(row=3, column=0, columnspan=2, sticky="w")
+        ttk.Checkbutton(frm, text="見出し行・検索語句列を自動検出して初期値にする", variable=var_auto_detect).grid(row=3, column=0, columnspan=2, sticky="w")
+        ttk.Checkbutton(frm, text="検索語句更新の前に確認する", variable=var_confirm).grid(row=4, column=0, columnspan=2, sticky="w")
 
-        ttk.Separator(frm).grid(row=4, column=0, columnspan=2, sticky='ew', pady=(10, 8))
-        ttk.Label(frm, text='起動時の動作').grid(row=5, column=0, columnspan=2, sticky='w')
-        ttk.Checkbutton(frm, text='最後に開いたファイルを自動で開く', variable=var_startup_open_last).grid(row=6, column=0, columnspan=2, sticky='w')
-        ttk.Checkbutton(frm, text='起動時にファイル選択ダイアログを出す', variable=var_startup_file_dialog).grid(row=7, column=0, columnspan=2, sticky='w')
-        ttk.Checkbutton(frm, text='起動時に読み込み設定ダイアログを必ず出す', variable=var_startup_always_settings).grid(row=8, column=0, columnspan=2, sticky='w')
+        ttk.Separator(frm).grid(row=5, column=0, columnspan=2, sticky='ew', pady=(10, 8))
+        ttk.Label(frm, text='起動時の動作').grid(row=6, column=0, columnspan=2, sticky='w')
+        ttk.Checkbutton(frm, text='最後に開いたファイルを自動で開く', variable=var_startup_open_last).grid(row=7, column=0, columnspan=2, sticky='w')
+        ttk.Checkbutton(frm, text='起動時にファイル選択ダイアログを出す', variable=var_startup_file_dialog).grid(row=8, column=0, columnspan=2, sticky='w')
+        ttk.Checkbutton(frm, text='起動時に読み込み設定ダイアログを必ず出す', variable=var_startup_always_settings).grid(row=9, column=0, columnspan=2, sticky='w')
 
-        ttk.Separator(frm).grid(row=9, column=0, columnspan=2, sticky='ew', pady=(10, 8))
-        ttk.Label(frm, text='検索リンク生成').grid(row=10, column=0, columnspan=2, sticky='w')
-        ttk.Checkbutton(frm, text='AI検索 列を生成', variable=var_gen_ai).grid(row=11, column=0, columnspan=2, sticky='w')
-        ttk.Checkbutton(frm, text='Google検索 列を生成', variable=var_gen_google).grid(row=12, column=0, columnspan=2, sticky='w')
-        ttk.Label(frm, text='挿入位置').grid(row=13, column=0, sticky='w', pady=(6, 0))
+        ttk.Separator(frm).grid(row=10, column=0, columnspan=2, sticky='ew', pady=(10, 8))
+        ttk.Label(frm, text='検索リンク生成').grid(row=11, column=0, columnspan=2, sticky='w')
+        ttk.Checkbutton(frm, text='AI検索 列を生成', variable=var_gen_ai).grid(row=12, column=0, columnspan=2, sticky='w')
+        ttk.Checkbutton(frm, text='Google検索 列を生成', variable=var_gen_google).grid(row=13, column=0, columnspan=2, sticky='w')
+        ttk.Label(frm, text='挿入位置').grid(row=14, column=0, sticky='w', pady=(6, 0))
         cmb_insert = ttk.Combobox(frm, state='readonly', width=22, values=['2列目固定', '検索語句列の右', '一番右'])
         _map = {'fixed2': '2列目固定', 'after_base': '検索語句列の右', 'rightmost': '一番右'}
         cmb_insert.set(_map.get(var_insert_mode.get(), '2列目固定'))
-        cmb_insert.grid(row=13, column=1, sticky='w', padx=(8, 0), pady=(6, 0))
-
-        ttk.Separator(frm).grid(row=14, column=0, columnspan=2, sticky='ew', pady=(10, 8))
-        ttk.Label(frm, text='Undo 最大数').grid(row=15, column=0, sticky='w')
-        ttk.Spinbox(frm, from_=0, to=200, width=8, textvariable=var_undo_limit).grid(row=15, column=1, sticky='w', padx=(8, 0))
+        cmb_insert.grid(row=14, column=1, sticky='w', padx=(8, 0), pady=(6, 0))
+
+        ttk.Separator(frm).grid(row=15, column=0, columnspan=2, sticky='ew', pady=(10, 8))
+        ttk.Label(frm, text='Undo 最大数').grid(row=16, column=0, sticky='w')
+        ttk.Spinbox(frm, from_=0, to=200, width=8, textvariable=var_undo_limit).grid(row=16, column=1, sticky='w', padx=(8, 0))
+        ttk.Label(frm, text='Parquet / Feather の圧縮').grid(row=17, column=0, sticky='w', pady=(6, 0))
+        cmb_comp = ttk.Combobox(frm, state='readonly', width=22, values=list(core.COLUMNAR_COMPRESSIONS))
+        cmb_comp.set(getattr(self, 'export_compression', 'zstd') or 'zstd')
+        cmb_comp.grid(row=17, column=1, sticky='w', padx=(8, 0), pady=(6, 0))
+        ttk.Label(frm, text='1セルに表示する文字数（0=制限なし）').grid(row=18, column=0, sticky='w', pady=(6, 0))
+        ttk.Spinbox(frm, from_=0, to=100000, increment=50, width=8, textvariable=var_cell_chars).grid(row=18, column=1, sticky='w', padx=(8, 0), pady=(6, 0))
 
         btns = ttk.Frame(frm)
-        btns.grid(row=16, column=0, columnspan=2, sticky="e", pady=(12, 0))
+        btns.grid(row=19, column=0, columnspan=2, sticky="e", pady=(12, 0))
 
         def _ok():
             try:
@@ -434,6 +592,7 @@ class ExcelViewerApp:
             self.base_col_index_default = b
             self.preview_rows_default = p
             self.confirm_rebuild = bool(var_confirm.get())
+            self.auto_detect_layout = bool(var_auto_detect.get())
             # 起動時
             self.startup_open_last = bool(var_startup_open_last.get())
             self.startup_show_file_dialog = bool(var_startup_file_dialog.get())
@@ -453,6 +612,14 @@ class ExcelViewerApp:
                 self.undo_limit = int(var_undo_limit.get())
             except Exception:
                 self.undo_limit = 20
+            self.export_compression = cmb_comp.get() or 'zstd'
+            try:
+                chars = max(0, int(var_cell_chars.get()))
+            except Exception:
+                chars = core.DISPLAY_MAX_CHARS
+            if chars != getattr(self, 'cell_display_chars', core.DISPLAY_MAX_CHARS):
+                self.cell_display_chars = chars
+                self._render_window()
             self.save_config()
             dlg.destroy()
 
@@ -512,6 +679,254 @@ class ExcelViewerApp:
 
         ttk.Button(win, text="閉じる", command=win.destroy).pack(pady=6)
 
+    def _on_window_ready(self):
+        """最初のアイドル時（ウィンドウ描画後）。ここから pandas / openpyxl を裏で読み込む。"""
+        t = self.startup.mark("window")
+        self.perf.add("startup_window", t)
+        self.startup.log()
+
+        def _done(sec):
+            self.startup.mark("pandas_ready")
+            logging.info(f"Preloaded: {', '.join(PRELOAD_MODULES)} ({sec:.3f}s)")
+
+        aisv_startup.preload_in_background(PRELOAD_MODULES, on_done=_done)
+
+    def _mark_first_row(self):
+        """起動後はじめて行を表示したとき、描画を待ってから起動タイムラインを確定してログに出す。"""
+        st = getattr(self, "startup", None)
+        if st is None or st.has("first_row"):
+            return
+
+        def _mark():
+            if st.has("first_row"):
+                return
+            t = st.mark("first_row")
+            self.perf.add("startup_first_row", t)
+            st.log()
+
+        try:
+            self.root.after_idle(_mark)
+        except Exception:
+            _mark()
+
+    def _perf_context(self) -> dict:
+        """計測記録に添える現在の文書サイズ。"""
+        df = self.current_df
+        return {
+            "file": os.path.basename(self.excel_path or ""),
+            "rows": int(len(df)) if df is not None else 0,
+            "cols": int(df.shape[1]) if df is not None else 0,
+        }
+
+    def arm_profiler(self, on: bool):
+        """次の操作（読み込み/検索リンク更新/並び替え/保存/列一括編集）を cProfile で1回計測する。"""
+        if on:
+            self.profiler.arm()
+            self.toast("次の操作をプロファイルします（読み込み・リンク更新・並び替え・保存・一括編集）", 2600)
+        else:
+            self.profiler.disarm()
+
+    def _on_profile_saved(self, prof_path: str, txt_path: str):
+        try:
+            self.var_profile_next.set(False)
+        except Exception:
+            pass
+        self.toast(f"プロファイル保存: {os.path.basename(txt_path)}", 3500)
+
+    def set_memory_profiling(self, on: bool):
+        """メモリ計測モード（tracemalloc）の ON/OFF。OFF の間は計測コストなし。"""
+        if on and self.perf.memory is None:
+            prof = aisv_perf.MemoryProfiler(df_fn=lambda: self.current_df)
+            prof.start()
+            self.perf.memory = prof
+            logging.info("Memory profiling: on")
+        elif (not on) and self.perf.memory is not None:
+            self.perf.memory.stop()
+            self.perf.memory = None
+            logging.info("Memory profiling: off")
+
+    def _memory_breakdown(self) -> List[tuple]:
+        """保持しているデータの内訳（項目, 値）。DataFrame は deep 計測。"""
+        fb = aisv_perf.fmt_bytes
+        undo_b = sum(aisv_perf.df_bytes(d) for d in self.undo_stack)
+        redo_b = sum(aisv_perf.df_bytes(d) for d in self.redo_stack)
+        rows = [
+            ("raw_df", fb(aisv_perf.df_bytes(self.raw_df))),
+            ("current_df", fb(aisv_perf.df_bytes(self.current_df))),
+            (f"Undo（{len(self.undo_stack)}件）", fb(undo_b)),
+            (f"Redo（{len(self.redo_stack)}件）", fb(redo_b)),
+        ]
+        try:
+            rows.append(("Treeview 行数", f"{len(self.tree.get_children()):,}"))
+            rows.append(("Treeview 列数", f"{len(self.tree['columns']):,}"))
+        except Exception:
+            pass
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            cur, peak = tracemalloc.get_traced_memory()
+            rows.append(("tracemalloc 現在 / ピーク", f"{fb(cur)} / {fb(peak)}"))
+        return rows
+
+    def show_perf_window(self):
+        """処理時間（直近の記録と操作ごとのパーセンタイル）・UI応答（フリーズ）・メモリを表示する。"""
+        win = tk.Toplevel(self.root)
+        win.title("パフォーマンス")
+        win.geometry("780x560")
+
+        nb = ttk.Notebook(win)
+        nb.pack(fill="both", expand=True, padx=8, pady=(8, 0))
+
+        # --- 処理時間 ---
+        tab_ops = ttk.Frame(nb)
+        nb.add(tab_ops, text="処理時間")
+
+        tk.Label(tab_ops, text="操作ごとの集計（秒）").pack(anchor="w", padx=4, pady=(6, 2))
+        sum_cols = ("name", "count", "last", "p50", "p90", "p99", "max", "rows", "cols")
+        sum_heads = ("操作", "回数", "直近", "p50", "p90", "p99", "最大", "行", "列")
+        tv_sum = ttk.Treeview(tab_ops, columns=sum_cols, show="headings", height=8)
+        for c, h in zip(sum_cols, sum_heads):
+            tv_sum.heading(c, text=h)
+            tv_sum.column(c, width=140 if c == "name" else 70, anchor="w" if c == "name" else "e")
+        tv_sum.pack(fill="x", padx=4)
+
+        tk.Label(tab_ops, text="直近の記録（新しい順）").pack(anchor="w", padx=4, pady=(10, 2))
+        rec_cols = ("time", "name", "seconds", "rows", "cols", "detail")
+        rec_heads = ("時刻", "操作", "秒", "行", "列", "詳細")
+        frm = ttk.Frame(tab_ops)
+        frm.pack(fill="both", expand=True, padx=4)
+        tv_rec = ttk.Treeview(frm, columns=rec_cols, show="headings")
+        sb = ttk.Scrollbar(frm, orient="vertical", command=tv_rec.yview)
+        tv_rec.configure(yscrollcommand=sb.set)
+        for c, h in zip(rec_cols, rec_heads):
+            tv_rec.heading(c, text=h)
+            tv_rec.column(c, width=220 if c == "detail" else (140 if c == "name" else 80),
+                          anchor="e" if c in ("seconds", "rows", "cols") else "w")
+        tv_rec.pack(side="left", fill="both", expand=True)
+        sb.pack(side="right", fill="y")
+
+        # --- UI応答（フリーズ） ---
+        tab_ui = ttk.Frame(nb)
+        nb.add(tab_ui, text="UI応答（フリーズ）")
+
+        lbl_ui = tk.Label(tab_ui, text="", justify="left", anchor="w")
+        lbl_ui.pack(fill="x", padx=4, pady=(6, 2))
+        tv_hist = ttk.Treeview(tab_ui, columns=("range", "count"), show="headings", height=10)
+        tv_hist.heading("range", text="遅延(ms)")
+        tv_hist.heading("count", text="回数")
+        tv_hist.column("range", width=120, anchor="w")
+        tv_hist.column("count", width=80, anchor="e")
+        tv_hist.pack(anchor="w", padx=4)
+
+        tk.Label(tab_ui, text="フリーズの記録（新しい順）").pack(anchor="w", padx=4, pady=(10, 2))
+        st_cols = ("time", "lag", "ops", "rows", "cols")
+        st_heads = ("時刻", "遅延(ms)", "その間の操作", "行", "列")
+        tv_st = ttk.Treeview(tab_ui, columns=st_cols, show="headings")
+        for c, h in zip(st_cols, st_heads):
+            tv_st.heading(c, text=h)
+            tv_st.column(c, width=300 if c == "ops" else 110, anchor="w" if c in ("time", "ops") else "e")
+        tv_st.pack(fill="both", expand=True, padx=4)
+
+        # --- メモリ ---
+        tab_mem = ttk.Frame(nb)
+        nb.add(tab_mem, text="メモリ")
+
+        var_mem = tk.BooleanVar(value=self.perf.memory is not None)
+        ttk.Checkbutton(
+            tab_mem, text="メモリ計測モード（tracemalloc。ON の間は処理が遅くなります）", variable=var_mem,
+            command=lambda: (self.set_memory_profiling(bool(var_mem.get())), refresh()),
+        ).pack(anchor="w", padx=4, pady=(6, 2))
+
+        mem_cols = ("name", "count", "peak_max", "peak_last", "retained", "df_delta", "top")
+        mem_heads = ("操作", "回数", "ピーク(最大)", "ピーク(直近)", "残留(直近)", "DataFrame増減", "増えた場所（直近）")
+        tv_mem = ttk.Treeview(tab_mem, columns=mem_cols, show="headings", height=9)
+        for c, h in zip(mem_cols, mem_heads):
+            tv_mem.heading(c, text=h)
+            tv_mem.column(c, width=260 if c == "top" else (120 if c == "name" else 90),
+                          anchor="w" if c in ("name", "top") else "e")
+        tv_mem.pack(fill="x", padx=4)
+
+        tk.Label(tab_mem, text="保持しているデータの内訳（Undo/Redo は共有している文字列も各々に計上）").pack(
+            anchor="w", padx=4, pady=(10, 2))
+        tv_bd = ttk.Treeview(tab_mem, columns=("item", "value"), show="headings", height=8)
+        tv_bd.heading("item", text="項目")
+        tv_bd.heading("value", text="サイズ / 件数")
+        tv_bd.column("item", width=220, anchor="w")
+        tv_bd.column("value", width=180, anchor="e")
+        tv_bd.pack(anchor="w", padx=4)
+
+        def measure_breakdown():
+            tv_bd.delete(*tv_bd.get_children())
+            for item, value in self._memory_breakdown():
+                tv_bd.insert("", "end", values=(item, value))
+
+        ttk.Button(tab_mem, text="内訳を計測", command=measure_breakdown).pack(anchor="w", padx=4, pady=6)
+
+        def _fmt(v):
+            return "" if v is None else v
+
+        def refresh():
+            tv_sum.delete(*tv_sum.get_children())
+            for d in self.perf.summary():
+                tv_sum.insert("", "end", values=(
+                    d["name"], d["count"], f"{d['last']:.3f}", f"{d['p50']:.3f}", f"{d['p90']:.3f}",
+                    f"{d['p99']:.3f}", f"{d['max']:.3f}", _fmt(d["rows"]), _fmt(d["cols"]),
+                ))
+            tv_rec.delete(*tv_rec.get_children())
+            for r in reversed(self.perf.recent(300)):
+                tv_rec.insert("", "end", values=(
+                    r["time"], r["name"] + ("" if r["ok"] else " (失敗)"), f"{r['seconds']:.3f}",
+                    _fmt(r["rows"]), _fmt(r["cols"]), r["detail"],
+                ))
+
+            mon = self.stall_monitor
+            sm = mon.summary()
+            lbl_ui.config(text=(
+                f"ハートビート {sm['interval_ms']}ms ごと / フリーズ判定 {sm['stall_ms']}ms 以上\n"
+                f"計測 {sm['beats']} 回　フリーズ {sm['stalls']} 回　"
+                f"遅延 p50 {sm['p50_lag_ms']}ms / p99 {sm['p99_lag_ms']}ms / 最大 {sm['max_lag_ms']}ms"
+            ))
+            tv_hist.delete(*tv_hist.get_children())
+            for h in mon.histogram():
+                tv_hist.insert("", "end", values=(h["range_ms"], h["count"]))
+            tv_st.delete(*tv_st.get_children())
+            for st in reversed(list(mon.stalls)):
+                ops = ", ".join(o["name"] for o in st["ops"]) or "-"
+                tv_st.insert("", "end", values=(st["time"], st["lag_ms"], ops, st.get("rows", ""), st.get("cols", "")))
+
+            fb = aisv_perf.fmt_bytes
+            tv_mem.delete(*tv_mem.get_children())
+            for d in self.perf.memory_summary():
+                tv_mem.insert("", "end", values=(
+                    d["name"], d["count"], fb(d["peak_max"]), fb(d["peak_last"]), fb(d["retained_last"]),
+                    fb(d["df_delta_last"]), " / ".join(d["top"]),
+                ))
+
+        def clear():
+            self.perf.clear()
+            self.stall_monitor.reset()
+            refresh()
+
+        def export():
+            path = filedialog.asksaveasfilename(
+                parent=win, title="パフォーマンス記録をJSONで保存", defaultextension=".json",
+                initialfile="ai_search_viewer_perf.json", filetypes=[("JSON", "*.json")],
+            )
+            if not path:
+                return
+            try:
+                self.stall_monitor.export_json(path, extra={"operations": self.perf.summary()})
+                self.toast(f"保存しました: {os.path.basename(path)}", 2000)
+            except Exception as e:
+                messagebox.showerror("保存", f"保存に失敗しました: {e}", parent=win)
+
+        btns = ttk.Frame(win)
+        btns.pack(fill="x", padx=8, pady=8)
+        ttk.Button(btns, text="閉じる", command=win.destroy).pack(side="right")
+        ttk.Button(btns, text="クリア", command=clear).pack(side="right", padx=(0, 6))
+        ttk.Button(btns, text="更新", command=refresh).pack(side="right", padx=(0, 6))
+        ttk.Button(btns, text="JSON書き出し…", command=export).pack(side="left")
+        refresh()
+
     def _log_action(self, text: str):
         self.op_history.append(text)
         if len(self.op_history) > 500:
@@ -521,26 +936,21 @@ class ExcelViewerApp:
     # Undo/Redo helpers（A案）
     # ---------------------
     def _df_changed(self, before: pd.DataFrame, after: pd.DataFrame) -> bool:
-        try:
-            return not before.equals(after)
-        except Exception:
-            return True
-
-    def commit_df(self, before: pd.DataFrame, after: pd.DataFrame, action: str, *, refresh_view=True) -> bool:
-        """変更があった時だけ Undo積む/Redoクリア/未保存ON。"""
-        if not self._df_changed(before, after):
+        return core.df_changed(before, after)
+
+    def commit_df(self, before: pd.DataFrame, after: pd.DataFrame, action: str, *, refresh_view=True,
+                  links: Optional[Dict[str, str]] = None) -> bool:
+        """変更があった時だけ Undo積む/Redoクリア/未保存ON。links はリンク列を作り直したときだけ渡す。"""
+        self.doc.undo_limit = int(getattr(self, 'undo_limit', 20) or 20)
+        with self.perf.span("commit", shape_fn=lambda: after) as sp:
+            sp.detail = action
+            changed = self.doc.commit(before, after, links=links)
+        if not changed:
             if refresh_view:
-                self.current_df = after
                 self.show_dataframe(self.current_df)
             self.update_undo_redo_buttons()
             return False
 
-        self.undo_stack.append(before.copy())
-        if len(self.undo_stack) > int(getattr(self, 'undo_limit', 20) or 20):
-            self.undo_stack.pop(0)
-
-        self.redo_stack.clear()
-        self.current_df = after
         if refresh_view:
             self.show_dataframe(self.current_df)
 
@@ -554,23 +964,31 @@ class ExcelViewerApp:
         self.btn_redo.config(state="normal" if len(self.redo_stack) > 0 else "disabled")
 
     def undo(self):
-        if not self.undo_stack or self.current_df is None:
+        if self.store is not None:
+            self._store_undo_redo(redo=False)
+            return
+        with self.perf.span("undo"):
+            ok = self.doc.undo()
+        if not ok:
             return
-        self.redo_stack.append(self.current_df.copy())
-        self.current_df = self.undo_stack.pop()
         self.show_dataframe(self.current_df)
         self.set_unsaved(True)
         self.update_undo_redo_buttons()
+        self._journal("undo")
         self._log_action("Undo")
 
     def redo(self):
-        if not self.redo_stack or self.current_df is None:
+        if self.store is not None:
+            self._store_undo_redo(redo=True)
+            return
+        with self.perf.span("redo"):
+            ok = self.doc.redo()
+        if not ok:
             return
-        self.undo_stack.append(self.current_df.copy())
-        self.current_df = self.redo_stack.pop()
         self.show_dataframe(self.current_df)
         self.set_unsaved(True)
         self.update_undo_redo_buttons()
+        self._journal("redo")
         self._log_action("Redo")
 
     # ---------------------
@@ -652,7 +1070,7 @@ class ExcelViewerApp:
             textvariable=self.save_mode_var,
             state="readonly",
             width=18,
-            values=("元ファイルをコピー", "別名で保存", "CSV")
+            values=("元ファイルをコピー", "別名で保存", "CSV", "Parquet", "Feather")
         )
         # 右側に配置（上書き保存ボタンは一番右）
         self.save_mode_combo.pack(side="right", padx=5)
@@ -666,6 +1084,8 @@ class ExcelViewerApp:
                 self.save_as_new()
             elif mode == "CSV":
                 self.save_as_csv()
+            elif mode in ("Parquet", "Feather"):
+                self.export_columnar(mode.lower())
 
         self.btn_save = ttk.Button(top, text="保存", command=_do_save_selected)
         self.btn_save.pack(side="right", padx=5)
@@ -716,15 +1136,26 @@ class ExcelViewerApp:
         self.status_msg = tk.Label(status, text="", fg="gray", anchor="w")
         self.status_msg.pack(side="right", padx=12)
 
+        # シート見出し（複数シートのブックのときだけ表示）
+        self._build_sheet_bar()
+
         # Treeviewイベント
         self.tree.bind("<Button-1>", self.on_header_click)
         self.tree.bind("<Double-1>", self.on_double_click)
         self.tree.bind("<Button-3>", self.on_header_right_click)
+        # 表示を … で切ったセルは、マウスを置くと全文をツールチップで出す
+        self._cell_tip = ToolTip(self.tree, "", bind=False)
+        self._cell_tip_at = None
+        self.tree.bind("<Motion>", self._on_tree_motion, add="+")
+        self.tree.bind("<Leave>", lambda e: self._hide_cell_tip(), add="+")
 
     # ---------------------
     # Status / Toast
     # ---------------------
     def update_status_bar(self):
+        if self.store is not None:
+            self._store_status_bar()
+            return
         if self.current_df is None:
             self.status_left.config(text="")
             self.status_mid.config(text="")
@@ -732,7 +1163,10 @@ class ExcelViewerApp:
             return
         rows = len(self.current_df)
         cols = len(self.current_df.columns)
-        self.status_left.config(text=f"{rows} rows | {cols} cols")
+        text = f"{rows} rows | {cols} cols"
+        if self.doc.usecols:
+            text += f" | 読込列: {core.format_column_spec(self.doc.usecols)}"
+        self.status_left.config(text=text)
         cols = getattr(self, "base_col_names", [])
         if not cols and self.base_col_name:
             cols = [self.base_col_name]
@@ -755,9 +1189,10 @@ class ExcelViewerApp:
     # ---------------------
     def load_excel(self, path):
         try:
-            self.raw_df = pd.read_excel(path, header=None, dtype=str, engine="openpyxl")
-            self.header_row_current = int(getattr(self, "header_row_default", 1) or 1)
-            self._build_current_df_from_raw()
+            with self.profiler.capture("load"), \
+                    self.perf.span("load", shape_fn=lambda: self.current_df) as sp:
+                sp.detail = os.path.basename(path)
+                self.doc.load(path, int(getattr(self, "header_row_default", 1) or 1))
             logging.info(f"Loaded: {path}")
         except Exception as e:
             messagebox.showerror("エラー", f"読み込み失敗: {e}")
@@ -765,8 +1200,14 @@ class ExcelViewerApp:
             self.current_df = None
 
     def _reset_for_new_file(self):
-        self.undo_stack.clear()
-        self.redo_stack.clear()
+        self._close_store()
+        self._reset_view_position()
+        self._init_sheets(self.excel_path)
+        self.doc.clear_history()
+        journal = getattr(self, "journal", None)
+        if journal is not None and self.excel_path:
+            journal.begin(self.excel_path, self.doc.source_sig, self.header_row_current, self.doc.usecols,
+                          self.doc.sheet_name)
         self.set_unsaved(False)
         self.sorted_col = None
         self._onboard_shown = False
@@ -774,114 +1215,81 @@ class ExcelViewerApp:
         self.update_undo_redo_buttons()
 
     
+    @timed("header_rebuild")
     def _build_current_df_from_raw(self):
         """raw_df(全行)と header_row_current から current_df(ヘッダ下の表)を作る。"""
-        if self.raw_df is None:
-            self.current_df = None
-            return
-        hr = int(getattr(self, "header_row_current", 1) or 1)
-        hr = max(1, hr)
-        hdr_r = hr - 1
-        if hdr_r >= len(self.raw_df):
-            hdr_r = max(0, len(self.raw_df) - 1)
-        ncols = int(self.raw_df.shape[1] or 0)
-        header_vals = []
-        if ncols > 0:
-            header_vals = ["" if pd.isna(v) else str(v) for v in self.raw_df.iloc[hdr_r].tolist()]
-            if len(header_vals) < ncols:
-                header_vals += [""] * (ncols - len(header_vals))
-            header_vals = header_vals[:ncols]
-        # 空ヘッダは Excel列名で補う
-        cols = []
-        for i, v in enumerate(header_vals):
-            name = (v or "").strip()
-            if not name:
-                name = f"列{get_excel_header(i+1)}"
-            cols.append(name)
-        # 重複ヘッダはサフィックスで回避
-        seen = {}
-        uniq = []
-        for c in cols:
-            if c not in seen:
-                seen[c] = 1
-                uniq.append(c)
-            else:
-                seen[c] += 1
-                uniq.append(f"{c}_{seen[c]}")
-        data = self.raw_df.iloc[hdr_r+1:].copy()
-        data.columns = uniq[:data.shape[1]]
-        data = data.fillna("").astype(str)
-        self.current_df = data.reset_index(drop=True)
-
-        # 現在のヘッダ名（表示・選択用に保存）
-        self._header_vals_raw = header_vals
-        self._current_columns = list(self.current_df.columns)
+        self.doc.rebuild_table()
 
     def _compose_output_raw(self) -> pd.DataFrame:
         """raw_df(上部+ヘッダ行) + current_df(データ) から保存用の DataFrame を作る（header=Noneで書く）。"""
-        if self.raw_df is None:
-            return pd.DataFrame()
-        hr = int(getattr(self, "header_row_current", 1) or 1)
-        hr = max(1, hr)
-        hdr_r = hr - 1
-        hdr_r = min(hdr_r, max(0, len(self.raw_df)-1))
-        pre = self.raw_df.iloc[:hdr_r].copy()
-        header_row = self.raw_df.iloc[[hdr_r]].copy()
+        return self.doc.compose_output()
 
-        # current_df の列数に合わせて列を拡張（リンク列追加のため）
-        base_n = int(self.raw_df.shape[1] or 0)
-        cur = self.current_df.copy() if self.current_df is not None else pd.DataFrame()
-        # 保存は「表示の列順」を優先（current_df列順）
-        cur_cols = list(cur.columns)
-        # ヘッダ行（Excel上）は current_df の列名を反映
-        # rawのヘッダ行を current_df 列数に合わせて再構築
-        out_cols_n = max(base_n, len(cur_cols))
-        # pre/headerの列数も合わせる
-        def _pad_df(df, n):
-            if df.shape[1] < n:
-                for k in range(df.shape[1], n):
-                    df[k] = ""
-            return df.iloc[:, :n]
-        pre = _pad_df(pre.reset_index(drop=True), out_cols_n)
-        header_row = _pad_df(header_row.reset_index(drop=True), out_cols_n)
-
-        # ヘッダ行を更新（リンク列もここに入れる）
-        for i in range(out_cols_n):
-            header_row.iat[0, i] = cur_cols[i] if i < len(cur_cols) else ("" if i >= base_n else header_row.iat[0, i])
-
-        # データ行を current_df から作る（列数 out_cols_n に揃える）
-        data_rows = []
-        if len(cur) > 0:
-            for _, r in cur.iterrows():
-                row = [r.get(c, "") for c in cur_cols]
-                if len(row) < out_cols_n:
-                    row += [""] * (out_cols_n - len(row))
-                data_rows.append(row[:out_cols_n])
-        data_df = pd.DataFrame(data_rows)
-
-        out = pd.concat([pre, header_row, data_df], ignore_index=True)
-        out = out.fillna("").astype(str)
-        return out
+    def _write_output(self, path: str, sp=None):
+        """今の表を path（xlsx / csv）に書き出す。大容量モードは SQLite から1行ずつ書く。
+        複数シートのブックを xlsx に保存する場合は、開いたシートを書き、開いていないシートは元のまま残す。
+        """
+        if self._writes_workbook(path):
+            n = self._write_workbook(path)
+            if sp is not None:
+                sp.rows, sp.cols = n, len(self._table_columns())
+            return
+        if self.store is not None:
+            def progress(n):
+                self.status_msg.config(text=f"保存中… {n:,} 行")
+                self.root.update_idletasks()
+            n = self.store.save(path, progress=progress, fmt=self._text_output_format(path))
+            if sp is not None:
+                sp.rows, sp.cols = n, len(self.store.display_columns())
+            return
+        out_df = self._compose_output_raw()
+        if sp is not None:
+            sp.shape(out_df)
+        core.write_output(out_df, path, self._text_output_format(path))
+
+    def _text_output_format(self, path: str):
+        """CSV / TSV に書くときの (文字コード, 区切り)。元ファイルと同じ拡張子なら元ファイルの形式のまま。"""
+        if not aisv_csv.is_text_table(path):
+            return None
+        return aisv_csv.output_format(path, getattr(self, "excel_path", None))
+
+    def _mark_saved(self, path: str):
+        if self.store is not None:
+            self.store.mark_saved(path)
+        else:
+            self.doc.mark_saved(path)
+        if self._writes_workbook(path):
+            for st in self.sheet_states.values():
+                st["doc"].mark_saved(path)
 
     def load_once(self):
         # 起動直後の動作（環境設定で切替）
         path = None
 
-        # 1) 最後に開いたファイルを開く
+        # 0) 前回が異常終了で未保存の編集が残っていれば、再適用するか確認
+        if self._offer_journal_recovery():
+            return
+
+        # 1) 最後に開いたファイルを開く（元ファイルが変わっていなければスナップショットから復元）
         if getattr(self, "startup_open_last", False):
             cand = getattr(self, "last_file", "") or ""
             if cand and os.path.exists(cand):
+                if self._restore_session(cand):
+                    return
                 path = cand
 
         # 2) ファイル選択ダイアログ
         if path is None and getattr(self, "startup_show_file_dialog", True):
-            path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx *.xls")])
+            path = filedialog.askopenfilename(filetypes=OPEN_FILETYPES)
 
         # 3) 何も無ければ終了
         if not path:
             self.root.destroy()
             return
 
+        # 記憶した読み込み設定（ファイル別/テンプレート別）があればダイアログなしで開く
+        if self._load_with_profile(path, first_time=True):
+            return
+
         # 起動時に読み込み設定ダイアログを必ず出すか？
         if getattr(self, "startup_always_show_load_settings", True):
             self._load_excel_with_dialog(path, first_time=True, force_select_base=False)
@@ -891,16 +1299,1099 @@ class ExcelViewerApp:
                 # 失敗したら従来方式で救済
                 self._load_excel_with_dialog(path, first_time=True, force_select_base=False)
 
+    # ---------------------
+    # 読み込みプロファイル（ファイル別 / 見出しテンプレート別）
+    # ---------------------
+    def _load_with_profile(self, path: str, *, first_time: bool = False) -> bool:
+        """記憶した設定で読み込む（ダイアログなし）。該当なし・合わない場合は False。"""
+        try:
+            prof = self.profiles.find(path)
+        except Exception as e:
+            logging.warning(f"Profile lookup failed: {e}")
+            prof = None
+        if not prof or self._is_large_sheet(path):
+            return False
+
+        header_row = int(prof.get("header_row") or 1)
+        # 別の文書に読み込み、設定が合うと分かってから差し替える
+        # （合わなければ今の文書・ファイル・ジャーナルはそのまま。呼び出し側は読み込み設定ダイアログに進む）
+        doc = self._new_document()
+        try:
+            with self.profiler.capture("load"), \
+                    self.perf.span("load", shape_fn=lambda: doc.current_df) as sp:
+                sp.detail = os.path.basename(path)
+                doc.load(path, header_row, usecols=prof.get("usecols"))
+        except Exception as e:
+            logging.warning(f"Profile load failed: {path}: {e}")
+            return False
+        cols = [c for c in (prof.get("base_col_names") or []) if doc.current_df is not None and c in doc.current_df.columns]
+        if not cols:
+            logging.info(f"Profile does not fit, asking for load settings: {path}")
+            return False
+
+        self.doc = doc
+        self.excel_path = path
+        self.last_file = path
+        self._reset_for_new_file()
+        self.base_col_names = cols
+        self.base_col_name = cols[0]
+        self.base_joiner = prof.get("base_joiner", getattr(self, "base_joiner", " "))
+        for key in ("generate_ai", "generate_google", "ai_url_template", "link_insert_mode"):
+            if key in prof:
+                setattr(self, key, prof[key])
+        self.save_config()
+        logging.info(f"Loaded with profile ({prof.get('match')}): {path} (header_row={header_row}, cols={cols})")
+
+        missing_links = (core.AI_COL not in self.current_df.columns) or (core.GOOGLE_COL not in self.current_df.columns)
+        if missing_links:
+            self.rebuild_search_columns(confirm=False)
+        else:
+            self.show_dataframe(self.current_df)
+        self._apply_column_widths(prof.get("col_widths") or {})
+        self.update_status_bar()
+        where = "このファイル" if prof.get("match") == "file" else f"同じ見出しのファイル（{prof.get('example', '')}）"
+        self.toast(f"{where}の読み込み設定を使いました（見出し行 {header_row}）", 2600)
+        return True
+
+    def _column_widths_by_name(self) -> dict:
+        out = {}
+        if self.current_df is None:
+            return out
+        names = list(self.current_df.columns)
+        for i, w in enumerate(self._col_widths()[: len(names)]):
+            out[str(names[i])] = int(w)
+        return out
+
+    def _apply_column_widths(self, widths: dict):
+        if not widths or self.current_df is None:
+            return
+        names = [str(c) for c in self.current_df.columns]
+        out = {}
+        for i, name in enumerate(names):
+            try:
+                if name in widths:
+                    out[i] = int(widths[name])
+            except (TypeError, ValueError):
+                pass
+        self._set_col_widths(out)
+
+    def _remember_load_profile(self):
+        """今のファイルの見出し行・検索語句列・リンク設定・列幅を記憶する。"""
+        if not self.excel_path or self.current_df is None or not getattr(self, "base_col_names", None):
+            return
+        settings = {
+            "header_row": self.header_row_current,
+            "usecols": list(self.doc.usecols) if self.doc.usecols else None,
+            "base_col_names": list(self.base_col_names),
+            "base_joiner": getattr(self, "base_joiner", " "),
+            "generate_ai": bool(getattr(self, "generate_ai", True)),
+            "generate_google": bool(getattr(self, "generate_google", True)),
+            "ai_url_template": getattr(self, "ai_url_template", core.DEFAULT_AI_TEMPLATE),
+            "link_insert_mode": getattr(self, "link_insert_mode", "fixed2"),
+            "col_widths": self._column_widths_by_name(),
+        }
+        try:
+            self.profiles.remember(self.excel_path, self.raw_df, settings, self.doc.sheet_name)
+            self.profiles.save()
+        except Exception as e:
+            logging.warning(f"Profile save failed: {e}")
+
+    def forget_load_profile(self):
+        if not self.excel_path:
+            return
+        self.profiles.forget(self.excel_path, self.raw_df, self.header_row_current, self.doc.usecols,
+                             self.doc.sheet_name)
+        self.profiles.save()
+        self.toast("このファイルの読み込み設定を忘れました（次回はダイアログを表示）", 2400)
+
+    def clear_load_profiles(self):
+        if not messagebox.askyesno("確認", "記憶した読み込み設定（ファイル別・テンプレート別）をすべて消去しますか？"):
+            return
+        self.profiles.clear()
+        self.profiles.save()
+        self.toast("読み込み設定の記憶を消去しました。", 2000)
+
+    def clear_sheet_cache(self):
+        """解析済みシートのキャッシュ（Arrow）と、未保存の編集が無い大容量モードの DB を消す。"""
+        if not messagebox.askyesno("確認", "解析済みシートのキャッシュを消去しますか？\n（次に開くときは Excel を解析し直します）"):
+            return
+        n = self.sheet_cache.clear()
+        keep = [self.store.db_path] if self.store is not None else []
+        n += aisv_sqlstore.prune_stores(self.store_folder, 0, keep=keep)
+        self.toast(f"キャッシュを消去しました（{n} 件）。", 2000)
+
+    # ---------------------
+    # 編集ジャーナル（異常終了からの復旧）
+    # ---------------------
+    def _journal(self, op: str, **fields):
+        """確定した操作をジャーナルに追記（失敗しても編集は止めない）。"""
+        journal = getattr(self, "journal", None)
+        if journal is None:
+            return
+        try:
+            journal.append(op, **fields)
+        except Exception as e:
+            logging.warning(f"Journal append failed: {e}")
+
+    def _journal_tick(self):
+        try:
+            self.journal.sync()
+        except Exception:
+            pass
+        self.root.after(JOURNAL_SYNC_MS, self._journal_tick)
+
+    def _offer_journal_recovery(self) -> bool:
+        """残っているジャーナルがあれば再適用を提案する。復旧して表示したら True。"""
+        pending = aisv_journal.pending_journals(self.journal.folder)
+        if not pending:
+            return False
+        jpath, header, records = pending[0]
+        src = header.get("path") or ""
+        # 同じブックの他のシートのジャーナルは一緒に復旧する。別のファイルのものは捨てる
+        same = [p for p in pending[1:] if p[1].get("path") == src]
+        for other, h, _ in pending[1:]:
+            if h.get("path") != src:
+                aisv_journal.discard(other)
+
+        if not os.path.exists(src):
+            messagebox.showwarning("復旧", f"未保存の編集が残っていましたが、元ファイルが見つかりません。\n{src}")
+            for p in [pending[0]] + same:
+                aisv_journal.discard(p[0])
+            return False
+        total = len(records) + sum(len(p[2]) for p in same)
+        where = os.path.basename(src) + (f"（{len(same) + 1} シート）" if same else "")
+        msg = (
+            f"前回は正常に終了しませんでした。\n{where} に未保存の編集が {total} 件あります。\n\n"
+            "元のファイルに再適用しますか？（いいえ：破棄）"
+        )
+        sig = core.file_signature(src)
+        if header.get("sig") and sig is not None and list(sig) != list(header["sig"]):
+            msg += "\n\n※ 元ファイルはその後に変更されています。結果が異なる場合があります。"
+        if not messagebox.askyesno("復旧", msg):
+            for p in [pending[0]] + same:
+                aisv_journal.discard(p[0])
+            return False
+
+        header_row = int(header.get("header_row") or 1)
+        try:
+            with self.perf.span("journal_replay", shape_fn=lambda: self.current_df) as sp:
+                sp.detail = os.path.basename(src)
+                self.doc.load(src, header_row, usecols=header.get("usecols"), sheet_name=header.get("sheet"))
+                self.excel_path = src
+                self.last_file = src
+                self._reset_for_new_file()  # ジャーナルを作り直す（下で同じ記録を書き直す）
+                self.doc.undo_limit = int(getattr(self, 'undo_limit', 20) or 20)
+                n = aisv_journal.replay(self.doc, records)
+                for rec in records:
+                    rec = dict(rec)
+                    self._journal(rec.pop("op"), **rec)
+                for _, h, recs in same:
+                    n += self._recover_sheet_journal(src, h, recs)
+        except Exception as e:
+            messagebox.showerror("復旧", f"再適用に失敗しました: {e}")
+            return False
+
+        links = [r for r in records if r.get("op") == "links"]
+        if links:
+            self.base_col_names = list(links[-1].get("base_cols") or [])
+            self.base_col_name = links[-1].get("anchor_col") or (self.base_col_names[0] if self.base_col_names else None)
+        elif self.current_df is not None and len(self.current_df.columns):
+            self.base_col_name = str(self.current_df.columns[0])
+            self.base_col_names = [self.base_col_name]
+        self.save_config()
+        self.show_dataframe(self.current_df)
+        self.set_unsaved(True)
+        self.update_undo_redo_buttons()
+        self.update_status_bar()
+        self._render_sheet_tabs()
+        self._log_action(f"復旧: {n}件の編集を再適用")
+        logging.info(f"Journal replayed: {src} ({n}/{total} ops)")
+        self.toast(f"未保存の編集 {n} 件を再適用しました（まだ保存されていません）", 3200)
+        return True
+
+    def _recover_sheet_journal(self, src: str, header: dict, records: list) -> int:
+        """表示中以外のシートのジャーナルを再適用し、そのシートの状態として裏に置く。適用した件数を返す。"""
+        sheet = header.get("sheet")
+        name = sheet if sheet is not None else (self.sheets[0] if self.sheets else None)
+        if name not in self.sheets or name == self.active_sheet:
+            return 0
+        doc = self._new_document()
+        doc.load(src, int(header.get("header_row") or 1), usecols=header.get("usecols"), sheet_name=sheet)
+        n = aisv_journal.replay(doc, records)
+        journal = aisv_journal.EditJournal(self.journal.folder)
+        journal.begin(src, doc.source_sig, doc.header_row, doc.usecols, sheet)
+        for rec in records:
+            rec = dict(rec)
+            journal.append(rec.pop("op"), **rec)
+        links = [r for r in records if r.get("op") == "links"]
+        cols = list(links[-1].get("base_cols") or []) if links else []
+        self.sheet_states[name] = {
+            "doc": doc,
+            "journal": journal,
+            "base_col_name": (links[-1].get("anchor_col") if links else None) or (cols[0] if cols else None),
+            "base_col_names": cols,
+            "base_joiner": getattr(self, "base_joiner", " "),
+            "sort_state": {},
+            "sorted_col": None,
+            "col_widths": {},
+            "op_history": [],
+        }
+        return n
+
+    # ---------------------
+    # セッションのスナップショット（終了時に保存 / 起動時に復元）
+    # ---------------------
+    def _session_view_state(self) -> dict:
+        widths = [int(w) for w in self._col_widths()]
+        return {
+            "base_col_name": self.base_col_name,
+            "base_col_names": list(getattr(self, "base_col_names", []) or []),
+            "base_joiner": getattr(self, "base_joiner", " "),
+            "sort_state": dict(self.sort_state),
+            "sorted_col": self.sorted_col,
+            "col_widths": widths,
+            "unsaved": bool(self.unsaved_changes),
+        }
+
+    def _save_session(self):
+        if not getattr(self, "startup_open_last", False):
+            aisv_session.discard_snapshot(self.session_path)
+            return
+        try:
+            with self.perf.span("session_save", shape_fn=lambda: self.current_df):
+                others = [{"doc": st["doc"], "view": {k: v for k, v in st.items() if k not in ("doc", "journal")}}
+                          for st in self.sheet_states.values()]
+                ok = aisv_session.save_snapshot(self.session_path, self.doc, self._session_view_state(), others)
+            if not ok:
+                aisv_session.discard_snapshot(self.session_path)
+        except Exception as e:
+            logging.warning(f"Session save failed: {e}")
+            aisv_session.discard_snapshot(self.session_path)
+
+    def _restore_session(self, path: str) -> bool:
+        """path のスナップショットが有効なら復元して True。Excel は読み直さない。"""
+        try:
+            with self.perf.span("session_restore", shape_fn=lambda: self.current_df) as sp:
+                sp.detail = os.path.basename(path)
+                snap = aisv_session.load_snapshot(self.session_path, path)
+                if snap is None:
+                    return False
+                aisv_session.restore_doc(self.doc, snap["doc"])
+        except Exception as e:
+            logging.warning(f"Session restore failed: {e}")
+            return False
+        if self.current_df is None:
+            return False
+
+        view = snap.get("view") or {}
+        self.excel_path = path
+        self.last_file = path
+        self._reset_for_new_file()
+        self.base_col_name = view.get("base_col_name")
+        self.base_col_names = [c for c in (view.get("base_col_names") or []) if c in self.current_df.columns]
+        self.base_joiner = view.get("base_joiner", " ")
+        self.sort_state = dict(view.get("sort_state") or {})
+        self.sorted_col = view.get("sorted_col")
+
+        self.show_dataframe(self.current_df)
+        widths = {}
+        for i, w in enumerate(view.get("col_widths") or []):
+            try:
+                widths[i] = int(w)
+            except (TypeError, ValueError):
+                pass
+        self._set_col_widths(widths)
+        # 複数シートのブック：表示中以外に開いていたシート（裏に置いておく）
+        for other in snap.get("sheets") or []:
+            doc = self._new_document()
+            aisv_session.restore_doc(doc, other["doc"])
+            name = doc.sheet_name if doc.sheet_name is not None else (self.sheets[0] if self.sheets else None)
+            if name not in self.sheets or name == self.active_sheet:
+                continue
+            journal = aisv_journal.EditJournal(self.journal.folder)
+            journal.begin(path, doc.source_sig, doc.header_row, doc.usecols, doc.sheet_name)
+            st = dict(other.get("view") or {}, doc=doc, journal=journal)
+            self.sheet_states[name] = st
+        if view.get("unsaved"):
+            self.set_unsaved(True)
+        self._render_sheet_tabs()
+        self.update_status_bar()
+        logging.info(f"Session restored: {path}")
+        self.toast("前回の状態を復元しました（元ファイルは変更されていません）", 2600)
+        return True
+
+    def on_close(self):
+        """ウィンドウを閉じる：編集を確定し、セッションを保存してから終了（ジャーナルは消す）。"""
+        try:
+            self.finish_edit(None)
+        except Exception:
+            pass
+        self._save_session()
+        self._remember_load_profile()
+        for journal in self._sheet_journals():
+            journal.close(discard=True)
+        self._close_store()
+        try:
+            self.stall_monitor.stop()
+        except Exception:
+            pass
+        self.root.destroy()
+
+    # ---------------------
+    # 複数シート（シート見出し / 切り替え。開いたシートだけ解析し、シートごとに状態を持つ）
+    # ---------------------
+    @property
+    def active_sheet(self) -> Optional[str]:
+        if self.doc.sheet_name is not None:
+            return self.doc.sheet_name
+        return self.sheets[0] if self.sheets else None
+
+    def _sheet_arg(self, name: Optional[str]) -> Optional[str]:
+        """SearchDocument.load に渡すシート名（最初のシートは None。キャッシュ・ジャーナル・記憶のキーと揃える）。"""
+        return None if (not self.sheets or name == self.sheets[0]) else name
+
+    def _new_document(self) -> core.SearchDocument:
+        doc = core.SearchDocument(undo_limit=int(getattr(self, "undo_limit", 20) or 20))
+        cache = getattr(self, "sheet_cache", None)
+        doc.raw_cache = cache if cache is not None and cache.enabled else None
+        return doc
+
+    def _init_sheets(self, path: Optional[str]):
+        """新しいファイルを開いたとき：シート一覧を読み（解析はしない）、前のファイルのシート状態を捨てる。"""
+        for st in self.sheet_states.values():
+            st["journal"].close(discard=True)
+        self.sheet_states = {}
+        self._sheet_jobs = {}
+        self._sheet_gen += 1
+        self.sheets = aisv_workbook.sheet_names(path) if path else []
+        self._render_sheet_tabs()
+
+    def _capture_sheet_state(self) -> dict:
+        return {
+            "doc": self.doc,
+            "journal": self.journal,
+            "base_col_name": self.base_col_name,
+            "base_col_names": list(getattr(self, "base_col_names", []) or []),
+            "base_joiner": getattr(self, "base_joiner", " "),
+            "sort_state": dict(self.sort_state),
+            "sorted_col": self.sorted_col,
+            "col_widths": self._column_widths_by_name(),
+            "op_history": list(self.op_history),
+        }
+
+    def _apply_sheet_state(self, st: dict):
+        self.doc = st["doc"]
+        self.journal = st["journal"]
+        self.base_col_name = st.get("base_col_name")
+        self.base_col_names = list(st.get("base_col_names") or [])
+        self.base_joiner = st.get("base_joiner", " ")
+        self.sort_state = dict(st.get("sort_state") or {})
+        self.sorted_col = st.get("sorted_col")
+        self.op_history = list(st.get("op_history") or [])
+        self.show_dataframe(self.current_df)
+        self._apply_column_widths(st.get("col_widths") or {})
+        self.update_undo_redo_buttons()
+        self.update_status_bar()
+        self._render_sheet_tabs()
+
+    def _build_sheet_bar(self):
+        """シート見出しのバー（表の下。シートが2枚以上のときだけ表示）。"""
+        self.sheet_bar = tk.Frame(self.root)
+        self.sheet_var = tk.StringVar(value="")
+        ttk.Button(self.sheet_bar, text="◀", width=2,
+                   command=lambda: self.sheet_canvas.xview_scroll(-3, "units")).pack(side="left")
+        ttk.Button(self.sheet_bar, text="▶", width=2,
+                   command=lambda: self.sheet_canvas.xview_scroll(3, "units")).pack(side="left")
+        self.sheet_canvas = tk.Canvas(self.sheet_bar, height=28, highlightthickness=0)
+        self.sheet_canvas.pack(side="left", fill="x", expand=True)
+        self.sheet_tabs = tk.Frame(self.sheet_canvas)
+        self.sheet_canvas.create_window((0, 0), window=self.sheet_tabs, anchor="nw")
+        self.sheet_tabs.bind(
+            "<Configure>", lambda e: self.sheet_canvas.configure(scrollregion=self.sheet_canvas.bbox("all"))
+        )
+
+    def _render_sheet_tabs(self):
+        bar = getattr(self, "sheet_bar", None)
+        if bar is None:
+            return
+        for w in self.sheet_tabs.winfo_children():
+            w.destroy()
+        if len(self.sheets) <= 1 or self.store is not None:
+            bar.pack_forget()
+            return
+        for name in self.sheets:
+            text = f"{name} …" if name in self._sheet_jobs else name
+            ttk.Radiobutton(
+                self.sheet_tabs, text=text, value=name, variable=self.sheet_var, style="Toolbutton",
+                command=lambda n=name: self.switch_sheet(n),
+            ).pack(side="left", padx=1)
+        self.sheet_var.set(self.active_sheet or "")
+        if not bar.winfo_manager():
+            bar.pack(side="bottom", fill="x", after=self.status_left.master)
+
+    def next_sheet(self, step: int = 1):
+        if len(self.sheets) > 1 and self.active_sheet in self.sheets:
+            i = self.sheets.index(self.active_sheet)
+            self.switch_sheet(self.sheets[(i + step) % len(self.sheets)])
+
+    def switch_sheet(self, name: str):
+        """シートを切り替える。初めて開くシートは裏で解析し、終わったら表示する。"""
+        cur = self.active_sheet
+        if name == cur or name not in self.sheets or self.store is not None:
+            if getattr(self, "sheet_var", None) is not None:
+                self.sheet_var.set(cur or "")
+            return
+        self.finish_edit(None)
+        if cur not in self._sheet_jobs:
+            # 今のシートの状態を預ける（読み込み中のシートは表示用の空の文書なので預けない）
+            self._remember_load_profile()
+            self.sheet_states[cur] = self._capture_sheet_state()
+        self._reset_view_position()
+        st = self.sheet_states.pop(name, None)  # sheet_states は表示中以外のシートだけ
+        if st is not None:
+            self._apply_sheet_state(st)
+            self._log_action(f"シート切り替え: {name}")
+            return
+
+        # 未解析：空の文書を表示しておき、裏で読み込む
+        self.doc = self._new_document()
+        self.doc.sheet_name = self._sheet_arg(name)
+        self.journal = aisv_journal.EditJournal(self.journal.folder)
+        self.base_col_name, self.base_col_names = None, []
+        self.sort_state, self.sorted_col = {}, None
+        self.op_history = []
+        self.tree.delete(*self.tree.get_children())
+        self.update_undo_redo_buttons()
+        self.update_status_bar()
+        if name not in self._sheet_jobs:
+            self._start_sheet_load(name)
+        self._render_sheet_tabs()
+        self.status_msg.config(text=f"シート「{name}」を読み込み中…")
+
+    def _start_sheet_load(self, name: str):
+        path, gen = self.excel_path, self._sheet_gen
+        arg = self._sheet_arg(name)
+        job = {"done": False, "t0": time.perf_counter()}
+        self._sheet_jobs[name] = job
+        default_hr = int(getattr(self, "header_row_default", 1) or 1)
+        auto = bool(getattr(self, "auto_detect_layout", True))
+
+        def work():
+            # Tk には触らない（結果は job に入れ、_poll_sheet_load が UI スレッドで反映する）
+            try:
+                try:
+                    prof = self.profiles.find(path, arg)
+                except Exception:
+                    prof = None
+                doc = self._new_document()
+                hr = int(prof.get("header_row") or 1) if prof else default_hr
+                doc.load(path, hr, usecols=prof.get("usecols") if prof else None, sheet_name=arg)
+                kc = None
+                if prof is None and auto and doc.raw_df is not None:
+                    hr, kc = core.sniff_layout(doc.raw_df.head(core.SNIFF_ROWS))
+                    if hr != doc.header_row:
+                        doc.header_row = hr
+                        doc.rebuild_table()
+                job.update(doc=doc, prof=prof, kc=kc)
+            except Exception as e:
+                job["error"] = e
+            job["done"] = True
+
+        threading.Thread(target=work, name="aisv-sheet-load", daemon=True).start()
+        self.root.after(100, self._poll_sheet_load, name, gen)
+
+    def _poll_sheet_load(self, name: str, gen: int):
+        if gen != self._sheet_gen:
+            return  # 別のファイルを開いた
+        job = self._sheet_jobs.get(name)
+        if job is None:
+            return
+        if not job["done"]:
+            self.root.after(100, self._poll_sheet_load, name, gen)
+            return
+        del self._sheet_jobs[name]
+        sec = time.perf_counter() - job["t0"]
+        active = self.active_sheet == name
+        if "error" in job:
+            logging.error(f"Sheet load failed: {name}: {job['error']}")
+            self._render_sheet_tabs()
+            if active:
+                messagebox.showerror("エラー", f"シート「{name}」の読み込み失敗: {job['error']}")
+            return
+        doc, prof = job["doc"], job["prof"]
+        self.perf.add("load_sheet", sec, rows=len(doc.current_df) if doc.current_df is not None else 0,
+                      cols=len(doc.current_df.columns) if doc.current_df is not None else 0, detail=name)
+        logging.info(f"Loaded sheet: {name} ({sec:.3f}s, header_row={doc.header_row})")
+
+        journal = aisv_journal.EditJournal(self.journal.folder)
+        journal.begin(self.excel_path, doc.source_sig, doc.header_row, doc.usecols, doc.sheet_name)
+        cols = list(doc.current_df.columns) if doc.current_df is not None else []
+        base = [c for c in ((prof or {}).get("base_col_names") or []) if c in cols]
+        if not base and cols:
+            kc = job.get("kc") or int(getattr(self, "base_col_index_default", 1) or 1)
+            base = [str(cols[max(1, min(int(kc), len(cols))) - 1])]
+        st = {
+            "doc": doc, "journal": journal,
+            "base_col_name": base[0] if base else None, "base_col_names": base,
+            "base_joiner": (prof or {}).get("base_joiner", getattr(self, "base_joiner", " ")),
+            "sort_state": {}, "sorted_col": None,
+            "col_widths": (prof or {}).get("col_widths") or {}, "op_history": [],
+        }
+        if not active:
+            self.sheet_states[name] = st
+            self._render_sheet_tabs()
+            return
+        self._apply_sheet_state(st)
+        self.status_msg.config(text="")
+        # 開いたときと同じく、リンク列が無ければ検索語句列から作る（選択ダイアログは出さない）
+        if base and (core.AI_COL not in cols or core.GOOGLE_COL not in cols):
+            self.rebuild_search_columns(confirm=False)
+
+    def _sheet_docs(self) -> List[Tuple[str, core.SearchDocument]]:
+        """解析済みのシート（表示中を含む）の (シート名, 文書)。ブックの並び順。"""
+        docs = {name: st["doc"] for name, st in self.sheet_states.items()}
+        cur = self.active_sheet
+        if cur is not None and cur not in self._sheet_jobs and self.current_df is not None:
+            docs[cur] = self.doc
+        return [(name, docs[name]) for name in self.sheets if name in docs and docs[name].current_df is not None]
+
+    def _sheet_journals(self) -> list:
+        return [self.journal] + [st["journal"] for st in self.sheet_states.values()]
+
+    def _writes_workbook(self, path: str) -> bool:
+        """複数シートのブックを xlsx に保存する場合（開いていないシートを元のまま残して書く）。"""
+        return (len(self.sheets) > 1 and str(path).lower().endswith(".xlsx")
+                and bool(self.excel_path) and os.path.exists(self.excel_path))
+
+    def _confirm_workbook_losses(self, path: str) -> bool:
+        """複数シートのブックに保存する場合、書き直すシートの図・テーブル・コメント・書式などは残らないので、
+        あれば保存前に確認する（同じ元ブック・シートは1回だけ）。保存してよければ True。
+        """
+        if not self._writes_workbook(path):
+            return True
+        if self.store is not None:
+            names = [self.sheets[0]]
+        else:
+            names = [name for name, _ in self._sheet_docs()]
+        extras = aisv_workbook.sheet_extras(self.excel_path, names)
+        key = (os.path.abspath(self.excel_path), tuple(sorted(extras)))
+        if not extras or key in self._workbook_loss_ok:
+            return True
+        lines = "\n".join(f"・{name}: {'、'.join(labels)}" for name, labels in extras.items())
+        ok = messagebox.askyesno(
+            "保存の確認",
+            "次のシートは値だけで書き直すため、保存すると以下は残りません。\n\n"
+            f"{lines}\n\n（開いていないシートはそのまま残ります）\n保存しますか？",
+        )
+        if ok:
+            self._workbook_loss_ok.add(key)
+        logging.info(f"Workbook save {'confirmed' if ok else 'cancelled'}: sheet extras {extras}")
+        return ok
+
+    def _write_workbook(self, path: str) -> int:
+        sheets = {}
+        if self.store is not None:
+            n = self.store.output_row_count()
+            if n > aisv_sqlstore.EXCEL_MAX_ROWS:
+                raise ValueError(f"xlsx に保存できるのは {aisv_sqlstore.EXCEL_MAX_ROWS:,} 行までです（{n:,} 行）。CSV で保存してください。")
+            sheets[self.sheets[0]] = self.store.iter_output_rows()
+        else:
+            for name, doc in self._sheet_docs():
+                sheets[name] = aisv_workbook.frame_rows(doc.compose_output())
+        n = aisv_workbook.write_workbook(self.excel_path, path, sheets)
+        logging.info(f"Saved workbook: {path} (sheets written: {', '.join(sheets)}; kept: {len(self.sheets) - len(sheets)})")
+        return n
+
+    # ---------------------
+    # 大容量モード（SQLite。行数の多いシートを見えている行だけ表示）
+    # ---------------------
+    def _is_large_sheet(self, path: str) -> bool:
+        limit = int(getattr(self, "large_mode_rows", LARGE_MODE_ROWS) or 0)
+        if limit <= 0:
+            return False
+        n = aisv_sqlstore.sheet_row_estimate(path)
+        return n is not None and n >= limit
+
+    def _open_large(self, path: str, header_row: int, base_col_index: int = 1) -> bool:
+        """大容量モードで開くか確認して開く。開かなかった（通常の読み込みを続ける）場合は False。"""
+        n = aisv_sqlstore.sheet_row_estimate(path) or 0
+        msg = (
+            f"{os.path.basename(path)} は約 {n:,} 行あります。\n大容量モード（SQLite）で開きますか？\n\n"
+            "・表示は見えている行だけ、並び替え/保存はディスク上で行うためメモリをほとんど使いません\n"
+            "・列一括編集・前回セッションの復元は使えません\n"
+            "（いいえ：通常どおりすべてメモリに読み込みます）"
+        )
+        if not messagebox.askyesno("大容量モード", msg):
+            return False
+        self._close_store()
+
+        def progress(rows):
+            self.status_msg.config(text=f"取り込み中… {rows:,} 行")
+            self.root.update_idletasks()
+
+        try:
+            with self.profiler.capture("load"), self.perf.span("load_store") as sp:
+                sp.detail = os.path.basename(path)
+                store, reused = aisv_sqlstore.SqliteSheet.for_source(
+                    self.store_folder, path, int(header_row or 1), progress=progress
+                )
+                sp.rows, sp.cols = store.total_rows(), len(store.columns)
+        except Exception as e:
+            messagebox.showerror("エラー", f"読み込み失敗: {e}")
+            return True
+        logging.info(f"Opened large sheet: {path} (rows={store.total_rows()}, reused={reused})")
+
+        # pandas 側の文書は空にする（raw_df / current_df を持たない）
+        self.journal.close(discard=True)
+        self.doc.raw_df = None
+        self.doc.rebuild_table()
+        self.doc.clear_history()
+        self.doc.path = path
+        self.doc.sheet_name = None
+        self.doc.header_row = int(header_row or 1)
+        self.store = store
+        store.undo_limit = int(getattr(self, "undo_limit", 20) or 20)
+        self.excel_path = path
+        self.last_file = path
+        self.save_config()
+        self._init_sheets(path)  # 大容量モードは最初のシートだけ（他のシートは保存時に元のまま残す）
+        self.sorted_col = None
+        self.sort_state = {}
+        self._onboard_shown = False
+        self.op_history.clear()
+        self._reset_view_position()
+
+        cols = store.columns
+        if store.links:
+            self.base_col_names = [c for c in store.links.get("base_cols") or [] if c in cols]
+        elif cols:
+            idx = max(1, min(int(base_col_index or 1), len(cols))) - 1
+            self.base_col_names = [cols[idx]]
+            store.set_links(self._store_link_params(self.base_col_names), record=False)
+        self.base_col_name = self.base_col_names[0] if self.base_col_names else None
+
+        self.set_unsaved(store.dirty)
+        self.update_undo_redo_buttons()
+        self._render_store()
+        if reused and store.dirty:
+            self.toast("前回の未保存の編集を引き継ぎました（大容量モード）", 3000)
+        elif reused:
+            self.toast(f"前回取り込んだデータで開きました（{store.total_rows():,} 行・大容量モード）", 2600)
+        else:
+            self.toast(f"大容量モードで開きました（{store.total_rows():,} 行）", 2600)
+        return True
+
+    def _close_store(self, *, discard: bool = False):
+        """大容量モードを終える。DB は残す（未保存の編集は次に同じファイルを開くと引き継ぎ、
+        編集が無ければ解析済みとして次回の取り込みを省く。上限 cache_mb を超えた分は古いものから消す）。
+        """
+        store = getattr(self, "store", None)
+        if store is None:
+            return
+        cache_bytes = int(getattr(self, "cache_mb", 0) or 0) * 1024 * 1024
+        if not self.unsaved_changes and cache_bytes <= 0:
+            discard = True
+        store.close(discard=discard)
+        self.store = None
+        self._set_windowing(False, False)
+        try:
+            aisv_sqlstore.prune_stores(self.store_folder, cache_bytes)
+        except Exception as e:
+            logging.warning(f"Store prune failed: {e}")
+
+    # ---------------------
+    # 表示範囲（大きな表は見えている行・列だけ Treeview に入れる）
+    # ---------------------
+    def _set_windowing(self, rows: bool, cols: bool):
+        """行 / 列を間引いて表示するかどうかで、スクロールバーとホイールのつなぎ先を切り替える。"""
+        if (rows, cols) == tuple(getattr(self, "_window", (False, False))):
+            return
+        self._window = (rows, cols)
+        try:
+            if rows:
+                # Treeview には見えている行だけ入れるので、縦スクロールは自前で行位置に変換する
+                self.tree.configure(yscrollcommand=lambda *a: None)
+                self.vsb.config(command=self._yview_rows)
+                self.tree.bind("<MouseWheel>", self._wheel_rows)
+                self.tree.bind("<Button-4>", lambda e: self._scroll_rows(-3))
+                self.tree.bind("<Button-5>", lambda e: self._scroll_rows(3))
+                self.tree.bind("<Configure>", lambda e: self._render_window())
+            else:
+                self.tree.configure(yscrollcommand=self.vsb.set)
+                self.vsb.config(command=self.tree.yview)
+                for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>", "<Configure>"):
+                    self.tree.unbind(seq)
+            if cols:
+                # 列も見えている分だけ入れるので、横スクロールは列単位（先頭の列を入れ替える）
+                self.tree.xview_moveto(0)
+                self.tree.configure(xscrollcommand=lambda *a: None)
+                self.hsb.config(command=self._xview_cols)
+                self.tree.bind("<Shift-MouseWheel>", self._wheel_cols)
+                self.tree.bind("<Shift-Button-4>", lambda e: self._scroll_cols(-1) or "break")
+                self.tree.bind("<Shift-Button-5>", lambda e: self._scroll_cols(1) or "break")
+            else:
+                self.tree.configure(xscrollcommand=self.hsb.set)
+                self.hsb.config(command=self.tree.xview)
+                for seq in ("<Shift-MouseWheel>", "<Shift-Button-4>", "<Shift-Button-5>"):
+                    self.tree.unbind(seq)
+        except Exception:
+            pass
+
+    def _reset_view_position(self):
+        """先頭の行・列と列幅の記憶を初めに戻す（別のファイル・シートを表示する前）。"""
+        self._view_top = 0
+        self._col_first = 0
+        self._col_px, self._col_keys = [], []
+
+    def _visible_rows(self) -> int:
+        try:
+            row_px = int(ttk.Style(self.root).lookup("Treeview", "rowheight") or 24)
+        except Exception:
+            row_px = 24
+        return max(10, (int(self.tree.winfo_height() or 0) - 28) // max(1, row_px))
+
+    def _tree_width(self) -> int:
+        try:
+            w = int(self.tree.winfo_width() or 0)
+        except Exception:
+            w = 0
+        return w if w > 1 else 1200  # 表示前は広めに見積もる（表示されたら <Configure> で入れ直す）
+
+    def _row_count(self) -> int:
+        """表示行の数（見出し行より上の行を含む。大容量モードは絞り込み後の行数）。"""
+        if self.store is not None:
+            return self.store.count()
+        return int(getattr(self, "_table_rows", 0) or 0)
+
+    def _scroll_rows(self, rows: int):
+        if not getattr(self, "_window", (False, False))[0]:
+            return
+        self._view_top = int(getattr(self, "_view_top", 0)) + int(rows)
+        self._render_window()
+
+    def _wheel_rows(self, event):
+        self._scroll_rows(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _yview_rows(self, *args):
+        """縦スクロールバーの操作（moveto / scroll）を表示開始行に変換する。"""
+        if not args or not getattr(self, "_window", (False, False))[0]:
+            return
+        if args[0] == "moveto":
+            self._view_top = int(float(args[1]) * self._row_count())
+            self._render_window()
+        elif args[0] == "scroll":
+            step = self._visible_rows() - 1 if len(args) > 2 and args[2] == "pages" else 1
+            self._scroll_rows(int(args[1]) * step)
+
+    def _scroll_cols(self, cols: int):
+        if not getattr(self, "_window", (False, False))[1]:
+            return
+        self._col_first = int(getattr(self, "_col_first", 0)) + int(cols)
+        self._render_window()
+
+    def _wheel_cols(self, event):
+        self._scroll_cols(-1 if event.delta > 0 else 1)
+        return "break"
+
+    def _xview_cols(self, *args):
+        """横スクロールバーの操作（moveto / scroll）を先頭の列に変換する。"""
+        if not args or not getattr(self, "_window", (False, False))[1]:
+            return
+        if args[0] == "moveto":
+            self._col_first = int(float(args[1]) * len(self._col_px))
+            self._render_window()
+        elif args[0] == "scroll":
+            step = max(1, int(getattr(self, "_col_span", 2)) - 1) if len(args) > 2 and args[2] == "pages" else 1
+            self._scroll_cols(int(args[1]) * step)
+
+    def _render_window(self):
+        """スクロール・ウィンドウの大きさの変更のあと、見えている範囲を入れ直す。"""
+        self._hide_cell_tip()
+        if self.store is not None:
+            self._render_store()
+        elif self.current_df is not None and getattr(self, "_table_rows", 0):
+            self._render_table()
+
+    def _column_at(self, col_id) -> int:
+        """identify_column の "#k" → 表示列の位置（0始まり。列を間引いているときも表全体での位置）。無効なら -1。"""
+        try:
+            k = int(str(col_id).replace("#", ""))
+        except ValueError:
+            return -1
+        return int(getattr(self, "_col_first", 0)) + k - 1 if k > 0 else -1
+
+    @staticmethod
+    def _column_pos(col) -> int:
+        """Treeview の列 ID（__c{i}__）→ 表示列の位置。"""
+        try:
+            return int(str(col)[3:-2])
+        except ValueError:
+            return -1
+
+    def _col_widths(self) -> List[int]:
+        """全列の幅（px）。Treeview に入っている列は今の幅（ドラッグで変えた分）を写してから返す。"""
+        px = getattr(self, "_col_px", None)
+        if px is None:
+            px = self._col_px = []
+        try:
+            for col in self.tree["columns"]:
+                i = self._column_pos(col)
+                if 0 <= i < len(px):
+                    px[i] = int(self.tree.column(col, "width"))
+        except Exception:
+            pass
+        return px
+
+    def _set_column_layout(self, keys: List, labels: List[str]):
+        """表示する列（keys: 列を見分ける名前）と見出しを決める。幅は同じ名前の列のものを引き継ぐ。"""
+        self._col_labels = list(labels)
+        if list(keys) == list(getattr(self, "_col_keys", None) or []) and len(self._col_widths()) == len(keys):
+            return
+        old = dict(zip(getattr(self, "_col_keys", None) or [], self._col_widths()))
+        self._col_px = [int(old.get(k, DEFAULT_COL_WIDTH)) for k in keys]
+        self._col_keys = list(keys)
+        self.tree["columns"] = ()  # 位置の変わった列に前の幅を写さないように
+
+    def _set_col_widths(self, widths: Dict[int, int]):
+        """表示列の位置 → 幅（px）。Treeview に入っていない列は覚えておき、入れるときに使う。"""
+        px = self._col_widths()
+        for i, w in widths.items():
+            if 0 <= i < len(px):
+                px[i] = int(w)
+        for col in self.tree["columns"]:
+            i = self._column_pos(col)
+            if i in widths and 0 <= i < len(px):
+                self.tree.column(col, width=px[i])
+        if getattr(self, "_window", (False, False))[1]:
+            self._render_window()  # 幅が変わると見える列も変わる
+
+    def _fill_columns(self) -> range:
+        """Treeview に入れる列を決めて、列・見出し・幅を設定する。入れた列の位置の範囲を返す。"""
+        px = self._col_widths()
+        n = len(px)
+        if getattr(self, "_window", (False, False))[1]:
+            first, end, last = core.column_window(px, self._col_first, self._tree_width(), WINDOW_COL_MARGIN)
+            if n:
+                self.hsb.set(first / n, end / n)
+        else:
+            first, end, last = 0, n, n
+        self._col_first, self._col_span = first, end - first
+        cols = [f"__c{i}__" for i in range(first, last)]
+        if tuple(self.tree["columns"]) != tuple(cols):
+            self.tree["columns"] = cols
+        self.tree["show"] = "headings"
+        for i, col in zip(range(first, last), cols):
+            self.tree.heading(col, text=self._col_labels[i])
+            self.tree.column(col, width=px[i], anchor="w")
+        return range(first, last)
+
+    @timed("render")
+    def _render_store(self):
+        store = self.store
+        if store is None:
+            return
+        disp = store.display_columns()
+        self._set_windowing(True, len(disp) > WINDOW_COLS_MIN)
+        self._set_column_layout(disp, [f"{get_excel_header(i+1)} {name}".strip() for i, name in enumerate(disp)])
+        shown = self._fill_columns()
+        self.apply_row_colors()
+
+        n = self._visible_rows()
+        total = store.count()
+        top = max(0, min(int(self._view_top), max(0, total - n)))
+        self._view_top = top
+        self.tree.delete(*self.tree.get_children())
+        a, b = shown.start, shown.stop
+        limit = self._display_limit()
+        for k, (rid, vals) in enumerate(store.window(top, n)):
+            tag = ("even",) if ((top + k) % 2 == 0) else ("odd",)
+            values = [core.truncate_text(display_text(v), limit) for v in vals[a:b]]
+            self.tree.insert("", "end", iid=f"r{rid}", values=values, tags=tag)
+        if total:
+            self.vsb.set(top / total, min(1.0, (top + n) / total))
+        else:
+            self.vsb.set(0.0, 1.0)
+        self.update_status_bar()
+        if self.tree.get_children():
+            self._mark_first_row()
+
+    def _store_status_bar(self):
+        store = self.store
+        total = store.total_rows()
+        shown = store.count()
+        text = f"{total:,} rows | {len(store.display_columns())} cols | 大容量モード"
+        if store.filter_spec:
+            text += f" | 絞り込み: {store.filter_spec[0]} ∋ \"{store.filter_spec[1]}\" ({shown:,} 件)"
+        self.status_left.config(text=text)
+        cols = getattr(self, "base_col_names", []) or ([self.base_col_name] if self.base_col_name else [])
+        self.status_mid.config(text=f"検索語句列: {' + '.join(cols) if cols else '-'}")
+        if self.sorted_col:
+            arrow = "▲" if self.sort_state.get(self.sorted_col, True) else "▼"
+            self.status_right.config(text=f"並び替え: {self.sorted_col} {arrow}")
+        else:
+            self.status_right.config(text="")
+
+    def _store_changed(self, action: str):
+        """大容量モードでの編集のあと（未保存・Undo ボタン・表示・履歴）。"""
+        self.set_unsaved(True)
+        self.update_undo_redo_buttons()
+        self._render_store()
+        self._log_action(action)
+
+    def _store_undo_redo(self, *, redo: bool):
+        with self.perf.span("redo" if redo else "undo"):
+            ok = self.store.redo() if redo else self.store.undo()
+        if ok:
+            self._store_changed("Redo" if redo else "Undo")
+
+    def _store_sort(self, col_name: str):
+        asc = self.sort_state.get(col_name, True)
+        with self.profiler.capture("sort"), self.perf.span("sort") as sp:
+            sp.detail = col_name
+            self.store.sort(col_name, asc)
+            sp.rows, sp.cols = self.store.count(), len(self.store.columns)
+        self.sort_state[col_name] = not asc
+        self.sorted_col = col_name
+        self._view_top = 0
+        self._render_store()
+
+    def _store_link_params(self, base_cols: List[str]) -> dict:
+        return dict(
+            base_cols=list(base_cols),
+            joiner=getattr(self, "base_joiner", " "),
+            generate_ai=bool(getattr(self, "generate_ai", True)),
+            generate_google=bool(getattr(self, "generate_google", True)),
+            ai_template=getattr(self, "ai_url_template", core.DEFAULT_AI_TEMPLATE),
+            google_template=core.DEFAULT_GOOGLE_TEMPLATE,
+            insert_mode=getattr(self, "link_insert_mode", "fixed2"),
+            anchor_col=base_cols[0] if base_cols else None,
+        )
+
+    def _store_rebuild_links(self, confirm: bool):
+        cols = self.store.columns
+        valid = [c for c in (getattr(self, "base_col_names", None) or [self.base_col_name]) if c in cols]
+        if not valid:
+            self.select_base_columns()
+            return
+        if confirm and self.confirm_rebuild and not self.confirm_rebuild_dialog():
+            return
+        self.finish_edit(None)
+        # リンク列は表示・保存時に作るので、ここでは設定を変えるだけ（行数に関係なく一瞬）
+        if self.store.set_links(self._store_link_params(valid)):
+            self._store_changed("検索リンク更新")
+
+    def _store_start_edit(self, event):
+        if self.tree.identify("region", event.x, event.y) != "cell":
+            return
+        row_id = self.tree.identify_row(event.y)
+        col_id = self.tree.identify_column(event.x)
+        if not row_id or not col_id:
+            return
+        c = self._column_at(col_id)
+        disp = self.store.display_columns()
+        if c < 0 or c >= len(disp):
+            return
+        rid = int(str(row_id)[1:])
+        col_name = disp[c]
+        if col_name in core.LINK_COLS:
+            self.toast("リンク列です。ダブルクリックで検索を開きます（編集不可）。", 2400)
+            # 表示は列名だけなので、URL は開くときにその行の検索語句から作る
+            url = self.store.cell_url(rid, col_name)
+            if url is None and col_name in self.store.columns:  # 元ファイルにある同名の列（式のまま）
+                url = extract_url(self.store.value(rid, col_name))
+            if url:
+                webbrowser.open(url)
+            return
+
+        x, y, w, h = self.tree.bbox(row_id, col_id)
+        self.edit_entry = tk.Entry(self.tree)
+        self.edit_entry.place(x=x, y=y, width=w, height=h)
+        self.edit_entry.insert(0, display_text(self.store.value(rid, col_name)))
+        self.edit_entry.focus()
+        self.edit_row, self.edit_col = rid, col_name
+        self.edit_entry.bind("<Return>", self.finish_edit)
+        self.edit_entry.bind("<Escape>", lambda e: self._cancel_edit())
+
+    def _store_finish_edit(self):
+        val = self.edit_entry.get()
+        rid, col_name = int(self.edit_row), str(self.edit_col)
+        self._cancel_edit()
+        if self.store.set_cell(rid, col_name, val):
+            self._store_changed(f"セル編集: {col_name} (行 {rid + self.store.header_row + 1})")
+
+    def filter_large_sheet(self):
+        """大容量モードの絞り込み（列に文字を含む行だけ表示。SQL で絞るので行数が多くても速い）。"""
+        if self.store is None:
+            self.toast("絞り込みは大容量モードのときに使えます。", 2400)
+            return
+        win = tk.Toplevel(self.root)
+        win.title("絞り込み（大容量モード）")
+        win.transient(self.root)
+        win.grab_set()
+        frm = ttk.Frame(win, padding=12)
+        frm.pack(fill="both", expand=True)
+
+        cols = self.store.columns
+        spec = self.store.filter_spec or (self.base_col_name if self.base_col_name in cols else cols[0], "")
+        ttk.Label(frm, text="列:").grid(row=0, column=0, sticky="w")
+        col_var = tk.StringVar(value=spec[0])
+        ttk.Combobox(frm, textvariable=col_var, values=cols, state="readonly", width=24).grid(row=0, column=1, sticky="w", padx=(6, 0))
+        ttk.Label(frm, text="含む文字:").grid(row=1, column=0, sticky="w", pady=(6, 0))
+        text_var = tk.StringVar(value=spec[1])
+        ent = ttk.Entry(frm, textvariable=text_var, width=28)
+        ent.grid(row=1, column=1, sticky="w", padx=(6, 0), pady=(6, 0))
+        ent.focus_set()
+
+        def apply(clear=False):
+            with self.perf.span("filter") as sp:
+                if clear or not text_var.get():
+                    self.store.clear_filter()
+                else:
+                    sp.detail = col_var.get()
+                    self.store.filter(col_var.get(), text_var.get())
+                sp.rows = self.store.count()
+            self._view_top = 0
+            self._render_store()
+            win.destroy()
+
+        btns = ttk.Frame(frm)
+        btns.grid(row=2, column=0, columnspan=2, sticky="e", pady=(10, 0))
+        ttk.Button(btns, text="解除", command=lambda: apply(clear=True)).pack(side="right")
+        ttk.Button(btns, text="絞り込む", command=apply).pack(side="right", padx=(0, 8))
+        win.bind("<Return>", lambda e: apply())
+        win.bind("<Escape>", lambda e: win.destroy())
+
     def _load_excel_no_dialog(self, path: str, *, first_time: bool = False) -> bool:
         """設定の初期値だけで読み込む（ダイアログを出さない）。
         失敗したら False を返す。
         """
+        if self._is_large_sheet(path):
+            header_row = int(getattr(self, "header_row_default", 1) or 1)
+            base_col_index = int(getattr(self, "base_col_index_default", 1) or 1)
+            if getattr(self, "auto_detect_layout", True):
+                try:
+                    hr, kc = core.sniff_layout(core.read_sheet_raw(path, nrows=core.SNIFF_ROWS))
+                    header_row, base_col_index = hr, (kc or base_col_index)
+                except Exception:
+                    pass
+            if self._open_large(path, header_row, base_col_index):
+                return True
         try:
             header_row = int(getattr(self, "header_row_default", 1) or 1)
             base_col_index = int(getattr(self, "base_col_index_default", 1) or 1)
-            self.raw_df = pd.read_excel(path, header=None, dtype=str, engine="openpyxl")
-            self.header_row_current = int(header_row)
-            self._build_current_df_from_raw()
+            with self.profiler.capture("load"), \
+                    self.perf.span("load", shape_fn=lambda: self.current_df) as sp:
+                sp.detail = os.path.basename(path)
+                self.doc.load(path, int(header_row))
+                if getattr(self, "auto_detect_layout", True):
+                    # 読み込み済みの先頭行から推定（再読み込みなし）
+                    hr, kc = core.sniff_layout(self.raw_df.head(core.SNIFF_ROWS))
+                    if hr != self.doc.header_row:
+                        self.doc.header_row = hr
+                        self.doc.rebuild_table()
+                    if kc:
+                        base_col_index = kc
         except Exception as e:
             messagebox.showerror("エラー", f"読み込み失敗: {e}")
             self.current_df = None
@@ -942,19 +2433,27 @@ class ExcelViewerApp:
                 self.root.destroy()
             return
 
-        header_row, base_col_index = settings
+        header_row, base_col_index, usecols = settings
 
-        # 設定を記憶（次回起動時の初期値）
+        # 設定を記憶（次回起動時の初期値。検索語句列は元の列番号で覚える）
         self.header_row_default = header_row
         self.base_col_index_default = base_col_index
         self.save_config()
+        if self._is_large_sheet(path) and self._open_large(path, header_row, base_col_index):
+            return
+        if usecols:
+            # 検索語句列は必ず読み込み、読み込んだ列の中での番号に直す
+            usecols = sorted(set(usecols) | {int(base_col_index) - 1})
+            base_col_index = usecols.index(int(base_col_index) - 1) + 1
 
         # 実読み込み（見出し行をヘッダーとして扱う）
         try:
-            self.raw_df = pd.read_excel(path, header=None, dtype=str, engine="openpyxl")
-            self.header_row_current = int(header_row)
-            self._build_current_df_from_raw()
-            logging.info(f"Loaded: {path} (header_row={header_row}, base_col_index={base_col_index})")
+            with self.profiler.capture("load"), \
+                    self.perf.span("load", shape_fn=lambda: self.current_df) as sp:
+                sp.detail = os.path.basename(path)
+                self.doc.load(path, int(header_row), usecols=usecols)
+            logging.info(f"Loaded: {path} (header_row={header_row}, base_col_index={base_col_index}, "
+                         f"usecols={core.format_column_spec(usecols) or 'all'})")
         except Exception as e:
             messagebox.showerror("エラー", f"読み込み失敗: {e}")
             self.current_df = None
@@ -986,11 +2485,14 @@ class ExcelViewerApp:
             self.update_status_bar()
 
     def _show_load_settings_dialog(self, path: str):
-        """見出し行 / 検索語句列を指定するダイアログ（プレビュー付き）。
-        戻り値: (header_row:int, base_col_index:int) / None(キャンセル)
+        """見出し行 / 検索語句列 / 読み込む列を指定するダイアログ（プレビュー付き）。
+        戻り値: (header_row:int, base_col_index:int, usecols:list[int]|None) / None(キャンセル)
         """
         init_header = int(getattr(self, "header_row_default", 1) or 1)
         init_base = int(getattr(self, "base_col_index_default", 1) or 1)
+        # 読み込む列はファイルごと（記憶した読み込み設定があればそれを初期値に）
+        prof = self.profiles.for_file(path) or {}
+        init_usecols = core.format_column_spec(prof.get("usecols"))
 
         win = tk.Toplevel(self.root)
         win.title("読み込み設定（見出し行 / 検索語句列）")
@@ -1019,16 +2521,27 @@ class ExcelViewerApp:
         sp_base = ttk.Spinbox(top, from_=1, to=500, width=6, textvariable=base_var)
         sp_base.pack(side="left", padx=(6, 14))
 
+        cols_row = ttk.Frame(win)
+        cols_row.pack(fill="x", padx=10, pady=(6, 0))
+        ttk.Label(cols_row, text="読み込む列:").pack(side="left")
+        usecols_var = tk.StringVar(value=init_usecols)
+        ttk.Entry(cols_row, width=24, textvariable=usecols_var).pack(side="left", padx=(6, 8))
+        ttk.Label(
+            cols_row,
+            text="例: A:C,F / 1-3,6（空欄=すべて）。大きなファイルで使う列だけ読み込みます。保存時は他の列も元のまま書き出します。",
+            foreground="gray",
+        ).pack(side="left")
+
         btns = ttk.Frame(win)
         btns.pack(fill="x", padx=10, pady=(6, 6))
 
         preview_frame = ttk.Frame(win)
         preview_frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
 
-        # プレビュー読み込み（header=Noneで“生”の行を表示）
+        # プレビュー読み込み（header=Noneで“生”の行を表示。自動検出にも使う）
         try:
-            preview_n = max(25, header_var.get() + 10)
-            preview_df = pd.read_excel(path, header=None, dtype=str, engine="openpyxl", nrows=preview_n)
+            preview_n = max(25, header_var.get() + 10, core.SNIFF_ROWS)
+            preview_df = core.read_sheet_raw(path, nrows=preview_n)
         except Exception as e:
             messagebox.showerror("エラー", f"プレビュー読み込み失敗: {e}")
             win.destroy()
@@ -1037,6 +2550,27 @@ class ExcelViewerApp:
         ncols = int(preview_df.shape[1] or 1)
         sp_base.config(to=max(1, ncols))
 
+        detect_label = ttk.Label(top, text="", foreground="gray")
+
+        def auto_detect():
+            with self.perf.span("detect_layout", shape_fn=lambda: preview_df):
+                hr, kc = core.sniff_layout(preview_df)
+            header_var.set(hr)
+            text = f"自動検出: 見出し行 {hr}"
+            if kc:
+                base_var.set(kc)
+                try:
+                    name = core.safe_text(preview_df.iat[hr - 1, kc - 1])
+                except Exception:
+                    name = ""
+                text += f" / 検索語句列 {kc}（{name}）" if name else f" / 検索語句列 {kc}"
+            detect_label.config(text=text)
+
+        ttk.Button(top, text="自動検出", command=lambda: auto_detect()).pack(side="left")
+        detect_label.pack(side="left", padx=(8, 0))
+        if getattr(self, "auto_detect_layout", True):
+            auto_detect()
+
         cols = [f"C{i+1}" for i in range(ncols)]
         tree = ttk.Treeview(preview_frame, columns=cols, show="headings", height=16)
         vsb = ttk.Scrollbar(preview_frame, orient="vertical", command=tree.yview)
@@ -1062,7 +2596,7 @@ class ExcelViewerApp:
             need_n = max(25, hr + 10)
             if len(preview_df) < need_n:
                 try:
-                    preview_df = pd.read_excel(path, header=None, dtype=str, engine="openpyxl", nrows=need_n)
+                    preview_df = core.read_sheet_raw(path, nrows=need_n)
                 except Exception:
                     return
             ncols = int(preview_df.shape[1] or 1)
@@ -1084,7 +2618,12 @@ class ExcelViewerApp:
         def ok():
             hr = max(1, int(header_var.get() or 1))
             bc = max(1, int(base_var.get() or 1))
-            result["value"] = (hr, bc)
+            try:
+                usecols = core.parse_column_spec(usecols_var.get())
+            except ValueError as e:
+                messagebox.showerror("エラー", str(e), parent=win)
+                return
+            result["value"] = (hr, bc, usecols)
             win.destroy()
 
         def cancel():
@@ -1106,22 +2645,34 @@ class ExcelViewerApp:
     # データ操作
     # ---------------------
     def add_empty_column(self):
+        if self.store is not None:
+            name = f"新規列_{len(self.store.columns) + 1}"
+            if self.store.add_column(name):
+                self._store_changed("空白列追加")
+            return
         if self.current_df is None:
             return
         before = self.current_df.copy()
         after = self.current_df.copy()
         new_col_name = f"新規列_{len(after.columns) + 1}"
         after[new_col_name] = ""
-        self.commit_df(before, after, "空白列追加", refresh_view=True)
+        if self.commit_df(before, after, "空白列追加", refresh_view=True):
+            self._journal("add_col", name=new_col_name)
         self.update_status_bar()
 
     def add_empty_row(self):
+        if self.store is not None:
+            self.store.add_row()
+            self._view_top = max(0, self.store.count() - self._visible_rows())
+            self._store_changed("空白行追加")
+            return
         if self.current_df is None:
             return
         before = self.current_df.copy()
         after = self.current_df.copy()
         after.loc[len(after)] = [""] * len(after.columns)
-        self.commit_df(before, after, "空白行追加", refresh_view=True)
+        if self.commit_df(before, after, "空白行追加", refresh_view=True):
+            self._journal("add_row")
         self.update_status_bar()
 
     # ---------------------
@@ -1130,7 +2681,7 @@ class ExcelViewerApp:
 
     def select_base_columns(self):
         """検索語句に使う列を複数選択できます（例：メーカー + 商品名）。"""
-        if self.current_df is None or len(self.current_df.columns) == 0:
+        if not self._table_columns():
             return
 
         win = tk.Toplevel(self.root)
@@ -1152,7 +2703,7 @@ class ExcelViewerApp:
         frm.grid_rowconfigure(0, weight=1)
         frm.grid_columnconfigure(0, weight=1)
 
-        cols = list(self.current_df.columns)
+        cols = self._table_columns()
         for c in cols:
             lb.insert("end", c)
 
@@ -1231,33 +2782,11 @@ class ExcelViewerApp:
             # 最低限：先頭列
             cols = [str(self.current_df.columns[0])]
 
-        joiner = getattr(self, "base_joiner", " ")
-        joiner = "\t" if joiner == "\\t" else joiner
-
-        def make_row_keyword(row):
-            parts = []
-            for c in cols:
-                v = safe_text(row.get(c, ""))
-                v = v.strip()
-                if v:
-                    parts.append(v)
-            return joiner.join(parts).strip()
-
-        return self.current_df.apply(make_row_keyword, axis=1)
+        return self.doc.keyword_series(cols, getattr(self, "base_joiner", " "))
 
     def _make_hyperlink_formula(self, text: str, template: str, label: str) -> str:
         """Excelの=HYPERLINK式を作る（template内の{q}をURLエンコードした検索語句に置換）"""
-        text = safe_text(text)
-        if not text:
-            return ""
-        tpl = (template or "").strip()
-        if not tpl:
-            return ""
-        if "{q}" not in tpl:
-            join = "&" if "?" in tpl else "?"
-            tpl = tpl + join + "q={q}"
-        url = tpl.replace("{q}", urllib.parse.quote(text))
-        return f'=HYPERLINK("{url}","{label}")'
+        return core.make_hyperlink_formula(text, template, label)
 
 
     # ---------------------
@@ -1301,7 +2830,10 @@ class ExcelViewerApp:
         win.wait_window()
         return result["ok"]
 
-    def rebuild_search_columns(self):
+    def rebuild_search_columns(self, confirm: bool = True):
+        if self.store is not None:
+            self._store_rebuild_links(confirm)
+            return
         if self.current_df is None:
             return
         valid_cols = []
@@ -1313,59 +2845,33 @@ class ExcelViewerApp:
             self.select_base_columns()
             return
 
-        if self.confirm_rebuild:
+        if confirm and self.confirm_rebuild:
             if not self.confirm_rebuild_dialog():
                 return
 
         self.finish_edit(None)
-        before = self.current_df.copy()
-
-        df = self.current_df.copy()
-        # 生成対象
-        gen_ai = bool(getattr(self, 'generate_ai', True))
-        gen_google = bool(getattr(self, 'generate_google', True))
-        if (not gen_ai) and (not gen_google):
-            gen_ai = True  # どちらもOFFは事故るので救済
-
-        # 既存のリンク列は作り直す前提でいったん除外
-        base_cols = [c for c in df.columns if c not in ['AI検索', 'Google検索']]
-        df = df[base_cols].copy()
-
-        keywords = self._build_keyword_series()
-
-        link_cols = []
-        if gen_ai:
-            df['AI検索'] = keywords.apply(lambda t: self._make_hyperlink_formula(t, getattr(self, 'ai_url_template', 'https://www.perplexity.ai/search?q={q}'), 'AI検索'))
-            link_cols.append('AI検索')
-        if gen_google:
-            df['Google検索'] = keywords.apply(lambda t: self._make_hyperlink_formula(t, 'https://www.google.com/search?q={q}', 'Google検索'))
-            link_cols.append('Google検索')
-
-        # 挿入位置
-        mode = getattr(self, 'link_insert_mode', 'fixed2')
-        cols = [c for c in df.columns if c not in link_cols]
-
-        def insert_at(pos: int):
-            nonlocal cols
-            pos = max(0, min(pos, len(cols)))
-            for i, lc in enumerate(link_cols):
-                cols.insert(pos + i, lc)
-
-        if mode == 'after_base':
-            try:
-                base_pos = cols.index(self.base_col_name) + 1
-            except Exception:
-                base_pos = 1
-            insert_at(base_pos)
-        elif mode == 'rightmost':
-            insert_at(len(cols))
-        else:
-            # fixed2: 2列目固定
-            insert_at(1)
+        with self.profiler.capture("link_rebuild"):
+            before = self.current_df.copy()
 
-        df = df[cols]
+            # 既存のリンク列は作り直し、設定の挿入位置に置く
+            params = dict(
+                joiner=getattr(self, "base_joiner", " "),
+                generate_ai=bool(getattr(self, 'generate_ai', True)),
+                generate_google=bool(getattr(self, 'generate_google', True)),
+                ai_template=getattr(self, 'ai_url_template', core.DEFAULT_AI_TEMPLATE),
+                google_template=core.DEFAULT_GOOGLE_TEMPLATE,
+                insert_mode=getattr(self, 'link_insert_mode', 'fixed2'),
+                anchor_col=self.base_col_name,
+            )
+            with self.perf.span("link_rebuild") as sp:
+                df = self.doc.with_search_columns(valid_cols, **params)
+                sp.shape(df)
 
-        changed = self.commit_df(before, df, "検索リンク更新", refresh_view=True)
+            changed = self.commit_df(before, df, "検索リンク更新", refresh_view=True,
+                                     links=core.link_templates(df))
+            if changed:
+                self._journal("links", base_cols=list(valid_cols), **params)
+        self._remember_load_profile()
         self.update_status_bar()
 
         if changed and (not self._onboard_shown):
@@ -1399,8 +2905,10 @@ class ExcelViewerApp:
         """表示：Excelで見える行はすべて表示（固定なし）
         - raw_df の全行を表示
         - 指定の見出し行は強調表示し、列ヘッダ(heading)の表示文字にも使う
+        - 大きな表は見えている行・列だけ Treeview に入れ、スクロールで入れ替える（_render_table）
         """
         self.tree.delete(*self.tree.get_children())
+        self._table_rows = 0
 
         if self.raw_df is None:
             return
@@ -1414,12 +2922,6 @@ class ExcelViewerApp:
         cur_n = int(getattr(self.current_df, "shape", (0,0))[1] or 0) if self.current_df is not None else 0
         ncols = max(base_n, cur_n)
 
-        cols = [f"__c{i}__" for i in range(ncols)]
-        self.tree["columns"] = cols
-        self.tree["show"] = "headings"
-
-        self.apply_row_colors()
-
         # ヘッダ行の値をheading表示に反映
         header_vals = []
         try:
@@ -1430,10 +2932,6 @@ class ExcelViewerApp:
         # current_df の列順（検索列を含む）をそのまま尊重
         cur_cols = list(self.current_df.columns) if self.current_df is not None else []
 
-        # 表示列(index) -> raw列(index) の対応
-        # raw_df の列は header=None 読み込みなので通常 int（0,1,2...）。
-        # 検索列（AI検索/Google検索）や「行」など文字列列は raw に対応させない（None）。
-        
         # 表示列(index) -> raw列(index) の対応
         # raw_df から作った元の列名（self._current_columns）に一致する列だけ raw に対応させる。
         # 検索列（AI検索/Google検索）など追加列は raw に存在しないため None 扱い。
@@ -1457,16 +2955,11 @@ class ExcelViewerApp:
 
         self._view_to_raw_index = view_to_raw
 
-        
-        for i, col in enumerate(cols):
+        labels = []
+        for i in range(ncols):
             label = ""
             # raw列に対応する場合はヘッダ行の値を優先
-            raw_idx = None
-            try:
-                raw_idx = view_to_raw[i] if i < len(view_to_raw) else None
-            except Exception:
-                raw_idx = None
-
+            raw_idx = view_to_raw[i] if i < len(view_to_raw) else None
             if raw_idx is not None and raw_idx < len(header_vals):
                 label = header_vals[raw_idx]
             elif i < len(cur_cols):
@@ -1474,82 +2967,240 @@ class ExcelViewerApp:
                 label = str(cur_cols[i])
             elif i < len(header_vals):
                 label = header_vals[i]
+            labels.append(f"{get_excel_header(i+1)} {label}".strip())
+
+        # 列幅は列名で引き継ぐ（raw にしか無い右端の列は位置で）
+        keys = [cur_cols[i] if i < len(cur_cols) else ("raw", i) for i in range(ncols)]
+        has_data = self.current_df is not None and len(self.current_df.columns)
+        self._table_hdr = hdr_r
+        self._table_rows = hdr_r + 1 + (len(self.current_df) if has_data else 0)
+        wide = ncols > WINDOW_COLS_MIN
+        self._set_windowing(wide or self._table_rows > WINDOW_ROWS_MIN, wide)
+        self._set_column_layout(keys, labels)
+        self._render_table()
+
+    @timed("render")
+    def _render_table(self):
+        """show_dataframe で決めた列・見出しで、見えている範囲（間引かない表は全部）を Treeview に入れる。"""
+        self.tree.delete(*self.tree.get_children())
+        hdr_r, total = int(self._table_hdr), int(self._table_rows)
+        shown = self._fill_columns()
+        self.apply_row_colors()
 
-            text = f"{get_excel_header(i+1)} {label}".strip()
-            self.tree.heading(col, text=text)
-            self.tree.column(col, width=150, anchor="w")
-
-        # tag styles
+        rows_windowed = getattr(self, "_window", (False, False))[0]
+        if rows_windowed:
+            n = self._visible_rows()
+            top = max(0, min(int(getattr(self, "_view_top", 0)), max(0, total - n)))
+            if total:
+                self.vsb.set(top / total, min(1.0, (top + n) / total))
+        else:
+            top, n = 0, total
+        self._view_top = top
 
         # raw部分（0..hdr_r）をそのまま表示（リンク列は空欄）
-        view_to_raw = getattr(self, "_view_to_raw_index", [i for i in range(ncols)])
-        for r in range(0, hdr_r+1):
-            row_vals = [""] * ncols
-            for i in range(ncols):
+        view_to_raw = getattr(self, "_view_to_raw_index", None) or []
+        limit = self._display_limit()
+        for r in range(top, min(hdr_r + 1, top + n)):
+            row_vals = []
+            for i in shown:
                 raw_idx = view_to_raw[i] if i < len(view_to_raw) else None
-                if raw_idx is None:
-                    row_vals[i] = ""
-                else:
+                v = ""
+                if raw_idx is not None:
                     try:
                         v = self.raw_df.iat[r, raw_idx]
                     except Exception:
                         v = ""
-                    row_vals[i] = "" if pd.isna(v) else str(v)
+                row_vals.append("" if pd.isna(v) else core.truncate_text(str(v), limit))
             tag = ("headerrow",) if r == hdr_r else ("preheader",)
             self.tree.insert("", "end", values=row_vals, tags=tag)
 
         # data部分（hdr_r+1..）は current_df を表示（rawが短い場合は補完）
-        if self.current_df is not None:
-            for i, row in enumerate(self.current_df.itertuples(index=False)):
-                vals = [display_text(v) for v in row]
-                if len(vals) < ncols:
-                    vals += [""] * (ncols - len(vals))
+        a = max(0, top - hdr_r - 1)
+        b = min(total, top + n) - hdr_r - 1
+        if b > a:
+            df = self.current_df
+            vis = [i for i in shown if i < df.shape[1]]
+            if rows_windowed:
+                # 見えている行だけ表示文字列にする（表全体の表示文字列は作らない）
+                dl = core.display_labels(df)
+                disp = [core.display_column(df.iloc[a:b, i], dl[i], limit).tolist() for i in vis]
+            else:
+                # 表示文字列は列単位で作り、変わっていない列は前回の描画のものを使う
+                # （検索語句を持つリンク列は列名だけ表示。URL / 式はここでは作らない）
+                cols = self._display_strings().columns(df, self.doc.column_versions)
+                disp = [cols[i].tolist() for i in vis]
+            pad = ("",) * (len(shown) - len(vis))
+            rows = zip(*disp) if disp else (() for _ in range(b - a))
+            for i, row in enumerate(rows, start=a):
                 tag = ("even",) if (i % 2 == 0) else ("odd",)
-                self.tree.insert("", "end", values=vals[:ncols], tags=tag)
+                self.tree.insert("", "end", values=row + pad, tags=tag)
 
         self.update_status_bar()
+        if self.tree.get_children():
+            self._mark_first_row()
+
+
+    def _display_limit(self) -> Optional[int]:
+        """1セルに表示する最大文字数（None=制限なし）。"""
+        n = int(getattr(self, "cell_display_chars", core.DISPLAY_MAX_CHARS) or 0)
+        return n if n > 0 else None
+
+    def _display_strings(self) -> "core.DisplayCache":
+        """表示文字列のキャッシュ（1セルの表示文字数の設定を反映したもの）。"""
+        cache = getattr(self, "_display_cache", None)
+        if cache is None:
+            cache = self._display_cache = core.DisplayCache()
+        cache.limit = self._display_limit()
+        return cache
 
+    # ---------------------
+    # 長いセルのツールチップ（表示は … で切り、全文はマウスを置いたとき / 編集欄で）
+    # ---------------------
+    def _on_tree_motion(self, event):
+        row_id = self.tree.identify_row(event.y)
+        col_id = self.tree.identify_column(event.x)
+        if (row_id, col_id) == getattr(self, "_cell_tip_at", None):
+            return
+        self._hide_cell_tip()
+        self._cell_tip_at = (row_id, col_id)
+        if not row_id or not col_id or self.tree.identify_region(event.x, event.y) != "cell":
+            return
+        full = self._cell_full_text(row_id, col_id)
+        tip = getattr(self, "_cell_tip", None)
+        if full is None or tip is None:
+            return
+        tip.text = full
+        x, y = event.x_root + 12, event.y_root + 16
+        tip.id = self.tree.after(500, lambda: tip.show(x, y))
+
+    def _hide_cell_tip(self):
+        tip = getattr(self, "_cell_tip", None)
+        if tip is not None:
+            tip.hide()
+        self._cell_tip_at = None
+
+    def _cell_full_text(self, row_id, col_id) -> Optional[str]:
+        """表示を … で切ったセルの全文。切っていないセルは None。"""
+        limit = self._display_limit()
+        if not limit:
+            return None
+        try:
+            shown = str(self.tree.set(row_id, col_id))
+        except Exception:
+            return None
+        if len(shown) != limit + len(core.ELLIPSIS) or not shown.endswith(core.ELLIPSIS):
+            return None
+        c = self._column_at(col_id)
+        if c < 0:
+            return None
+        if self.store is not None:
+            disp = self.store.display_columns()
+            if c >= len(disp):
+                return None
+            if disp[c] not in self.store.columns:
+                return disp[c]  # リンク列のセルは列名だけを表示している
+            v = self.store.value(int(str(row_id)[1:]), disp[c])
+        else:
+            r = self.tree.index(row_id) + int(getattr(self, "_view_top", 0))
+            hdr_r = int(getattr(self, "_table_hdr", 0))
+            if r <= hdr_r:
+                view_to_raw = getattr(self, "_view_to_raw_index", None) or []
+                raw_c = view_to_raw[c] if c < len(view_to_raw) else None
+                if raw_c is None or self.raw_df is None:
+                    return None
+                v = self.raw_df.iat[r, raw_c]
+            else:
+                df = self.current_df
+                if df is None or r - hdr_r - 1 >= len(df) or c >= df.shape[1]:
+                    return None
+                v = df.iat[r - hdr_r - 1, c]
+        return safe_text(display_text(v))
 
     # ---------------------
     # 列幅自動調整
     # ---------------------
+    @timed("autofit")
     def auto_adjust_columns(self):
-        if self.current_df is None:
+        """列幅を表示文字列の幅（全角は半角の約2倍）に合わせる。
+        Treeview の行を1つずつ問い合わせず、データから列ごとにまとめて測る（aisv_core.column_text_width）。
+        """
+        if self.current_df is None and self.store is None:
             return
-        CHAR_WIDTH = 7
         MIN_WIDTH = 60
         MAX_WIDTH = 400
+        PAD = 16
+
+        # 列を間引いて表示しているときも Treeview に入っていない列まで全部（見出しは show_dataframe で作ったもの）
+        labels = list(getattr(self, "_col_labels", None) or [])
+        narrow, wide = self._char_px()
+        widths = self._autofit_text_widths(len(labels), narrow, wide, MAX_WIDTH - PAD)
+        fit = {}
+        for i, header_text in enumerate(labels):
+            width = max(core.text_width(header_text, narrow, wide), widths[i]) + PAD
+            fit[i] = max(MIN_WIDTH, min(width, MAX_WIDTH))
+        self._set_col_widths(fit)
 
-        for col in self.tree["columns"]:
-            header_text = self.tree.heading(col, "text")
-            max_len = len(str(header_text)) if header_text else 0
-
-            for item in self.tree.get_children():
-                val = self.tree.set(item, col)
-                if val is not None:
-                    max_len = max(max_len, len(str(val)))
+        self.toast("列幅を自動調整しました。", 1800)
 
-            width = max_len * CHAR_WIDTH + 16
-            width = max(MIN_WIDTH, min(width, MAX_WIDTH))
-            self.tree.column(col, width=width)
+    def _char_px(self) -> Tuple[int, int]:
+        """Treeview のフォントでの半角1文字・全角1文字の幅（px）。最初に1回だけ測って覚えておく。"""
+        px = getattr(self, "_char_px_cache", None)
+        if px is None:
+            try:
+                from tkinter import font as tkfont
 
-        self.toast("列幅を自動調整しました。", 1800)
+                f = tkfont.Font(root=self.root, font=ttk.Style().lookup("Treeview", "font") or "TkDefaultFont")
+                px = (max(1, f.measure("0")), max(1, f.measure("あ")))
+            except Exception:
+                px = (7, 14)
+            self._char_px_cache = px
+        return px
+
+    def _autofit_text_widths(self, ncols: int, narrow: int, wide: int, cap: int) -> List[int]:
+        """表示列ごとの、見出しより上の行 + データ行のいちばん広い表示幅（px）。"""
+        widths = [0] * ncols
+        if self.store is not None:
+            # 大容量モード：全行から等間隔に読んだ行 + 今見えている行
+            rows = self.store.sample(AUTOFIT_SAMPLE_ROWS)
+            rows += [vals for _, vals in self.store.window(self._view_top, self._visible_rows())]
+            for i in range(ncols):
+                s = pd.Series([r[i] if i < len(r) else "" for r in rows], dtype=str)
+                widths[i] = core.column_text_width(core.display_column(s, limit=self._display_limit()), narrow, wide, cap)
+            return widths
+        # データ行：表示文字列のキャッシュ（show_dataframe と共用）から列ごとに
+        data_widths = self._display_strings().widths(self.current_df, narrow, wide, cap,
+                                                     versions=self.doc.column_versions)
+        for i, w in enumerate(data_widths[:ncols]):
+            widths[i] = w
+        # 見出し行とそれより上の行（raw_df の値をそのまま表示している）
+        if self.raw_df is not None and len(self.raw_df):
+            hr = int(getattr(self, "header_row_current", getattr(self, "header_row_default", 1)) or 1)
+            hdr_r = min(max(0, hr - 1), len(self.raw_df) - 1)
+            view_to_raw = getattr(self, "_view_to_raw_index", None) or []
+            for i, raw_idx in enumerate(view_to_raw[:ncols]):
+                if raw_idx is None or raw_idx >= self.raw_df.shape[1]:
+                    continue
+                for r in range(hdr_r + 1):
+                    v = core.truncate_text(self.raw_df.iat[r, raw_idx], self._display_limit())
+                    widths[i] = max(widths[i], core.text_width(v, narrow, wide))
+        return widths
 
     # ---------------------
     # ヘッダー: シングルクリック = ソート（遅延）
     # ---------------------
     def on_header_click(self, event):
-        if self.current_df is None:
+        if self.current_df is None and self.store is None:
             return
         region = self.tree.identify_region(event.x, event.y)
+        table_cols = self._table_columns()
 
         # リンク列をクリックしたときの説明（初心者向け）
         if region == "heading":
             col = self.tree.identify_column(event.x)
             if col:
-                idx = int(col.replace("#", "")) - 1
-                if 0 <= idx < len(self.current_df.columns):
-                    col_name = self.current_df.columns[idx]
+                idx = self._column_at(col)
+                if 0 <= idx < len(table_cols):
+                    col_name = table_cols[idx]
                     if col_name in ("AI検索", "Google検索"):
                         self.toast("リンク専用列です（編集不可）。ダブルクリックで開きます。", 2400)
                         return
@@ -1560,10 +3211,10 @@ class ExcelViewerApp:
         col = self.tree.identify_column(event.x)
         if not col:
             return
-        c = int(col.replace("#", "")) - 1
-        if c < 0 or c >= len(self.current_df.columns):
+        c = self._column_at(col)
+        if c < 0 or c >= len(table_cols):
             return
-        col_name = self.current_df.columns[c]
+        col_name = table_cols[c]
 
         if col_name in ("AI検索", "Google検索"):
             return
@@ -1581,28 +3232,31 @@ class ExcelViewerApp:
         self._header_click_job = None
         col_name = self._header_click_col
         self._header_click_col = None
-        if not col_name or self.current_df is None:
+        if not col_name or (self.current_df is None and self.store is None):
             return
         self.sort_by_column(col_name)
 
+    @timed("sort")
     def sort_by_column(self, col_name):
+        if self.store is not None:
+            self._store_sort(col_name)
+            return
         if self.current_df is None:
             return
         asc = self.sort_state.get(col_name, True)
-        try:
-            self.current_df[col_name] = pd.to_numeric(self.current_df[col_name], errors='ignore')
-        except Exception:
-            pass
-        self.current_df = self.current_df.sort_values(by=col_name, ascending=asc, kind="mergesort").reset_index(drop=True)
-        self.sort_state[col_name] = not asc
-        self.sorted_col = col_name
-        self.show_dataframe(self.current_df)
+        with self.profiler.capture("sort"):
+            self.doc.sort(col_name, asc)
+            self._journal("sort", col=col_name, asc=bool(asc))
+            self.sort_state[col_name] = not asc
+            self.sorted_col = col_name
+            self._view_top = 0
+            self.show_dataframe(self.current_df)
 
     # ---------------------
     # ダブルクリック
     # ---------------------
     def on_double_click(self, event):
-        if self.current_df is None:
+        if self.current_df is None and self.store is None:
             return
 
         if self._header_click_job:
@@ -1619,10 +3273,11 @@ class ExcelViewerApp:
             col = self.tree.identify_column(event.x)
             if not col:
                 return
-            c = int(col.replace("#", "")) - 1
-            if c < 0 or c >= len(self.current_df.columns):
+            c = self._column_at(col)
+            table_cols = self._table_columns()
+            if c < 0 or c >= len(table_cols):
                 return
-            old_name = self.current_df.columns[c]
+            old_name = table_cols[c]
 
             if old_name in ("AI検索", "Google検索"):
                 return
@@ -1638,7 +3293,7 @@ class ExcelViewerApp:
     # ヘッダー名編集
     # ---------------------
     def open_header_name_editor(self, old_name):
-        if self.current_df is None:
+        if not self._table_columns():
             return
 
         win = tk.Toplevel(self.root)
@@ -1655,7 +3310,7 @@ class ExcelViewerApp:
         tk.Label(win, text="※ヘッダー：シングル=並び替え / ダブル=列名変更 / 右クリック=列一括編集", fg="gray").pack(pady=4)
 
         def apply():
-            if self.current_df is None:
+            if not self._table_columns():
                 return
             new_name = ent.get().strip()
             if not new_name:
@@ -1665,15 +3320,25 @@ class ExcelViewerApp:
                 messagebox.showerror("エラー", "その列名は予約されています。")
                 return
 
-            if new_name in self.current_df.columns and new_name != old_name:
+            if new_name in self._table_columns() and new_name != old_name:
                 messagebox.showerror("エラー", "同名の列が既にあります。")
                 return
 
+            if self.store is not None:
+                if self.store.rename_column(old_name, new_name):
+                    if self.base_col_name == old_name:
+                        self.base_col_name = new_name
+                    self.base_col_names = [new_name if c == old_name else c for c in self.base_col_names]
+                    self._store_changed(f"列名変更: {old_name} → {new_name}")
+                win.destroy()
+                return
+
             before = self.current_df.copy()
             after = self.current_df.rename(columns={old_name: new_name})
 
             changed = self.commit_df(before, after, f"列名変更: {old_name} → {new_name}", refresh_view=True)
             if changed:
+                self._journal("rename", old=old_name, new=new_name)
                 if self.base_col_name == old_name:
                     self.base_col_name = new_name
                     self.save_config()
@@ -1685,6 +3350,10 @@ class ExcelViewerApp:
     # ヘッダー右クリック（列一括編集）
     # ---------------------
     def on_header_right_click(self, event):
+        if self.store is not None:
+            if self.tree.identify_region(event.x, event.y) == "heading":
+                self.toast("大容量モードでは列一括編集は使えません。", 2400)
+            return
         if self.current_df is None:
             return
         if self.tree.identify_region(event.x, event.y) != "heading":
@@ -1693,7 +3362,7 @@ class ExcelViewerApp:
         col = self.tree.identify_column(event.x)
         if not col:
             return
-        col_index = int(col.replace("#", "")) - 1
+        col_index = self._column_at(col)
         if col_index < 0 or col_index >= len(self.current_df.columns):
             return
         col_name = self.current_df.columns[col_index]
@@ -1708,6 +3377,10 @@ class ExcelViewerApp:
     # セル編集
     # ---------------------
     def start_edit(self, event):
+        self._hide_cell_tip()
+        if self.store is not None:
+            self._store_start_edit(event)
+            return
         if self.current_df is None:
             return
         region = self.tree.identify("region", event.x, event.y)
@@ -1719,8 +3392,8 @@ class ExcelViewerApp:
         if not row_id or not col_id:
             return
 
-        r = self.tree.index(row_id)
-        c = int(col_id.replace("#", "")) - 1
+        r = self.tree.index(row_id) + int(getattr(self, "_view_top", 0))
+        c = self._column_at(col_id)
 
         # view上の行 r は raw行(0..hdr_r) + data行(0..)
         hr = int(getattr(self, "header_row_current", getattr(self, "header_row_default", 1)) or 1)
@@ -1755,7 +3428,7 @@ class ExcelViewerApp:
 
         if col_name in ("AI検索", "Google検索"):
             self.toast("リンク列です。ダブルクリックで検索を開きます（編集不可）。", 2400)
-            url = extract_url(self.current_df.iat[r, c])
+            url = core.cell_url(self.current_df, data_index, c)
             if url:
                 webbrowser.open(url)
             return
@@ -1788,6 +3461,9 @@ class ExcelViewerApp:
         self.edit_col = None
 
     def finish_edit(self, event):
+        if self.store is not None and self.edit_entry is not None:
+            self._store_finish_edit()
+            return
         if self.current_df is None or self.edit_entry is None:
             return
         val = self.edit_entry.get()
@@ -1795,6 +3471,7 @@ class ExcelViewerApp:
         c = int(self.edit_col)
         is_pre = bool(getattr(self, "_edit_is_pre", False))
         data_index = int(getattr(self, "_edit_data_index", -1))
+        hr = max(1, int(self.header_row_current or 1))
         if is_pre:
             old = display_text(self.raw_df.iat[r_view, c]) if self.raw_df is not None else ""
         else:
@@ -1813,40 +3490,20 @@ class ExcelViewerApp:
                 self._build_current_df_from_raw()
                 self.show_dataframe(self.current_df)
                 self.set_unsaved(True)
+                self._journal("pre", r=r_view, c=raw_c, v=val)
                 self._log_action(f"上部行編集: R{r_view+1}C{c+1}")
             else:
                 before = self.current_df.copy()
                 after = self.current_df.copy()
                 after.iat[data_index, c] = val
-                changed = self.commit_df(before, after, f"セル編集: R{data_index+hr+1+1}C{c+1}", refresh_view=True)
+                changed = self.commit_df(before, after, f"セル編集: R{data_index+hr+1}C{c+1}", refresh_view=True)
                 if changed:
-                    # raw_dfにも反映（データ領域）
+                    # raw_dfにも反映（データ領域。リンク列などは反映しない）
                     try:
-                        if self.raw_df is not None:
-                            hdr_r = max(0, hr-1)
-                            raw_r = (hdr_r + 1) + data_index
-                            # 表示列 -> raw列
-                            view_to_raw = getattr(self, "_view_to_raw_index", None)
-                            raw_c = None
-                            if view_to_raw and c < len(view_to_raw):
-                                raw_c = view_to_raw[c]
-                            if raw_c is None:
-                                # リンク列などはrawに反映しない
-                                raise Exception("no raw column")
-                            raw_c = int(raw_c)
-                            # rawの列数が足りなければ拡張
-                            if raw_c >= self.raw_df.shape[1]:
-                                for k in range(self.raw_df.shape[1], raw_c+1):
-                                    self.raw_df[k] = ""
-                            if raw_r < len(self.raw_df):
-                                self.raw_df.iat[raw_r, raw_c] = val
-                            else:
-                                # rawが短い場合は行追加
-                                while len(self.raw_df) <= raw_r:
-                                    self.raw_df.loc[len(self.raw_df)] = [""] * self.raw_df.shape[1]
-                                self.raw_df.iat[raw_r, raw_c] = val
+                        self.doc.mirror_to_raw(data_index, c, val)
                     except Exception:
                         pass
+                    self._journal("cell", r=data_index, c=c, v=val)
 
         self._cancel_edit()
 
@@ -1893,9 +3550,7 @@ class ExcelViewerApp:
         pv.configure(state="disabled")
 
         def compute_val(formula: str, row_no: int) -> str:
-            if "{ROW}" in formula:
-                return formula.replace("{ROW}", str(row_no))
-            return formula.replace("2", str(row_no))  # 互換（非推奨）
+            return core.formula_for_row(formula, row_no)
 
         def render_preview():
             if self.current_df is None:
@@ -1921,16 +3576,17 @@ class ExcelViewerApp:
             if self.current_df is None:
                 return
             formula = ent.get()
-            before = self.current_df.copy()
+            with self.profiler.capture("bulk_edit"), self.perf.span("bulk_edit") as sp:
+                sp.detail = col_name
+                before = self.current_df.copy()
 
-            new_col = []
-            for i in range(len(self.current_df)):
-                row_no = i + 2
-                new_col.append(compute_val(formula, row_no))
+                new_col = core.formula_column(formula, len(self.current_df))
 
-            after = self.current_df.copy()
-            after[col_name] = new_col
-            self.commit_df(before, after, f"列一括編集: {col_name}", refresh_view=True)
+                after = self.current_df.copy()
+                after[col_name] = new_col
+                sp.shape(after)
+                if self.commit_df(before, after, f"列一括編集: {col_name}", refresh_view=True):
+                    self._journal("bulk", col=col_name, formula=formula)
             win.destroy()
 
         ttk.Button(win, text="適用", command=apply_changes).pack(pady=10)
@@ -1941,11 +3597,21 @@ class ExcelViewerApp:
     def set_unsaved(self, flag: bool):
         self.unsaved_changes = flag
         self.unsaved_label.config(text="● 未保存" if flag else "")
+        if not flag:
+            # 保存済み（または読み込み直後）：ジャーナルの記録は不要（ほかのシートの分も）
+            journal = getattr(self, "journal", None)
+            if journal is not None:
+                journal.reset(self.doc.source_sig)
+            for st in getattr(self, "sheet_states", {}).values():
+                st["journal"].reset(st["doc"].source_sig)
+
     def open_new_file(self):
         if self.unsaved_changes and not messagebox.askyesno("確認", "変更を破棄して新しいファイルを開きますか？"):
             return
-        path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx *.xls")])
+        path = filedialog.askopenfilename(filetypes=OPEN_FILETYPES)
         if path:
+            if self._load_with_profile(path):
+                return
             self._load_excel_with_dialog(path, first_time=False, force_select_base=False)
     def reload_original(self):
         if not self.excel_path:
@@ -1953,6 +3619,8 @@ class ExcelViewerApp:
         msg = "元ファイルを再読み込みします。\\n（変更は破棄されます）\\n続行しますか？"
         if self.unsaved_changes and not messagebox.askyesno("再読み込み", msg):
             return
+        # 大容量モードの未保存の編集（SQLite 側）も破棄する
+        self._close_store(discard=True)
         # 再読み込み時も、見出し行/検索語句列の指定ダイアログを表示
         self._load_excel_with_dialog(self.excel_path, first_time=False, force_select_base=True)
     def prompt_open_in_excel(self, path: str):
@@ -2086,9 +3754,6 @@ class ExcelViewerApp:
             messagebox.showerror("コピー", "元ファイルが見つかりません。")
             return
 
-        # 保存内容を反映したコピーを作る（現在の表示/編集内容を書き出す）
-        out_df = self._compose_output_raw()
-
         folder = src_path.parent
         stem = src_path.stem
         suffix = src_path.suffix or ".xlsx"
@@ -2100,8 +3765,14 @@ class ExcelViewerApp:
             cand = folder / f"{stem}_copy{i}{suffix}"
             i += 1
 
+        if not self._confirm_workbook_losses(str(cand)):
+            return
         try:
-            out_df.to_excel(cand, index=False, header=False)
+            with self.profiler.capture("save_copy"):
+                # 保存内容を反映したコピーを作る（現在の表示/編集内容を書き出す）
+                with self.perf.span("save_copy") as sp:
+                    sp.detail = cand.name
+                    self._write_output(str(cand), sp)
             self.prompt_open_in_excel(str(cand))
             self.set_unsaved(False)
             self.toast(f"コピー作成: {cand.name}", 2500)
@@ -2129,8 +3800,9 @@ class ExcelViewerApp:
             return
 
         try:
-            out_df = self._compose_output_raw()
-            out_df.to_csv(csv_path, index=False, header=False, encoding="utf-8-sig")
+            with self.profiler.capture("save_csv"), self.perf.span("save_csv") as sp:
+                sp.detail = os.path.basename(csv_path)
+                self._write_output(csv_path, sp)
             self.prompt_open_in_excel(csv_path)
             self.toast("CSV保存しました", 2000)
             logging.info(f"Saved CSV: {csv_path}")
@@ -2138,12 +3810,54 @@ class ExcelViewerApp:
             messagebox.showerror("CSV", f"CSV保存に失敗しました: {e}")
 
 
+    def export_columnar(self, kind: str):
+        """Parquet / Feather に書き出す（データ処理向け。リンク列は URL、検索語句も列にする。表示中のシートのみ）。"""
+        if not self._table_columns():
+            return
+        if not core.columnar_available():
+            messagebox.showwarning(kind.capitalize(), "Parquet / Feather の書き出しには pyarrow が必要です。\n（pip install pyarrow）")
+            return
+        ext = core.COLUMNAR_FORMATS[kind]
+        try:
+            initial = Path(self.excel_path).stem + ext
+        except Exception:
+            initial = "output" + ext
+        path = filedialog.asksaveasfilename(
+            title=f"{kind.capitalize()} として書き出し",
+            defaultextension=ext,
+            initialfile=initial,
+            filetypes=[(kind.capitalize(), f"*{ext}")],
+        )
+        if not path:
+            return
+        comp = getattr(self, "export_compression", "zstd") or "zstd"
+        try:
+            self.finish_edit(None)
+            with self.profiler.capture(f"save_{kind}"), self.perf.span(f"save_{kind}") as sp:
+                sp.detail = os.path.basename(path)
+                if self.store is not None:
+                    frames = self.store.iter_export_frames()
+                    sp.cols = len(self.store.display_columns()) + 1
+                else:
+                    base = [c for c in (getattr(self, "base_col_names", None) or [self.base_col_name]) if c]
+                    frames = [core.export_frame(self.current_df, base, getattr(self, "base_joiner", " "))]
+                    sp.cols = len(frames[0].columns)
+                sp.rows = core.write_columnar(frames, path, kind, comp)
+            self.toast(f"{kind.capitalize()} に書き出しました（{sp.rows:,} 行、圧縮: {comp}）", 2400)
+            logging.info(f"Exported {kind}: {path} (rows={sp.rows}, compression={comp})")
+        except Exception as e:
+            messagebox.showerror(kind.capitalize(), f"書き出しに失敗しました: {e}")
+
     def save_current_file(self):
-        if self.current_df is None or not self.excel_path:
+        if not self._table_columns() or not self.excel_path:
+            return False
+        if not self._confirm_workbook_losses(self.excel_path):
             return False
         try:
-            out_df = self._compose_output_raw()
-            out_df.to_excel(self.excel_path, index=False, header=False)
+            with self.profiler.capture("save_overwrite"), self.perf.span("save_overwrite") as sp:
+                sp.detail = os.path.basename(self.excel_path)
+                self._write_output(self.excel_path, sp)
+                self._mark_saved(self.excel_path)
             self.prompt_open_in_excel(self.excel_path)
             self.set_unsaved(False)
             self.toast("保存しました。", 1600)
@@ -2166,21 +3880,22 @@ class ExcelViewerApp:
         else:
             csv_path = os.path.abspath(re.sub(r"\.xls[xm]?$", ".csv", self.excel_path, flags=re.IGNORECASE))
             try:
-                out_df = self._compose_output_raw()
-                out_df.to_csv(csv_path, index=False, header=False, encoding="utf-8-sig")
+                self._write_output(csv_path)
                 folder = os.path.dirname(csv_path)
                 os.startfile(folder)
             except Exception as e:
                 messagebox.showerror("エラー", f"保存/表示に失敗: {e}")
 
     def save_as_new(self):
-        if self.current_df is None:
+        if not self._table_columns():
             return
         path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx")])
-        if path:
+        if path and self._confirm_workbook_losses(path):
             try:
-                out_df = self._compose_output_raw()
-                out_df.to_excel(path, index=False, header=False)
+                with self.profiler.capture("save_as"), self.perf.span("save_as") as sp:
+                    sp.detail = os.path.basename(path)
+                    self._write_output(path, sp)
+                    self._mark_saved(path)
                 self.prompt_open_in_excel(path)
                 messagebox.showinfo("保存", "保存しました。")
                 self.set_unsaved(False)
@@ -2195,5 +3910,17 @@ def main():
     ExcelViewerApp(root)
     root.mainloop()
 
+def cli_main(argv=None):
+    """GUIなしの一括処理（aisv_cli.py と同じ）。Tk ルートは作りません。
+    例: AISearchViewer1.2.py --batch data/*.xlsx --header-row 3 --keyword-cols 商品名
+    """
+    import aisv_cli
+    return aisv_cli.main(argv)
+
 if __name__ == "__main__":
+    # exe化した状態で --batch --workers N を使う場合に必要（子プロセスの起動）
+    import multiprocessing
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        sys.exit(cli_main(sys.argv[2:]))
     main()
@@ -0,0 +1,172 @@
+"""AI検索ビューア：解析済みシートのキャッシュ（Arrow IPC、pyarrow があるときだけ、Tk 非依存）
+
+Excel を openpyxl で解析した raw_df（header=None・全セル文字列）を元ファイルごとに
+Arrow IPC ファイル（非圧縮）で保存し、次に同じファイルを開くときは解析せずに memory map で読み込みます。
+- 列は mmap したファイルをそのまま参照する（ゼロコピー。pandas 3 + pyarrow の str 列）ので、
+  巨大なシートでも読み込みは一瞬で、実際に触った部分のページだけがメモリに載る
+- 同じファイルを開いた複数のビューアは OS のページキャッシュを共有する
+- 元ファイルの (サイズ, 更新時刻) がキャッシュ作成時と違えば使わない（解析し直して作り直す）
+
+pyarrow が無い環境では available() が False になり、何もしません（今までどおり毎回解析）。
+保存先は ~/.ai_search_viewer_cache/（合計が max_bytes を超えたら古いものから消す）。
+"""
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import logging
+import os
+from typing import Optional, Sequence
+
+CACHE_DIRNAME = ".ai_search_viewer_cache"
+CACHE_VERSION = "1"
+MAX_CACHE_MB = 2048
+
+
+def available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def cache_path(folder: str, source: str, sheet: Optional[str] = None) -> str:
+    key = os.path.normcase(os.path.abspath(source))
+    if sheet is not None:
+        key += "\0" + sheet
+    h = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(folder, f"{h}.arrow")
+
+
+def _sig_text(sig) -> str:
+    return ",".join(str(int(x)) for x in sig) if sig else ""
+
+
+class SheetCache:
+    """SearchDocument.raw_cache に渡すキャッシュ（get / put）。"""
+
+    def __init__(self, folder: str, *, max_bytes: int = MAX_CACHE_MB * 1024 * 1024):
+        self.folder = folder
+        self.max_bytes = int(max_bytes)
+        self.enabled = available() and self.max_bytes > 0
+
+    def get(self, source: str, sig, usecols: Optional[Sequence[int]] = None, *, sheet: Optional[str] = None):
+        """キャッシュがあり元ファイルと一致すれば raw_df（usecols を渡すとその列だけ）。無ければ None。
+        sheet はシート名（None は最初のシート）。
+        """
+        if not self.enabled or not sig:
+            return None
+        path = cache_path(self.folder, source, sheet)
+        if not os.path.exists(path):
+            return None
+        try:
+            import pyarrow as pa
+            import pyarrow.ipc
+
+            reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+            meta = reader.schema.metadata or {}
+            if (meta.get(b"aisv_version", b"").decode() != CACHE_VERSION
+                    or meta.get(b"aisv_sig", b"").decode() != _sig_text(sig)):
+                return None
+            table = reader.read_all()  # mmap 上のバッファをそのまま参照（ここではコピーしない）
+            if usecols:
+                table = table.select([int(c) for c in usecols if 0 <= int(c) < table.num_columns])
+            df = table.to_pandas()
+        except Exception as e:
+            logging.warning(f"Sheet cache unreadable ({path}): {e}")
+            return None
+        df.columns = range(df.shape[1])
+        try:
+            os.utime(path)  # 古いものから消すときの目安
+        except OSError:
+            pass
+        return df
+
+    def put(self, source: str, sig, raw_df, *, sheet: Optional[str] = None) -> bool:
+        """全列で読んだ raw_df を書く（一時ファイル→置き換え）。書けなければ False（読み込みは続ける）。"""
+        if not self.enabled or not sig or raw_df is None:
+            return False
+        path = cache_path(self.folder, source, sheet)
+        tmp = path + ".tmp"
+        try:
+            import pyarrow as pa
+            import pyarrow.ipc
+
+            os.makedirs(self.folder, exist_ok=True)
+            # pandas の str 列（pyarrow）は large_string。string で書くと読み込み時に offsets の変換コピーが要る
+            arrays = [pa.array(raw_df.iloc[:, i], type=pa.large_string(), from_pandas=True)
+                      for i in range(raw_df.shape[1])]
+            schema = pa.schema(
+                [pa.field(str(i), pa.large_string()) for i in range(len(arrays))],
+                metadata={
+                    "aisv_version": CACHE_VERSION,
+                    "aisv_sig": _sig_text(sig),
+                    "aisv_source": os.path.abspath(source),
+                },
+            )
+            table = pa.Table.from_arrays(arrays, schema=schema)
+            # 非圧縮で書く（圧縮すると読み込み時に展開が要り、mmap のゼロコピーにならない）
+            with pa.OSFile(tmp, "wb") as f, pa.ipc.new_file(f, schema) as w:
+                w.write_table(table)
+            os.replace(tmp, path)
+        except Exception as e:
+            # 別のビューアが同じキャッシュを mmap 中だと Windows では置き換えられない
+            logging.warning(f"Sheet cache not written ({path}): {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return False
+        self.prune(keep=(path,))
+        return True
+
+    def discard(self, source: str, sheet: Optional[str] = None):
+        try:
+            os.remove(cache_path(self.folder, source, sheet))
+        except OSError:
+            pass
+
+    def prune(self, keep: Sequence[str] = ()) -> int:
+        """合計が max_bytes を超えていれば最終使用が古いものから消す。消した件数を返す。"""
+        entries = []
+        for name, size, mtime in _listing(self.folder, ".arrow"):
+            entries.append((mtime, size, os.path.join(self.folder, name)))
+        total = sum(e[1] for e in entries)
+        removed = 0
+        keep = {os.path.normcase(p) for p in keep}
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if os.path.normcase(path) in keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue  # 使用中（mmap 中）など
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self) -> int:
+        n = 0
+        for name, _, _ in _listing(self.folder, ".arrow"):
+            try:
+                os.remove(os.path.join(self.folder, name))
+                n += 1
+            except OSError:
+                pass
+        return n
+
+
+def _listing(folder: str, suffix: str):
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return []
+    out = []
+    for name in names:
+        if not name.endswith(suffix):
+            continue
+        try:
+            st = os.stat(os.path.join(folder, name))
+        except OSError:
+            continue
+        out.append((name, st.st_size, st.st_mtime))
+    return out
@@ -0,0 +1,409 @@
+"""AI検索ビューア：ベンチマーク（合成ブック生成 + コア処理の計測）
+
+例:
+    python aisv_bench.py gen --rows 100000 --cols 30 --preheader 2 -o bench_100k.xlsx
+    python aisv_bench.py run --scale 10k --scale 100k --out bench_results.json
+    python aisv_bench.py run my.xlsx --header-row 3 --keyword-cols メーカー,商品名 --repeat 5
+    python aisv_bench.py compare baseline.json bench_results.json --threshold 10
+
+計測対象（aisv_core、tkinter なし）:
+    load / header_rebuild / keyword_build / link_rebuild / sort / display / autofit / compose_output / save_xlsx / save_csv
+    （display は並び替え後の表の表示文字列の作成、autofit はその列ごとの最大表示幅。Treeview の操作は含まない）
+    save_parquet / save_feather（pyarrow がある場合。URL 列・検索語句列への変換を含む）
+結果は JSON で保存します。各操作は --repeat 回計測し、中央値と IQR（四分位範囲）を記録します。
+compare は2つの結果を比べ、しきい値を超えて遅くなった操作があれば終了コード 1 を返します。
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+import aisv_core as core
+
+# =====================
+# 規模プリセット（行数, 列数）
+# =====================
+SCALES = {
+    "10k": (10_000, 20),
+    "100k": (100_000, 30),
+    "1m": (1_000_000, 60),
+}
+
+OPS = (
+    "load", "header_rebuild", "keyword_build", "link_rebuild",
+    "sort", "display", "autofit", "compose_output", "save_xlsx", "save_csv", "save_parquet", "save_feather",
+)
+
+# =====================
+# 合成データ
+# =====================
+_MAKERS = [
+    "山田製作所", "東洋電機", "さくら食品", "北斗工業", "大和化成", "日之出産業", "みなと商事",
+    "青葉精機", "富士見ケミカル", "三つ葉物産", "光陽電子", "丸和製菓", "中央テクノ", "若葉薬品",
+    "関東ゴム", "浪速金属", "瀬戸陶器", "松風工房", "ひかり通商", "千代田ツール",
+]
+_ADJ = ["高性能", "業務用", "軽量", "防水", "省エネ", "国産", "大容量", "コンパクト", "抗菌", "耐熱"]
+_NOUN = [
+    "電動ドライバー", "ステンレスボトル", "LEDライト", "マスキングテープ", "ケーブルタイ",
+    "収納ボックス", "作業用手袋", "延長コード", "精密ピンセット", "保冷バッグ", "計量カップ",
+    "ボールペン", "モバイルバッテリー", "除菌シート", "結束バンド",
+]
+_DESC = [
+    "耐久性に優れ、長時間の使用でも性能が落ちにくい設計です。",
+    "持ち運びしやすいサイズで、現場作業にも最適です。",
+    "ご注文後、3〜5営業日で出荷いたします。",
+    "パッケージデザインは予告なく変更になる場合があります。",
+    "在庫僅少のため、お早めにご検討ください。",
+]
+_CATEGORY = ["工具", "文具", "日用品", "電材", "食品", "衛生用品", "梱包資材"]
+_EXTRA_TYPES = ("説明", "数量", "入荷日", "カテゴリ", "備考", "JANコード")
+
+
+def _product_names(n: int, rng: random.Random) -> List[str]:
+    names = []
+    for i in range(max(1, n)):
+        names.append(f"{rng.choice(_ADJ)}{rng.choice(_NOUN)} {rng.randint(1, 99)}型-{i}")
+    return names
+
+
+def synthetic_headers(cols: int) -> List[str]:
+    base = ["商品コード", "メーカー", "商品名", "価格"]
+    heads = base[:cols]
+    k = 0
+    while len(heads) < cols:
+        t = _EXTRA_TYPES[k % len(_EXTRA_TYPES)]
+        n = k // len(_EXTRA_TYPES)
+        heads.append(t if n == 0 else f"{t}{n+1}")
+        k += 1
+    return heads
+
+
+def generate_workbook(path: str, rows: int, cols: int, *, preheader: int = 2,
+                      unique_keywords: int = 0, seed: int = 0) -> Dict:
+    """合成ブックを書き出す（openpyxl の write_only で高速・省メモリ）。
+    - 見出しより上に preheader 行のタイトル/注記
+    - 商品名は unique_keywords 種類から選ぶ（重複が多い検索語句列。0 なら行数の 1/20）
+    戻り値: 生成条件（見出し行・検索語句列など）
+    """
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    cols = max(4, int(cols))
+    heads = synthetic_headers(cols)
+    names = _product_names(unique_keywords or max(10, rows // 20), rng)
+    start = datetime.date(2024, 1, 1)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    if preheader >= 1:
+        ws.append(["仕入先別 商品一覧（ベンチマーク用サンプル）"])
+    for i in range(1, preheader):
+        ws.append([f"注記{i}: 価格は税抜・単位は円です"] + [""] * (i % 3))
+    ws.append(heads)
+
+    for r in range(rows):
+        row = [f"P{r:07d}", rng.choice(_MAKERS), rng.choice(names), rng.randint(100, 99800)]
+        for h in heads[4:]:
+            if h.startswith("説明"):
+                row.append(rng.choice(_DESC) * rng.randint(1, 3))
+            elif h.startswith("数量"):
+                row.append(rng.randint(0, 500))
+            elif h.startswith("入荷日"):
+                row.append((start + datetime.timedelta(days=rng.randint(0, 700))).isoformat())
+            elif h.startswith("カテゴリ"):
+                row.append(rng.choice(_CATEGORY))
+            elif h.startswith("備考"):
+                row.append("要確認" if rng.random() < 0.05 else None)
+            else:
+                row.append(f"49{rng.randint(10**10, 10**11 - 1)}")
+        ws.append(row)
+    wb.save(path)
+    return {
+        "file": path, "rows": rows, "cols": cols, "preheader": preheader, "seed": seed,
+        "unique_keywords": len(names), "header_row": preheader + 1,
+        "keyword_cols": ["メーカー", "商品名"], "sort_col": "価格",
+    }
+
+
+def synthetic_path(workdir: str, rows: int, cols: int, preheader: int, seed: int) -> str:
+    return os.path.join(workdir, f"synthetic_{rows}x{cols}_p{preheader}_s{seed}.xlsx")
+
+
+# =====================
+# 計測
+# =====================
+def _timed(ops: Dict, name: str, fn):
+    gc.collect()
+    t0 = time.perf_counter()
+    result = fn()
+    ops[name] = round(time.perf_counter() - t0, 6)
+    return result
+
+
+def op_stats(runs: List[float]) -> Dict:
+    """計測値の中央値と IQR。seconds は中央値（代表値）。"""
+    med = statistics.median(runs)
+    if len(runs) >= 2:
+        q1, _, q3 = statistics.quantiles(runs, n=4, method="inclusive")
+        iqr = q3 - q1
+    else:
+        iqr = 0.0
+    return {"seconds": round(med, 6), "median": round(med, 6), "iqr": round(iqr, 6),
+            "runs": [round(x, 6) for x in runs]}
+
+
+def _run_once(path: str, header_row: int, keyword_cols: List[str], sort_col: Optional[str],
+              workdir: str, insert_mode: str):
+    ops: Dict[str, float] = {}
+    raw_df = _timed(ops, "load", lambda: core.read_sheet_raw(path))
+    current_df, _ = _timed(ops, "header_rebuild", lambda: core.build_table_from_raw(raw_df, header_row))
+    base_cols = core.resolve_keyword_columns(current_df, keyword_cols)
+    _timed(ops, "keyword_build", lambda: core.build_keyword_series(current_df, base_cols, " "))
+    linked = _timed(ops, "link_rebuild", lambda: core.apply_search_columns(
+        current_df, base_cols, insert_mode=insert_mode))
+    col = sort_col if sort_col in linked.columns else base_cols[0]
+    linked = _timed(ops, "sort", lambda: core.sort_table(linked, col, True))
+    shown = core.DisplayCache()
+    _timed(ops, "display", lambda: shown.columns(linked))
+    _timed(ops, "autofit", lambda: shown.widths(linked, 7, 14, 384))
+    out_df = _timed(ops, "compose_output", lambda: core.compose_output_raw(raw_df, linked, header_row))
+    stem = os.path.splitext(os.path.basename(path))[0]
+    xlsx = os.path.join(workdir, f"{stem}_bench_out.xlsx")
+    csv = os.path.join(workdir, f"{stem}_bench_out.csv")
+    _timed(ops, "save_xlsx", lambda: core.write_output(out_df, xlsx))
+    _timed(ops, "save_csv", lambda: core.write_output(out_df, csv))
+    outs = [xlsx, csv]
+    if core.columnar_available():
+        for kind, ext in core.COLUMNAR_FORMATS.items():
+            dst = os.path.join(workdir, f"{stem}_bench_out{ext}")
+            _timed(ops, f"save_{kind}", lambda: core.write_columnar(
+                [core.export_frame(linked, base_cols)], dst, kind))
+            outs.append(dst)
+    for p in outs:
+        try:
+            os.remove(p)
+        except Exception:
+            pass
+    return ops, current_df.shape, base_cols
+
+
+def run_case(path: str, header_row: int, keyword_cols: List[str], sort_col: Optional[str],
+             workdir: str, *, insert_mode: str = "fixed2", repeat: int = 1) -> Dict:
+    """1ファイル分の処理を GUI と同じ順で repeat 回実行し、操作ごとの中央値/IQR を返す。"""
+    runs: Dict[str, List[float]] = {op: [] for op in OPS}
+    shape, base_cols = (0, 0), []
+    for _ in range(max(1, int(repeat))):
+        ops, shape, base_cols = _run_once(path, header_row, keyword_cols, sort_col, workdir, insert_mode)
+        for op, sec in ops.items():
+            runs[op].append(sec)
+    return {
+        "file": os.path.abspath(path),
+        "rows": int(shape[0]),
+        "cols": int(shape[1]),
+        "header_row": header_row,
+        "keyword_cols": list(base_cols),
+        "repeat": max(1, int(repeat)),
+        "ops": {op: op_stats(v) for op, v in runs.items() if v},
+    }
+
+
+# =====================
+# 比較（回帰チェック）
+# =====================
+def _op_median_iqr(v: Dict):
+    med = v.get("median", v.get("seconds", 0.0))
+    return float(med), float(v.get("iqr", 0.0))
+
+
+def compare_results(base: Dict, new: Dict, *, threshold_pct: float = 10.0,
+                    min_delta: float = 0.005, ops: Optional[List[str]] = None) -> List[Dict]:
+    """2つの結果（run の JSON）をケース名・操作名で突き合わせる。
+
+    回帰と判定する条件（ノイズ対策で3つとも満たす場合のみ）:
+    - 新しい中央値が基準より threshold_pct % 以上遅い
+    - 差が両者の IQR の大きい方を超える
+    - 差が min_delta 秒を超える（ごく短い操作の揺れを無視）
+    改善も同じ条件を逆向きに適用します。
+    """
+    base_cases = {c.get("name", c.get("file")): c for c in base.get("cases", [])}
+    rows = []
+    for c in new.get("cases", []):
+        name = c.get("name", c.get("file"))
+        b = base_cases.get(name)
+        if b is None:
+            continue
+        for op, v in c.get("ops", {}).items():
+            if ops and op not in ops:
+                continue
+            if op not in b.get("ops", {}):
+                continue
+            b_med, b_iqr = _op_median_iqr(b["ops"][op])
+            n_med, n_iqr = _op_median_iqr(v)
+            delta = n_med - b_med
+            noise = max(b_iqr, n_iqr, min_delta)
+            pct = (delta / b_med * 100.0) if b_med > 0 else 0.0
+            if delta > noise and pct > threshold_pct:
+                status = "REGRESSION"
+            elif -delta > noise and -pct > threshold_pct:
+                status = "faster"
+            else:
+                status = "same"
+            rows.append({
+                "case": name, "op": op, "base": b_med, "new": n_med,
+                "speedup": (b_med / n_med) if n_med > 0 else float("inf"),
+                "change_pct": pct, "status": status,
+            })
+    return rows
+
+
+def print_comparison(rows: List[Dict]):
+    print(f"{'case':<14} {'op':<15} {'base(s)':>10} {'new(s)':>10} {'speedup':>8} {'change':>8}  status")
+    for r in rows:
+        print(f"{str(r['case'])[:14]:<14} {r['op']:<15} {r['base']:>10.3f} {r['new']:>10.3f} "
+              f"{r['speedup']:>7.2f}x {r['change_pct']:>+7.1f}%  {r['status']}")
+
+
+def environment() -> Dict:
+    try:
+        import openpyxl
+        openpyxl_ver = openpyxl.__version__
+    except Exception:
+        openpyxl_ver = ""
+    try:
+        import pyarrow
+        pyarrow_ver = pyarrow.__version__
+    except Exception:
+        pyarrow_ver = ""
+    try:
+        rev = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip()
+    except Exception:
+        rev = ""
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "pandas": pd.__version__,
+        "openpyxl": openpyxl_ver,
+        "pyarrow": pyarrow_ver,
+        "git_rev": rev,
+    }
+
+
+# =====================
+# 引数
+# =====================
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="aisv_bench", description="AI検索ビューアのベンチマーク")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    g = sub.add_parser("gen", help="合成ブックを生成")
+    g.add_argument("--rows", type=int, default=10_000)
+    g.add_argument("--cols", type=int, default=20, help="列数（4〜）")
+    g.add_argument("--preheader", type=int, default=2, help="見出しより上の行数")
+    g.add_argument("--unique-keywords", type=int, default=0, help="商品名の種類数（0=行数の1/20）")
+    g.add_argument("--seed", type=int, default=0)
+    g.add_argument("-o", "--output", required=True)
+
+    r = sub.add_parser("run", help="計測を実行して JSON に保存")
+    r.add_argument("files", nargs="*", help="計測するExcel（省略時は --scale の合成ブック）")
+    r.add_argument("--scale", action="append", choices=sorted(SCALES), help="合成ブックの規模（複数可）")
+    r.add_argument("--cols", type=int, default=0, help="合成ブックの列数（0=規模の既定）")
+    r.add_argument("--preheader", type=int, default=2)
+    r.add_argument("--seed", type=int, default=0)
+    r.add_argument("--header-row", type=int, default=1, help="files 指定時の見出し行")
+    r.add_argument("--keyword-cols", default="1", help="files 指定時の検索語句列（列名/列番号のカンマ区切り）")
+    r.add_argument("--sort-col", default=None, help="並び替えに使う列名（既定: 価格 / 検索語句列）")
+    r.add_argument("--workdir", default=None, help="合成ブック・一時出力の置き場（既定: 一時フォルダ）")
+    r.add_argument("--repeat", type=int, default=3, help="各ケースの繰り返し回数（中央値/IQRを記録）")
+    r.add_argument("--out", default="bench_results.json", help="結果JSONの保存先")
+
+    c = sub.add_parser("compare", help="2つの結果JSONを比較（回帰があれば終了コード1）")
+    c.add_argument("baseline", help="基準となる結果JSON")
+    c.add_argument("current", help="比較する結果JSON")
+    c.add_argument("--threshold", type=float, default=10.0, help="回帰とみなす遅延率（%%）。既定: 10")
+    c.add_argument("--min-delta", type=float, default=0.005, help="無視する差（秒）。既定: 0.005")
+    c.add_argument("--ops", default="", help="対象の操作（カンマ区切り。例: load,link_rebuild,save_xlsx）")
+    return p
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.cmd == "gen":
+        t0 = time.perf_counter()
+        info = generate_workbook(args.output, args.rows, args.cols, preheader=args.preheader,
+                                 unique_keywords=args.unique_keywords, seed=args.seed)
+        print(f"generated {args.output} ({info['rows']} rows x {info['cols']} cols, "
+              f"header_row={info['header_row']}) in {time.perf_counter() - t0:.1f}s")
+        return 0
+
+    if args.cmd == "compare":
+        with open(args.baseline, encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.current, encoding="utf-8") as f:
+            new = json.load(f)
+        ops = [o.strip() for o in args.ops.split(",") if o.strip()]
+        rows = compare_results(base, new, threshold_pct=args.threshold, min_delta=args.min_delta, ops=ops)
+        if not rows:
+            print("no matching cases/ops", file=sys.stderr)
+            return 2
+        print_comparison(rows)
+        regressions = [r for r in rows if r["status"] == "REGRESSION"]
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold:g}%")
+            return 1
+        print("no regressions")
+        return 0
+
+    workdir = args.workdir or os.path.join(tempfile.gettempdir(), "aisv_bench")
+    os.makedirs(workdir, exist_ok=True)
+
+    cases = []
+    for name in (args.scale or []):
+        rows, cols = SCALES[name]
+        cols = args.cols or cols
+        path = synthetic_path(workdir, rows, cols, args.preheader, args.seed)
+        if not os.path.exists(path):
+            print(f"generating {path} ...", flush=True)
+            generate_workbook(path, rows, cols, preheader=args.preheader, seed=args.seed)
+        cases.append((name, path, args.preheader + 1, ["メーカー", "商品名"], args.sort_col or "価格"))
+    keyword_cols = [c.strip() for c in str(args.keyword_cols).split(",") if c.strip()]
+    for f in args.files:
+        cases.append((os.path.basename(f), f, args.header_row, keyword_cols, args.sort_col))
+    if not cases:
+        print("nothing to run: give files or --scale", file=sys.stderr)
+        return 2
+
+    results = []
+    for name, path, header_row, kcols, sort_col in cases:
+        print(f"[{name}] {path}", flush=True)
+        res = run_case(path, header_row, kcols, sort_col, workdir, repeat=args.repeat)
+        res["name"] = name
+        results.append(res)
+        for op, v in res["ops"].items():
+            print(f"  {op:<15} {v['median']:>10.3f}s  (IQR {v['iqr']:.3f}s, n={len(v['runs'])})")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"meta": environment(), "cases": results}, f, ensure_ascii=False, indent=2)
+    print(f"saved {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
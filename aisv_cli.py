@@ -0,0 +1,295 @@
+"""AI検索ビューア：コマンドライン一括処理（GUIなし・tkinter不要）
+
+例:
+    python aisv_cli.py "C:/data/*.xlsx" --header-row 3 --keyword-cols メーカー,商品名 --out-dir out
+    python aisv_cli.py a.xlsx b.xlsx --keyword-cols 2 --insert-mode rightmost --format csv
+    python aisv_cli.py "C:/data/*.xlsx" --keyword-cols 2 --workers 8 --report report.json
+    python aisv_cli.py "C:/data/*.xlsx" --header-row auto --keyword-cols auto
+
+出力は GUI の保存（_compose_output_raw）と同じレイアウトです。
+"""
+import argparse
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import aisv_core as core
+
+
+# =====================
+# 入力ファイルの展開
+# =====================
+def expand_inputs(patterns: List[str]) -> List[str]:
+    """ファイル名 / glob パターンを実ファイルの一覧に展開する（重複除去・順序維持）。"""
+    files: List[str] = []
+    for p in patterns:
+        if glob.has_magic(p):
+            hits = sorted(glob.glob(p, recursive=True))
+        else:
+            hits = [p]
+        for h in hits:
+            if h not in files:
+                files.append(h)
+    return files
+
+
+def output_path_for(src: str, out_dir: Optional[str], suffix: str, fmt: str) -> str:
+    src_path = Path(src)
+    folder = Path(out_dir) if out_dir else src_path.parent
+    return str(folder / f"{src_path.stem}{suffix}.{fmt}")
+
+
+def plan_outputs(files: List[str], out_dir: Optional[str], suffix: str, fmt: str) -> List[tuple]:
+    """入力ごとの (src, dst)。別フォルダの同名ファイルなどで出力先が重なる場合は
+    2件目以降に _2, _3 … を付けて別のファイルにする（並列実行で同じファイルを書き合わないように）。
+    """
+    jobs: List[tuple] = []
+    used = set()
+    for src in files:
+        dst = output_path_for(src, out_dir, suffix, fmt)
+        base, ext = os.path.splitext(dst)
+        n = 1
+        while os.path.normcase(os.path.abspath(dst)) in used:
+            n += 1
+            dst = f"{base}_{n}{ext}"
+        if n > 1:
+            logging.warning(f"Output name clash, renamed: {src} -> {dst}")
+        used.add(os.path.normcase(os.path.abspath(dst)))
+        jobs.append((src, dst))
+    return jobs
+
+
+def default_report_path(out_dir: Optional[str], outputs: List[str]) -> str:
+    """集計レポートの既定の保存先：出力フォルダ（--out-dir 無しなら出力ファイルの共通フォルダ）。"""
+    name = "aisv_batch_report.json"
+    if out_dir:
+        return os.path.join(out_dir, name)
+    folders = [os.path.dirname(os.path.abspath(p)) for p in outputs]
+    if not folders:
+        return name
+    try:
+        folder = os.path.commonpath(folders)
+    except ValueError:
+        folder = folders[0]  # ドライブが違う場合
+    return os.path.join(folder, name)
+
+
+# =====================
+# 1ファイル処理
+# =====================
+def process_file(src: str, dst: str, args: argparse.Namespace) -> int:
+    """1ファイル読み込み→リンク列生成→書き出し。戻り値はデータ行数。"""
+    raw_df = core.read_sheet_raw(src)
+    header_row = args.header_row
+    if header_row == "auto":
+        header_row = core.detect_header_row(raw_df.head(core.SNIFF_ROWS))
+    current_df, _ = core.build_table_from_raw(raw_df, header_row)
+    if len(current_df.columns) == 0:
+        raise ValueError("no columns")
+    if args.keyword_cols == ["auto"]:
+        guess = core.guess_keyword_column(current_df)
+        if guess is None:
+            raise ValueError("keyword column not detected")
+        base_cols = [guess]
+    else:
+        base_cols = core.resolve_keyword_columns(current_df, args.keyword_cols)
+    if header_row != args.header_row or args.keyword_cols == ["auto"]:
+        logging.info(f"Detected: {src}: header_row={header_row}, keyword_cols={base_cols}")
+    current_df = core.apply_search_columns(
+        current_df,
+        base_cols,
+        joiner=args.joiner,
+        generate_ai=not args.no_ai,
+        generate_google=not args.no_google,
+        ai_template=args.ai_template,
+        google_template=args.google_template,
+        insert_mode=args.insert_mode,
+    )
+    out_df = core.compose_output_raw(raw_df, current_df, header_row)
+    core.write_output(out_df, dst)
+    return len(current_df)
+
+
+def run_one(src: str, dst: str, args: argparse.Namespace) -> Dict:
+    """process_file を実行して結果レコードを返す（例外は外に出さない）。
+    プロセスプール側で実行されるため、トップレベル関数にしています。
+    """
+    rec = {"input": src, "output": dst, "status": "ok", "rows": 0, "seconds": 0.0, "error": ""}
+    t0 = time.perf_counter()
+    try:
+        rec["rows"] = process_file(src, dst, args)
+    except Exception as e:
+        rec["status"] = "failed"
+        rec["error"] = f"{type(e).__name__}: {e}"
+    rec["seconds"] = round(time.perf_counter() - t0, 4)
+    return rec
+
+
+def run_jobs(jobs: List[tuple], args: argparse.Namespace, workers: int) -> List[Dict]:
+    """(src, dst) のリストを処理する。workers>1 ならプロセスプールで並列実行。
+    失敗したファイルがあっても残りは続行します。
+    """
+    records: List[Dict] = []
+
+    def _report(rec: Dict):
+        records.append(rec)
+        if rec["status"] == "ok":
+            logging.info(f"Saved: {rec['output']} ({rec['rows']} rows, {rec['seconds']:.2f}s)")
+        else:
+            logging.error(f"Failed: {rec['input']}: {rec['error']}")
+
+    if workers <= 1 or len(jobs) <= 1:
+        for src, dst in jobs:
+            _report(run_one(src, dst, args))
+        return records
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = {pool.submit(run_one, src, dst, args): (src, dst) for src, dst in jobs}
+        for fut in as_completed(futures):
+            src, dst = futures[fut]
+            try:
+                rec = fut.result()
+            except Exception as e:
+                # ワーカープロセス自体が落ちた場合（メモリ不足など）
+                rec = {"input": src, "output": dst, "status": "failed", "rows": 0,
+                       "seconds": 0.0, "error": f"{type(e).__name__}: {e}"}
+            _report(rec)
+    return records
+
+
+def summarize(records: List[Dict], wall_seconds: float, workers: int) -> Dict:
+    """件数・所要時間・スループットの集計。"""
+    ok = [r for r in records if r["status"] == "ok"]
+    busy = sum(r["seconds"] for r in records)
+    rows = sum(r["rows"] for r in ok)
+    wall = max(wall_seconds, 1e-9)
+    return {
+        "workers": workers,
+        "files": len(records),
+        "ok": len(ok),
+        "failed": sum(1 for r in records if r["status"] == "failed"),
+        "skipped": sum(1 for r in records if r["status"] == "skipped"),
+        "rows": rows,
+        "wall_seconds": round(wall_seconds, 3),
+        "busy_seconds": round(busy, 3),
+        "files_per_sec": round(len(ok) / wall, 3),
+        "rows_per_sec": round(rows / wall, 1),
+        # 平均同時実行数（各ファイルの所要時間の合計 / 実時間）。
+        # CPUコア数を超える workers ではコア待ちも含むため、逐次比の速度向上とは一致しません。
+        "avg_concurrency": round(busy / wall, 2),
+    }
+
+
+def write_report(path: str, summary: Dict, records: List[Dict]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"summary": summary, "files": records}, f, ensure_ascii=False, indent=2)
+
+
+# =====================
+# 引数
+# =====================
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="aisv_cli",
+        description="Excelに AI検索/Google検索 リンク列を一括で追加します（GUIなし）。",
+    )
+    p.add_argument("inputs", nargs="+", help="入力ファイル（xlsx / csv / tsv。glob可。例: data/*.xlsx）")
+    p.add_argument("--header-row", default="1", help="見出し行（1〜 または auto=自動検出）。既定: 1")
+    p.add_argument(
+        "--keyword-cols", default="1",
+        help="検索語句列。列名 または 列番号（1〜）をカンマ区切り、または auto（自動推定）。既定: 1",
+    )
+    p.add_argument("--joiner", default=" ", help='複数列を結合する区切り（"\\t" 可）。既定: 半角スペース')
+    p.add_argument("--ai-template", default=core.DEFAULT_AI_TEMPLATE, help="AI検索URLテンプレ（{q}=検索語句）")
+    p.add_argument("--google-template", default=core.DEFAULT_GOOGLE_TEMPLATE, help="Google検索URLテンプレ（{q}=検索語句）")
+    p.add_argument("--no-ai", action="store_true", help="AI検索 列を生成しない")
+    p.add_argument("--no-google", action="store_true", help="Google検索 列を生成しない")
+    p.add_argument("--insert-mode", choices=core.INSERT_MODES, default="fixed2",
+                   help="リンク列の挿入位置（fixed2=2列目固定 / after_base=検索語句列の右 / rightmost=一番右）")
+    p.add_argument("--out-dir", default=None, help="出力フォルダ（既定: 入力と同じフォルダ）")
+    p.add_argument("--suffix", default="_links", help="出力ファイル名の接尾辞。既定: _links")
+    p.add_argument("--format", choices=("xlsx", "csv"), default="xlsx", help="出力形式。既定: xlsx")
+    p.add_argument("--overwrite", action="store_true", help="出力先が既にあれば上書きする")
+    p.add_argument("--workers", type=int, default=1,
+                   help="並列プロセス数（0=CPUコア数）。既定: 1（逐次）")
+    p.add_argument("--report", default=None,
+                   help="集計レポート(JSON)の保存先。"
+                        "既定: 出力フォルダ（--out-dir 無しなら出力ファイルのフォルダ）の aisv_batch_report.json")
+    return p
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    args = build_parser().parse_args(argv)
+    args.keyword_cols = [c.strip() for c in str(args.keyword_cols).split(",") if c.strip()]
+    args.joiner = args.joiner.replace("\\t", "\t")
+    if str(args.header_row).lower() == "auto":
+        args.header_row = "auto"
+    else:
+        try:
+            args.header_row = int(args.header_row)
+        except ValueError:
+            raise SystemExit("--header-row は 1 以上の整数 または auto で指定してください。")
+        if args.header_row < 1:
+            raise SystemExit("--header-row は 1 以上で指定してください。")
+    if [c.lower() for c in args.keyword_cols] == ["auto"]:
+        args.keyword_cols = ["auto"]
+    if args.workers <= 0:
+        args.workers = os.cpu_count() or 1
+    return args
+
+
+# =====================
+# Main
+# =====================
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+    args = parse_args(argv)
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        logging.error("No input files matched.")
+        return 2
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    planned = plan_outputs(files, args.out_dir, args.suffix, args.format)
+    jobs = []
+    skipped: List[Dict] = []
+    for src, dst in planned:
+        if os.path.exists(dst) and not args.overwrite:
+            logging.warning(f"Skipped (exists): {dst}")
+            skipped.append({"input": src, "output": dst, "status": "skipped", "rows": 0,
+                            "seconds": 0.0, "error": "output exists"})
+            continue
+        jobs.append((src, dst))
+
+    t0 = time.perf_counter()
+    records = run_jobs(jobs, args, args.workers)
+    wall = time.perf_counter() - t0
+
+    records = skipped + sorted(records, key=lambda r: files.index(r["input"]))
+    summary = summarize(records, wall, args.workers)
+    report = args.report or default_report_path(args.out_dir, [dst for _, dst in planned])
+    try:
+        write_report(report, summary, records)
+    except Exception as e:
+        logging.warning(f"Report save failed: {e}")
+
+    logging.info(
+        f"Done: {summary['ok']}/{len(files)} files in {summary['wall_seconds']:.2f}s "
+        f"({summary['files_per_sec']} files/s, {summary['rows_per_sec']} rows/s, "
+        f"workers={args.workers}, concurrency {summary['avg_concurrency']})"
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,1255 @@
+"""AI検索ビューアのコアエンジン（Tk 非依存）。
+
+GUI（AISearchViewer1.2.py）はこのモジュールに処理を任せます。
+- SearchDocument: 1シートぶんの文書モデル（raw_df / current_df / 見出し行 / Undo・Redo）
+- 見出し行からの表（current_df）の組み立て
+- 検索語句の合成と AI検索/Google検索 リンク列の生成
+- 並び替え
+- 保存用レイアウト（見出しより上 + 見出し行 + データ）の合成と書き出し
+- Parquet / Feather への書き出し（pyarrow がある場合。リンク列は URL、検索語句も列にする）
+tkinter は import しません（夜間バッチ・ベンチマーク等から利用可能）。
+pandas は最初に使う時点で import します（GUI の起動を待たせないため）。
+"""
+from __future__ import annotations
+
+import importlib.util
+import itertools
+import os
+import re
+import string
+import urllib.parse
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import aisv_csv
+from aisv_startup import LazyModule
+
+pd = LazyModule("pandas")
+
+# =====================
+# 定数
+# =====================
+AI_COL = "AI検索"
+GOOGLE_COL = "Google検索"
+LINK_COLS = (AI_COL, GOOGLE_COL)
+
+DEFAULT_AI_TEMPLATE = "https://www.perplexity.ai/search?q={q}"
+DEFAULT_GOOGLE_TEMPLATE = "https://www.google.com/search?q={q}"
+
+INSERT_MODES = ("fixed2", "after_base", "rightmost")
+
+LINKS_ATTR = "aisv_links"  # df.attrs のキー：{リンク列名: URL テンプレート}。この列のセルは検索語句そのもの
+KEYWORD_COL = "検索語句"  # Parquet / Feather に書き出す検索語句の列
+COLUMNAR_FORMATS = {"parquet": ".parquet", "feather": ".feather"}
+COLUMNAR_COMPRESSIONS = ("zstd", "lz4", "none")  # Parquet / Feather のどちらでも使えるもの
+DISPLAY_MAX_CHARS = 200  # 1セルに表示する文字数の既定値（超える分は ELLIPSIS にする。0=制限なし）
+ELLIPSIS = "…"
+
+
+# =====================
+# Utility Functions
+# =====================
+def safe_text(v):
+    return "" if pd.isna(v) else str(v)
+
+
+def get_excel_header(col_index):
+    result = ""
+    while col_index > 0:
+        col_index, rem = divmod(col_index - 1, 26)
+        result = string.ascii_uppercase[rem] + result
+    return result
+
+
+_HYPERLINK_URL_RE = re.compile(r'HYPERLINK\("(.+?)"')
+_HYPERLINK_LABEL_RE = re.compile(r',"(.+?)"\)')
+
+
+def extract_url(v):
+    if isinstance(v, str) and "HYPERLINK(" in v:
+        m = _HYPERLINK_URL_RE.search(v)
+        if m:
+            return m.group(1)
+    return None
+
+
+def display_text(v):
+    if isinstance(v, str):
+        if v.startswith("=HYPERLINK"):
+            m = _HYPERLINK_LABEL_RE.search(v)
+            if m:
+                return m.group(1)
+        return v
+    if pd.isna(v):
+        return ""
+    return v
+
+
+def truncate_text(v, limit: Optional[int]):
+    """表示用に limit 文字で切って … を付ける（文字列でない値、limit が 0 / None ならそのまま）。"""
+    if limit and isinstance(v, str) and len(v) > limit:
+        return v[:limit] + ELLIPSIS
+    return v
+
+
+def url_template(template: str) -> str:
+    """URL テンプレートの補い（{q} が無ければ q= を足す）。空なら ""。"""
+    tpl = (template or "").strip()
+    if tpl and "{q}" not in tpl:
+        tpl += ("&" if "?" in tpl else "?") + "q={q}"
+    return tpl
+
+
+def link_url(text, template: str) -> Optional[str]:
+    """検索語句から URL を作る（template 内の {q} を URL エンコードした語句に置換）。語句かテンプレートが空なら None。"""
+    text = safe_text(text)
+    tpl = url_template(template)
+    if not text or not tpl:
+        return None
+    return tpl.replace("{q}", urllib.parse.quote(text))
+
+
+def make_hyperlink_formula(text, template: str, label: str) -> str:
+    """Excelの=HYPERLINK式を作る（template内の{q}をURLエンコードした検索語句に置換）"""
+    url = link_url(text, template)
+    return f'=HYPERLINK("{url}","{label}")' if url else ""
+
+
+# =====================
+# 読み込み / 表の組み立て
+# =====================
+def read_sheet_raw(path: str, *, nrows: Optional[int] = None,
+                   usecols: Optional[Sequence[int]] = None, sheet_name: Optional[str] = None) -> pd.DataFrame:
+    """Excelを header=None・全セル文字列で読み込む（GUIと同じ読み方）。
+    usecols（元の列位置、0始まり）を渡すとその列だけ解析し、列ラベルは 0.. に振り直す。
+    sheet_name を省略すると最初のシート。CSV / TSV（aisv_csv.TEXT_EXTS）は文字コード・区切りを判定して読む。
+    """
+    if aisv_csv.is_text_table(path):
+        return aisv_csv.read_text_raw(path, nrows=nrows, usecols=usecols)
+    df = pd.read_excel(path, sheet_name=sheet_name if sheet_name is not None else 0, header=None, dtype=str,
+                       engine="openpyxl", nrows=nrows, usecols=list(usecols) if usecols else None)
+    if usecols:
+        df.columns = range(df.shape[1])
+    return df
+
+
+def parse_column_spec(spec: str) -> Optional[List[int]]:
+    """「A:C,F,10-12」のような列指定を元の列位置（0始まり・昇順）にする。空なら None（全列）。
+    Excel の列記号と列番号（1〜）のどちらでも書けます。
+    """
+    spec = (spec or "").strip()
+    if not spec:
+        return None
+
+    def one(tok: str) -> int:
+        tok = tok.strip()
+        if tok.isdigit():
+            n = int(tok)
+        elif tok.isalpha() and tok.isascii():
+            n = 0
+            for ch in tok.upper():
+                n = n * 26 + (ord(ch) - 64)
+        else:
+            raise ValueError(f"列の指定が読めません: {tok}")
+        if n < 1:
+            raise ValueError(f"列の指定が読めません: {tok}")
+        return n - 1
+
+    out = set()
+    for part in re.split(r"[,、\s]+", spec):
+        if not part:
+            continue
+        m = re.fullmatch(r"(\w+)\s*[:\-]\s*(\w+)", part)
+        if m:
+            a, b = one(m.group(1)), one(m.group(2))
+            out.update(range(min(a, b), max(a, b) + 1))
+        else:
+            out.add(one(part))
+    return sorted(out)
+
+
+def format_column_spec(usecols: Optional[Sequence[int]]) -> str:
+    """parse_column_spec の逆（連続する列は A:C のようにまとめる）。"""
+    if not usecols:
+        return ""
+    cols = sorted(set(int(c) for c in usecols))
+    parts = []
+    start = prev = cols[0]
+    for c in cols[1:] + [None]:
+        if c is not None and c == prev + 1:
+            prev = c
+            continue
+        a, b = get_excel_header(start + 1), get_excel_header(prev + 1)
+        parts.append(a if start == prev else f"{a}:{b}")
+        if c is not None:
+            start = prev = c
+    return ",".join(parts)
+
+
+def header_index(raw_df: pd.DataFrame, header_row: int) -> int:
+    """見出し行（1始まり）を raw_df の行位置（0始まり・範囲内）に変換する。"""
+    hr = max(1, int(header_row or 1))
+    return min(hr - 1, max(0, len(raw_df) - 1))
+
+
+def make_unique_headers(header_vals: Sequence[str]) -> List[str]:
+    """空ヘッダは Excel列名で補い、重複ヘッダはサフィックスで回避する。"""
+    cols = []
+    for i, v in enumerate(header_vals):
+        name = (v or "").strip()
+        if not name:
+            name = f"列{get_excel_header(i+1)}"
+        cols.append(name)
+    seen: Dict[str, int] = {}
+    uniq = []
+    for c in cols:
+        if c not in seen:
+            seen[c] = 1
+            uniq.append(c)
+        else:
+            seen[c] += 1
+            uniq.append(f"{c}_{seen[c]}")
+    return uniq
+
+
+def build_table_from_raw(raw_df: pd.DataFrame, header_row: int) -> Tuple[pd.DataFrame, List[str]]:
+    """raw_df(全行) と見出し行から (current_df, 見出し行の生の値) を作る。"""
+    hdr_r = header_index(raw_df, header_row)
+    ncols = int(raw_df.shape[1] or 0)
+    header_vals: List[str] = []
+    if ncols > 0 and len(raw_df) > 0:
+        header_vals = ["" if pd.isna(v) else str(v) for v in raw_df.iloc[hdr_r].tolist()]
+        if len(header_vals) < ncols:
+            header_vals += [""] * (ncols - len(header_vals))
+        header_vals = header_vals[:ncols]
+    uniq = make_unique_headers(header_vals)
+    data = raw_df.iloc[hdr_r+1:].copy()
+    data.columns = uniq[:data.shape[1]]
+    data = data.fillna("").astype(str)
+    return data.reset_index(drop=True), header_vals
+
+
+# =====================
+# 見出し行 / 検索語句列の自動検出
+# =====================
+HEADER_SCAN_ROWS = 30     # 見出し行の候補にする先頭行数
+SNIFF_ROWS = 120          # 自動検出のために読む行数（見出し候補 + データの見本）
+KEYWORD_SAMPLE_ROWS = 200  # 検索語句列の推定に使うデータ行数
+
+
+def _cell_kind(v) -> str:
+    """"" / "num" / "text" のどれか。"""
+    t = safe_text(v).strip()
+    if not t:
+        return ""
+    try:
+        float(t.replace(",", ""))
+        return "num"
+    except ValueError:
+        return "text"
+
+
+def score_header_rows(raw_head: pd.DataFrame, max_rows: int = HEADER_SCAN_ROWS) -> List[Tuple[int, float]]:
+    """先頭 max_rows 行それぞれの「見出し行らしさ」。[(行番号(1始まり), スコア)]（スコア降順）。
+
+    - 埋まり具合（表の幅に対する非空セルの割合）
+    - 値の重複の少なさ / 文字列の割合
+    - 新しさ（同じ値がその列の下の行に出てこない。データの値は繰り返しやすい）
+    - 直下の行も埋まっているか（データが続くか）
+    - 直上の行より明らかに埋まっているか（タイトル行の下 = 表の始まり）
+    - 型の切り替わり（見出しは文字列、その下が数値の列の割合）
+    """
+    if raw_head is None or len(raw_head) == 0:
+        return []
+    n = min(len(raw_head), max_rows + 20)
+    texts = [[safe_text(v).strip() for v in raw_head.iloc[r].tolist()] for r in range(n)]
+    kinds = [[_cell_kind(v) for v in row] for row in texts]
+    fills = [sum(1 for k in row if k) for row in kinds]
+    width = max(fills) or 1
+
+    scored = []
+    for r in range(min(n, max_rows)):
+        filled = fills[r]
+        if filled == 0:
+            continue
+        fill = filled / width
+        vals = texts[r]
+        nonempty = [v for v in vals if v]
+        uniq = len(set(nonempty)) / len(nonempty)
+        text = sum(1 for k in kinds[r] if k == "text") / filled
+
+        later = texts[r + 1:r + 21]
+        repeats = sum(
+            1 for c, v in enumerate(vals)
+            if v and any(c < len(row) and row[c] == v for row in later)
+        )
+        novelty = 1.0 - repeats / filled if later else 0.5
+
+        below = kinds[r + 1:r + 6]
+        below_fill = (sum(fills[r + 1:r + 6]) / (len(below) * width)) if below else 0.0
+        start = 1.0 if r == 0 or fills[r - 1] < 0.5 * filled else 0.0
+
+        trans_hits = trans_cols = 0
+        for c, k in enumerate(kinds[r]):
+            if k != "text":
+                continue
+            col_below = [row[c] for row in below if c < len(row) and row[c]]
+            if not col_below:
+                continue
+            trans_cols += 1
+            if sum(1 for x in col_below if x == "num") * 2 >= len(col_below):
+                trans_hits += 1
+        trans = trans_hits / trans_cols if trans_cols else 0.0
+
+        score = fill + uniq + text + 1.5 * novelty + below_fill + start + 1.5 * trans - 0.01 * r
+        if fill < 0.5:
+            score *= 0.5
+        scored.append((r + 1, round(score, 4)))
+    scored.sort(key=lambda t: (-t[1], t[0]))
+    return scored
+
+
+def detect_header_row(raw_head: pd.DataFrame, max_rows: int = HEADER_SCAN_ROWS, default: int = 1) -> int:
+    """最も見出し行らしい行（1始まり）。判定できなければ default。"""
+    scored = score_header_rows(raw_head, max_rows)
+    return scored[0][0] if scored else default
+
+
+def guess_keyword_column(df: pd.DataFrame, sample: int = KEYWORD_SAMPLE_ROWS) -> Optional[str]:
+    """検索語句に向く列（長めで重複の少ない文字列の列）の列名。リンク列は除外。"""
+    if df is None or df.shape[1] == 0:
+        return None
+    head = df.head(sample)
+    best, best_score = None, 0.0
+    for col in head.columns:
+        if col in LINK_COLS:
+            continue
+        vals = [safe_text(v).strip() for v in head[col].tolist()]
+        nonempty = [v for v in vals if v]
+        if not nonempty:
+            continue
+        fill = len(nonempty) / len(vals)
+        text = sum(1 for v in nonempty if _cell_kind(v) == "text") / len(nonempty)
+        uniq = len(set(nonempty)) / len(nonempty)
+        avg_len = sum(len(v) for v in nonempty) / len(nonempty)
+        score = fill * text * (0.5 * uniq + 0.5 * min(avg_len / 20.0, 1.0))
+        if score > best_score:
+            best, best_score = col, score
+    return best
+
+
+def sniff_layout(raw_head: pd.DataFrame) -> Tuple[int, Optional[int]]:
+    """先頭の数行から (見出し行, 検索語句列の列番号(1始まり) or None) を推定する。"""
+    hr = detect_header_row(raw_head)
+    try:
+        df, _ = build_table_from_raw(raw_head, hr)
+    except Exception:
+        return hr, None
+    col = guess_keyword_column(df)
+    return hr, (list(df.columns).index(col) + 1) if col is not None else None
+
+
+# =====================
+# 検索語句 / リンク列
+# =====================
+def resolve_keyword_columns(df: pd.DataFrame, specs: Sequence) -> List[str]:
+    """列名 または 列番号（1始まり。int / 数字文字列）を current_df の列名に変換する。"""
+    cols = list(df.columns)
+    out: List[str] = []
+    for s in specs:
+        name = None
+        if isinstance(s, int) or (isinstance(s, str) and s.strip().isdigit() and s.strip() not in cols):
+            i = int(s)
+            if 1 <= i <= len(cols):
+                name = cols[i - 1]
+        elif s in cols:
+            name = s
+        if name is None:
+            raise KeyError(f"keyword column not found: {s}")
+        if name not in out:
+            out.append(name)
+    return out
+
+
+def build_keyword_series(df: pd.DataFrame, base_cols: Sequence[str], joiner: str = " ") -> pd.Series:
+    """選択された複数列から検索語句を合成した Series を返します。"""
+    if df is None or len(df.columns) == 0:
+        return pd.Series([], dtype=str)
+    cols = [c for c in base_cols if c in df.columns]
+    if not cols:
+        # 最低限：先頭列
+        cols = [str(df.columns[0])]
+    joiner = "\t" if joiner == "\\t" else joiner
+    parts = [[safe_text(v).strip() for v in df[c].tolist()] for c in cols]
+    values = [joiner.join(p for p in row if p).strip() for row in zip(*parts)]
+    return pd.Series(values, index=df.index)
+
+
+def build_link_series(keywords: pd.Series, template: str, label: str) -> pd.Series:
+    """検索語句 Series から =HYPERLINK 式の Series を作る（同じ語句は1回だけ変換）。"""
+    memo: Dict[str, str] = {}
+    out = []
+    for t in keywords.tolist():
+        f = memo.get(t)
+        if f is None:
+            f = make_hyperlink_formula(t, template, label)
+            memo[t] = f
+        out.append(f)
+    return pd.Series(out, index=keywords.index)
+
+
+def apply_search_columns(
+    df: pd.DataFrame,
+    base_cols: Sequence[str],
+    *,
+    joiner: str = " ",
+    generate_ai: bool = True,
+    generate_google: bool = True,
+    ai_template: str = DEFAULT_AI_TEMPLATE,
+    google_template: str = DEFAULT_GOOGLE_TEMPLATE,
+    insert_mode: str = "fixed2",
+    anchor_col: Optional[str] = None,
+) -> pd.DataFrame:
+    """リンク列（AI検索/Google検索）を作り直した新しい DataFrame を返す（df は変更しない）。
+    after_base の基準列は anchor_col（省略時は base_cols の先頭）。
+    リンク列のセルには検索語句をそのまま入れ（両方の列で同じ配列を共有）、テンプレートは
+    attrs[LINKS_ATTR] に持つ（SearchDocument では doc.links が正で、attrs はその写し）。
+    表示は列名、URL は開くとき、=HYPERLINK 式は保存するときに作る（materialize_links）。
+    """
+    if (not generate_ai) and (not generate_google):
+        generate_ai = True  # どちらもOFFは事故るので救済
+
+    # 既存のリンク列は作り直す前提でいったん除外
+    out = df[[c for c in df.columns if c not in LINK_COLS]].copy()
+    keywords = build_keyword_series(df, base_cols, joiner)
+
+    links: Dict[str, str] = {}
+    if generate_ai:
+        links[AI_COL] = ai_template
+    if generate_google:
+        links[GOOGLE_COL] = google_template
+    for lc in links:
+        out[lc] = keywords
+    out.attrs[LINKS_ATTR] = links
+
+    # 挿入位置
+    cols = [c for c in out.columns if c not in links]
+    pos = link_insert_position(cols, base_cols, insert_mode, anchor_col)
+    for i, lc in enumerate(links):
+        cols.insert(pos + i, lc)
+    return out[cols]
+
+
+def link_templates(df: Optional[pd.DataFrame]) -> Dict[str, str]:
+    """検索語句を持つリンク列（apply_search_columns で作った列）→ URL テンプレート。
+    読み込んだファイルにあった =HYPERLINK 式の列などは含まない（セルの式をそのまま使う）。
+    """
+    if df is None:
+        return {}
+    links = df.attrs.get(LINKS_ATTR) or {}
+    return {c: t for c, t in links.items() if c in df.columns}
+
+
+def display_labels(df: Optional[pd.DataFrame]) -> List[Optional[str]]:
+    """列ごとの表示ラベル。検索語句を持つリンク列は列名（語句が空のセルは空欄）、それ以外は None。"""
+    if df is None:
+        return []
+    links = link_templates(df)
+    return [str(c) if c in links else None for c in df.columns]
+
+
+def cell_url(df: pd.DataFrame, row: int, col: int) -> Optional[str]:
+    """リンク列のセル（位置で指定）を開く URL。リンクでなければ None。"""
+    v = df.iat[row, col]
+    tpl = link_templates(df).get(df.columns[col])
+    return link_url(v, tpl) if tpl is not None else extract_url(v)
+
+
+def materialize_links(df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    """検索語句を持つリンク列を =HYPERLINK 式にした DataFrame（保存用）。リンク列が無ければ df のまま。"""
+    links = link_templates(df)
+    if not links:
+        return df
+    out = df.copy()
+    for c, tpl in links.items():
+        out[c] = build_link_series(df[c], tpl, c)
+    out.attrs.pop(LINKS_ATTR, None)
+    return out
+
+
+def link_insert_position(cols: Sequence[str], base_cols: Sequence[str], insert_mode: str = "fixed2",
+                         anchor_col: Optional[str] = None) -> int:
+    """リンク列を入れる位置（リンク列を除いた列リスト cols の中の位置）。"""
+    cols = list(cols)
+    if insert_mode == "after_base":
+        try:
+            pos = cols.index(anchor_col if anchor_col is not None else list(base_cols)[0]) + 1
+        except Exception:
+            pos = 1
+    elif insert_mode == "rightmost":
+        pos = len(cols)
+    else:
+        # fixed2: 2列目固定
+        pos = 1
+    return max(0, min(pos, len(cols)))
+
+
+# =====================
+# 表示用の文字列
+# =====================
+def display_column(s: pd.Series, label: Optional[str] = None, limit: Optional[int] = None) -> pd.Series:
+    """1列ぶんの表示文字列（セルごとの display_text と同じ結果）を列単位でまとめて作る。
+    label を渡すと検索語句を持つリンク列として、語句のあるセルは label、無いセルは空欄。
+    limit を渡すと limit 文字より長いセルは切って … を付ける（truncate_text と同じ。全文は元の列から引く）。
+    """
+    if label is not None:
+        return pd.Series(label, index=s.index, dtype=str).where(s.fillna("").astype(str) != "", "")
+    if isinstance(s.dtype, pd.StringDtype):
+        t = s.fillna("")
+        formula = t.str.startswith("=HYPERLINK")
+        if bool(formula.any()):
+            lab = t[formula].str.extract(_HYPERLINK_LABEL_RE.pattern, expand=False).dropna()
+            t = t.copy()
+            t.loc[lab.index] = lab
+        if limit:
+            long = t.str.len() > limit
+            if bool(long.any()):
+                t = t.copy()
+                t.loc[long] = t[long].str.slice(0, limit) + ELLIPSIS
+        return t
+    return pd.Series([truncate_text(display_text(v), limit) for v in s.tolist()], index=s.index, dtype=object)
+
+
+def _array_key(s: pd.Series):
+    """(列の中身の同一性を表すキー, キーの元になった配列)。判定できない列は (None, None)。
+    pyarrow の列は変更できないので、バッファのアドレス・範囲が同じなら中身も同じ
+    （pandas のコピー・列の選択・列名変更・他の列の編集ではバッファを共有したまま）。
+    """
+    arr = getattr(s.array, "_pa_array", None)
+    if arr is None:
+        return None, None  # numpy の列は書き換えられるので使い回さない
+    key = tuple((ch.offset, len(ch)) + tuple(b.address if b is not None else 0 for b in ch.buffers())
+                for ch in arr.chunks)
+    return key, arr
+
+
+_column_versions = itertools.count(1)
+
+
+def new_column_versions(n: int) -> List[int]:
+    """列の版番号を n 個（プロセス内で重複しない。中身の変わった列・新しい表の列に振る）。"""
+    return [next(_column_versions) for _ in range(int(n))]
+
+
+def carry_column_versions(before: Optional[pd.DataFrame], after: pd.DataFrame,
+                          versions: Sequence[int]) -> List[int]:
+    """after の列の版番号。before（版番号 versions）の同名の列か同じ位置の列と中身が同じなら引き継ぎ
+    （列名変更・他の列の編集では変わらない）、違えば新しい番号にする。
+    """
+    if before is None or len(versions) != before.shape[1]:
+        return new_column_versions(after.shape[1])
+    old = [str(c) for c in before.columns]
+    pos = {c: i for i, c in enumerate(old) if old.count(c) == 1}
+    out = []
+    for j, c in enumerate(str(c) for c in after.columns):
+        b = after.iloc[:, j]
+        kb = _array_key(b)[0]
+        v = None
+        for i in dict.fromkeys(i for i in (pos.get(c), j) if i is not None and i < len(old)):
+            a = before.iloc[:, i]
+            try:
+                ka = _array_key(a)[0]
+                same = (kb is not None and ka == kb and a.index.equals(b.index)) or a.equals(b)
+            except Exception:
+                same = False
+            if same:
+                v = versions[i]
+                break
+        out.append(next(_column_versions) if v is None else v)
+    return out
+
+
+class DisplayCache:
+    """列ごとの表示文字列（display_column）と最大表示幅（column_text_width）を、列の中身が変わるまで使い回す。
+    キーは _array_key。pyarrow でない列（object 型・数値など）は呼び出し側が渡す列の版番号
+    （SearchDocument.column_versions）をキーにし、版番号も無ければ毎回作る。
+    セル編集・列一括編集では変わった列だけ、並び替えでは全列を作り直す。
+    キーの元の配列を持っておく（バッファが解放されて同じアドレスが別の列に使われないように）。
+    limit は1セルに表示する文字数（display_column の limit。変えると作り直す）。
+    """
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit
+        self._entries: Dict[Tuple, List] = {}  # (キー, label, limit) → [配列, 表示, {幅の条件: 幅}]
+
+    def _lookup(self, df: Optional[pd.DataFrame], versions: Optional[Sequence[int]] = None) -> List[List]:
+        """df の列順のエントリ。今の df に無い列のキャッシュは捨てる。versions は df の列順の版番号。"""
+        if df is None:
+            self._entries = {}
+            return []
+        labels = display_labels(df)
+        if versions is not None and len(versions) != len(labels):
+            versions = None
+        entries: Dict[Tuple, List] = {}
+        out = []
+        for i, label in enumerate(labels):
+            s = df.iloc[:, i]
+            key, arr = _array_key(s)
+            if key is None and versions is not None:
+                key = ("version", versions[i])
+            ck = (key, label, self.limit)
+            hit = self._entries.get(ck) if key is not None else None
+            entry = hit if hit is not None else [arr, display_column(s, label, self.limit), {}]
+            if key is not None:
+                entries[ck] = entry
+            out.append(entry)
+        self._entries = entries
+        return out
+
+    def columns(self, df: Optional[pd.DataFrame], versions: Optional[Sequence[int]] = None) -> List[pd.Series]:
+        """df の列順の表示文字列（位置で使う）。"""
+        return [e[1] for e in self._lookup(df, versions)]
+
+    def widths(self, df: Optional[pd.DataFrame], narrow: int = 1, wide: int = 2,
+               cap: Optional[int] = None, versions: Optional[Sequence[int]] = None) -> List[int]:
+        """df の列順の、表示文字列の最大表示幅（column_text_width）。"""
+        out = []
+        for e in self._lookup(df, versions):
+            memo = e[2]
+            w = memo.get((narrow, wide, cap))
+            if w is None:
+                w = memo[(narrow, wide, cap)] = column_text_width(e[1], narrow, wide, cap)
+            out.append(w)
+        return out
+
+    def clear(self):
+        self._entries = {}
+
+
+def column_window(widths: Sequence[int], first: int, avail: int, margin: int = 0) -> Tuple[int, int, int]:
+    """幅 avail（px）の表示域に first 列目から並べたときの (先頭, 見えている列の末尾+1, 入れる列の末尾+1)。
+    右端の列まで見えているときは表示域が余らないように先頭を戻す。margin は見えている列の右に足す列数。
+    """
+    n = len(widths)
+    if n == 0:
+        return 0, 0, 0
+    # 右端の列から詰めて表示域に収まる先頭（これより右から始めると表示域が余る）
+    used, right = 0, n
+    while right > 0 and used + int(widths[right - 1]) <= avail:
+        right -= 1
+        used += int(widths[right])
+    first = max(0, min(int(first), min(right, n - 1)))
+    end, used = first, 0
+    while end < n and used < avail:
+        used += int(widths[end])
+        end += 1
+    return first, end, min(n, end + max(0, int(margin)))
+
+
+# =====================
+# 列幅の自動調整
+# =====================
+# 東アジアの全角文字（East Asian Width が W / F のおもな範囲。結合文字などは半角扱い）
+_WIDE_RANGES = (
+    (0x1100, 0x115F), (0x2E80, 0x303E), (0x3041, 0x33FF), (0x3400, 0x4DBF), (0x4E00, 0x9FFF),
+    (0xA000, 0xA4CF), (0xAC00, 0xD7A3), (0xF900, 0xFAFF), (0xFE30, 0xFE4F), (0xFF00, 0xFF60),
+    (0xFFE0, 0xFFE6), (0x1F300, 0x1F64F), (0x1F900, 0x1F9FF), (0x20000, 0x3FFFD),
+)
+# 範囲を文字そのもので書く（pandas の str.count は pyarrow（RE2）でも re でも同じ正規表現で数える）
+_WIDE_PATTERN = "[" + "".join(f"{chr(a)}-{chr(b)}" for a, b in _WIDE_RANGES) + "]"
+_WIDE_RE = re.compile(_WIDE_PATTERN)
+AUTOFIT_TOPK = 256          # 文字数の多い順にこの件数は必ず幅を測る
+AUTOFIT_EXACT_MAX = 20_000  # 幅が最大になりうるセルがこれより多ければ、この件数の見本だけ測る
+
+
+def text_width(text, narrow: int = 1, wide: int = 2) -> int:
+    """表示幅（半角1文字 narrow・全角1文字 wide の合計）。"""
+    t = safe_text(text)
+    return len(t) * narrow + len(_WIDE_RE.findall(t)) * (wide - narrow)
+
+
+def column_text_width(s: pd.Series, narrow: int = 1, wide: int = 2, cap: Optional[int] = None) -> int:
+    """列の中でいちばん幅の広いセルの表示幅（text_width の最大値）。
+    全角文字を数える（正規表現）のは候補のセルだけにする：
+    - 全行について幅の上限を出す。pyarrow の列は UTF-8 のバイト数から（全角文字は3バイト以上なので
+      全角の数 ≤ (バイト数 - 文字数) / 2）、それ以外は 文字数 × wide。全セル ASCII ならそこで終わり
+    - 上限の大きい順に AUTOFIT_TOPK 件を測って最大幅 best を出す
+    - 残りのうち上限が best を超えるセルだけ測る（多ければ等間隔に AUTOFIT_EXACT_MAX 件の見本）
+    cap（これ以上は要らない幅）に届いたら打ち切る。
+    """
+    import numpy as np
+
+    if len(s) == 0:
+        return 0
+    arr = getattr(s.array, "_pa_array", None)
+    if arr is not None:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        arr = pc.fill_null(arr, "")
+
+        def widest(idx) -> int:
+            part = arr.take(pa.array(np.sort(idx)))
+            w = pc.add(pc.multiply(pc.utf8_length(part), narrow),
+                       pc.multiply(pc.count_substring_regex(part, _WIDE_PATTERN), wide - narrow))
+            return int(pc.max(w).as_py() or 0)
+
+        nbytes = pc.binary_length(arr).to_numpy().astype(np.int64)  # offsets の差なので速い
+        lens = pc.utf8_length(arr).to_numpy().astype(np.int64)
+        extra = nbytes - lens
+        if not extra.any():
+            return int(lens.max()) * narrow
+        upper = lens * narrow + (extra // 2) * (wide - narrow)
+    else:
+        vals = [safe_text(v) for v in s.tolist()]
+        upper = np.fromiter((len(v) for v in vals), dtype=np.int64, count=len(vals)) * max(narrow, wide)
+
+        def widest(idx) -> int:
+            return max((text_width(vals[i], narrow, wide) for i in idx), default=0)
+
+    top = _top_indices(upper, AUTOFIT_TOPK)
+    best = widest(top)
+    if cap is not None and best >= cap:
+        return best
+    over = upper > best
+    over[top] = False
+    cand = np.flatnonzero(over)
+    if len(cand) > AUTOFIT_EXACT_MAX:
+        cand = cand[:: -(-len(cand) // AUTOFIT_EXACT_MAX)]
+    if len(cand):
+        best = max(best, widest(cand))
+    return best
+
+
+def _top_indices(values, k: int):
+    """values（0 以上の整数の numpy 配列）の大きい順 k 件の位置（順不同）。
+    argpartition は同じ値が多い列（空欄ばかりなど）で遅くなるので、値ごとの件数からしきい値を決める。
+    """
+    import numpy as np
+
+    k = min(k, len(values))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    at_least = np.cumsum(np.bincount(values)[::-1])[::-1]  # at_least[v] = v 以上の件数
+    thr = int(np.flatnonzero(at_least >= k)[-1])
+    above = np.flatnonzero(values > thr)
+    return np.concatenate([above, np.flatnonzero(values == thr)[: k - len(above)]])
+
+
+# =====================
+# 列一括編集
+# =====================
+def formula_for_row(formula: str, row_no: int) -> str:
+    """列一括編集の式を1行ぶん展開する（{ROW} → 行番号。無ければ "2" を置換する旧互換）。"""
+    if "{ROW}" in formula:
+        return formula.replace("{ROW}", str(row_no))
+    return formula.replace("2", str(row_no))  # 互換（非推奨）
+
+
+def formula_column(formula: str, n: int) -> List[str]:
+    """データ n 行ぶんの式（Excel の2行目から）。"""
+    return [formula_for_row(formula, i + 2) for i in range(n)]
+
+
+# =====================
+# 並び替え
+# =====================
+def sort_table(df: pd.DataFrame, col_name: str, ascending: bool = True) -> pd.DataFrame:
+    """列で安定ソートした新しい DataFrame を返す。
+    列の全セルが数値として読める場合は数値順、それ以外は文字列順（セルの値は変えません）。
+    行の index（読み込み時のデータ行番号）はそのまま保つ（列を絞った保存で元の行と突き合わせるため）。
+    """
+    s = df[col_name]
+    num = pd.to_numeric(s, errors="coerce")
+    if len(s) > 0 and bool(num.notna().all()):
+        key = lambda _: num
+    else:
+        key = None
+    return df.sort_values(by=col_name, ascending=ascending, kind="mergesort", key=key)
+
+
+# =====================
+# 保存用レイアウト
+# =====================
+def compose_output_raw(raw_df: Optional[pd.DataFrame], current_df: Optional[pd.DataFrame], header_row: int) -> pd.DataFrame:
+    """raw_df(上部+ヘッダ行) + current_df(データ) から保存用の DataFrame を作る（header=Noneで書く）。"""
+    if raw_df is None:
+        return pd.DataFrame()
+    hdr_r = header_index(raw_df, header_row)
+    pre = raw_df.iloc[:hdr_r].copy()
+    header_row_df = raw_df.iloc[[hdr_r]].copy()
+
+    # current_df の列数に合わせて列を拡張（リンク列追加のため）
+    base_n = int(raw_df.shape[1] or 0)
+    cur = materialize_links(current_df) if current_df is not None else pd.DataFrame()
+    # 保存は「表示の列順」を優先（current_df列順）
+    cur_cols = list(cur.columns)
+    out_cols_n = max(base_n, len(cur_cols))
+
+    def _pad_df(df, n):
+        if df.shape[1] < n:
+            for k in range(df.shape[1], n):
+                df[k] = ""
+        return df.iloc[:, :n]
+
+    pre = _pad_df(pre.reset_index(drop=True), out_cols_n)
+    header_row_df = _pad_df(header_row_df.reset_index(drop=True), out_cols_n)
+
+    # ヘッダ行を更新（リンク列もここに入れる）
+    for i in range(out_cols_n):
+        header_row_df.iat[0, i] = cur_cols[i] if i < len(cur_cols) else ("" if i >= base_n else header_row_df.iat[0, i])
+
+    # データ行を current_df から作る（列数 out_cols_n に揃える）
+    if len(cur) > 0:
+        data_df = pd.DataFrame(cur.to_numpy(dtype=object), columns=range(len(cur_cols)))
+        data_df = _pad_df(data_df, out_cols_n)
+    else:
+        data_df = pd.DataFrame()
+
+    out = pd.concat([pre, header_row_df, data_df], ignore_index=True)
+    out = out.fillna("").astype(str)
+    return out
+
+
+def compose_projected_output(full_raw: pd.DataFrame, raw_df: pd.DataFrame, current_df: Optional[pd.DataFrame],
+                             header_row: int, usecols: Sequence[int], source_columns: Sequence[str]) -> pd.DataFrame:
+    """列を絞って読み込んだ文書の保存用レイアウト。
+
+    読み込んだ列は元の列位置に、読み込まなかった列は元ファイル（full_raw）からそのまま、
+    リンク列・追加列は current_df で直前にある列の右に置く。
+    データ行は current_df の index（読み込み時のデータ行番号）で元の行と対応させるので、
+    並び替えても読み込まなかった列の値は同じ行に付いていく。
+    """
+    out_p = compose_output_raw(raw_df, current_df, header_row)
+    cur_cols = list(current_df.columns) if current_df is not None else []
+    hdr_r = header_index(raw_df, header_row)
+    full_hdr_r = min(hdr_r, max(0, len(full_raw) - 1))
+
+    # out_p の各列 → 元の列（source_columns の何番目か、追加列は None）
+    src = list(source_columns)
+    ks: List[Optional[int]] = []
+    for i in range(out_p.shape[1]):
+        name = cur_cols[i] if i < len(cur_cols) else None
+        if name is not None and name in src:
+            ks.append(src.index(name))
+        elif name is None and i < len(src):
+            ks.append(i)
+        else:
+            ks.append(None)
+    # 列名変更された元の列：前後の元の列の間にある「current_df に無い元の列」を順に当てる
+    missing = [k for k in range(len(src)) if k not in set(ks)]
+    prev = -1
+    for i, k in enumerate(ks):
+        if k is not None:
+            prev = k
+            continue
+        if i < len(cur_cols) and cur_cols[i] in LINK_COLS:
+            continue
+        nxt = next((k2 for k2 in ks[i + 1:] if k2 is not None), len(src))
+        cand = next((m for m in missing if prev < m < nxt), None)
+        if cand is not None:
+            ks[i] = cand
+            missing.remove(cand)
+            prev = cand
+    origins: List[Optional[int]] = [int(usecols[k]) if k is not None and k < len(usecols) else None for k in ks]
+    loaded = {pos: i for i, pos in enumerate(origins) if pos is not None}
+    extras: Dict[int, List[int]] = {}
+    anchor = -1
+    for i, pos in enumerate(origins):
+        if pos is None:
+            extras.setdefault(anchor, []).append(i)
+        else:
+            anchor = pos
+    full_n = max(int(full_raw.shape[1] or 0), max(loaded, default=-1) + 1)
+    slots: List[Tuple[str, int]] = [("out", i) for i in extras.get(-1, [])]
+    for pos in range(full_n):
+        slots.append(("out", loaded[pos]) if pos in loaded else ("full", pos))
+        slots.extend(("out", i) for i in extras.get(pos, []))
+
+    # 行: 見出しまでは位置で、データは current_df の index で元の行に対応
+    labels = list(current_df.index) if current_df is not None else []
+    full_rows = list(range(full_hdr_r + 1))
+    for lab in labels:
+        try:
+            r = full_hdr_r + 1 + int(lab)
+        except (TypeError, ValueError):
+            r = -1
+        full_rows.append(r if 0 <= r < len(full_raw) else -1)
+    # 読み込んだ列がすべて空で末尾が欠けた行（元ファイルにだけある行）は最後に残す
+    seen = {r for r in full_rows if r >= 0}
+    tail = [r for r in range(full_hdr_r + 1, len(full_raw)) if r not in seen]
+
+    full_txt = full_raw.fillna("").astype(str)
+    n_out = len(out_p)
+    columns = []
+    for kind, idx in slots:
+        if kind == "out":
+            col = out_p.iloc[:, idx].tolist() + [""] * len(tail)
+        else:
+            src = full_txt.iloc[:, idx].tolist() if idx < full_txt.shape[1] else [""] * len(full_txt)
+            col = [src[r] if 0 <= r < len(src) else "" for r in full_rows[:n_out]]
+            col += [""] * (n_out - len(col))
+            col += [src[r] for r in tail]
+        columns.append(col)
+    out = pd.DataFrame(dict(enumerate(columns)))
+    return out.fillna("").astype(str)
+
+
+def write_output(out_df: pd.DataFrame, path: str, fmt: Optional[Tuple[str, str]] = None):
+    """保存用 DataFrame を拡張子に応じて xlsx / csv（tsv・txt）で書き出す。
+    fmt は CSV の (文字コード, 区切り)。省略すると UTF-8（BOM付き）で、.tsv はタブ区切り。
+    """
+    if aisv_csv.is_text_table(path):
+        enc, sep = fmt or aisv_csv.output_format(path)
+        out_df.to_csv(path, index=False, header=False, encoding=enc, sep=sep)
+    else:
+        out_df.to_excel(path, index=False, header=False)
+
+
+# =====================
+# 列指向形式（Parquet / Feather）への書き出し
+# =====================
+def columnar_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def link_urls(s: pd.Series, template: Optional[str] = None) -> pd.Series:
+    """リンク列を URL だけの列にする。template を渡すと s は検索語句の列（apply_search_columns の列）。
+    template が無ければ =HYPERLINK 式の列として URL を取り出す（式でない値はそのまま）。
+    """
+    if template is not None:
+        memo: Dict[str, str] = {}
+        out = []
+        for t in s.tolist():
+            u = memo.get(t)
+            if u is None:
+                u = memo[t] = link_url(t, template) or ""
+            out.append(u)
+        return pd.Series(out, index=s.index)
+    if not (pd.api.types.is_string_dtype(s) or s.dtype == object):
+        return s
+    url = s.str.extract(r'^=HYPERLINK\("(.*?)"', expand=False)
+    return url.where(url.notna(), s)
+
+
+def export_frame(df: pd.DataFrame, base_cols: Sequence[str], joiner: str = " ") -> pd.DataFrame:
+    """Parquet / Feather 用の表（見出しより上の行は含めない）。
+    リンク列（AI検索 / Google検索）は URL にし、検索語句を KEYWORD_COL 列として最初のリンク列の前
+    （リンク列が無ければ右端）に入れる。列名が重複する場合は make_unique_headers と同じく番号を付ける。
+    """
+    cols = [str(c) for c in df.columns]
+    links = link_templates(df)
+    data = {c: (link_urls(df[c], links.get(c)) if c in LINK_COLS else df[c]) for c in cols}
+    name = make_unique_headers(cols + [KEYWORD_COL])[-1]
+    pos = min([cols.index(c) for c in LINK_COLS if c in cols] or [len(cols)])
+    order = cols[:pos] + [name] + cols[pos:]
+    data[name] = build_keyword_series(df, base_cols, joiner)
+    return pd.DataFrame(data, index=df.index)[order].reset_index(drop=True)
+
+
+def write_columnar(frames: Iterable[pd.DataFrame], path: str, kind: str = "parquet",
+                   compression: str = "zstd") -> int:
+    """frames（同じ列の DataFrame を順に。大容量モードは分割して渡す）を Parquet / Feather に書く。
+    全列を文字列型で書く。一時ファイルに書いてから置き換える。書いた行数を返す。
+    """
+    if kind not in COLUMNAR_FORMATS:
+        raise ValueError(f"未対応の形式です: {kind}")
+    if not columnar_available():
+        raise ValueError("Parquet / Feather の書き出しには pyarrow が必要です（pip install pyarrow）")
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    comp = None if compression in (None, "", "none") else compression
+    tmp = os.path.join(os.path.dirname(os.path.abspath(path)), f".~{os.path.basename(path)}.tmp")
+    writer, sink, n = None, None, 0
+    try:
+        for df in frames:
+            if writer is None:
+                schema = pa.schema([pa.field(str(c), pa.string()) for c in df.columns])
+                if kind == "parquet":
+                    import pyarrow.parquet as pq
+
+                    writer = pq.ParquetWriter(tmp, schema, compression=comp or "none")
+                else:
+                    sink = pa.OSFile(tmp, "wb")
+                    writer = pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(compression=comp))
+            writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+            n += len(df)
+        if writer is None:
+            raise ValueError("書き出す表がありません")
+        writer.close()
+        writer = None
+        if sink is not None:
+            sink.close()
+        os.replace(tmp, path)
+    except BaseException:
+        for h in (writer, sink):
+            try:
+                if h is not None:
+                    h.close()
+            except Exception:
+                pass
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return n
+
+
+# =====================
+# 文書モデル
+# =====================
+def file_signature(path: Optional[str]) -> Optional[Tuple[int, int]]:
+    """(サイズ, 更新時刻ns)。ファイルが無ければ None。読み込み後に元ファイルが変わったかの判定用。"""
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return (int(st.st_size), int(st.st_mtime_ns))
+
+
+def df_changed(before: pd.DataFrame, after: pd.DataFrame) -> bool:
+    try:
+        # リンク列のテンプレートだけ変えた場合もセルの値（検索語句）は同じなので attrs も比べる
+        return not before.equals(after) or link_templates(before) != link_templates(after)
+    except Exception:
+        return True
+
+
+class SearchDocument:
+    """1シートぶんの文書モデル。
+
+    - raw_df: header=None で読んだ全行（見出しより上のタイトル行も含む）
+    - current_df: 見出し行の下の表（リンク列・追加列を含む、表示/編集の対象）
+    - header_row: 見出し行（1始まり）
+    - undo_stack / redo_stack: current_df のスナップショット
+    - links: 検索語句を持つリンク列 → URL テンプレート（正はこちら。current_df.attrs[LINKS_ATTR] は写し）。
+      attrs は pd.concat / merge などで落ちるので、文書が表を差し替えるたびに links から付け直す
+    - column_versions: current_df の列順の版番号（中身が変わった列だけ新しい番号。DisplayCache のキー）
+    - source_sig: 最後に path を読み込んだ/上書き保存した時点の file_signature
+    - usecols: 列を絞って読み込んだ場合の元の列位置（0始まり）。None なら全列
+    - sheet_name: 読み込んだシート名。None なら最初のシート
+    - raw_cache: 解析済みシートのキャッシュ（get(path, sig, usecols, sheet=) / put(path, sig, raw_df, sheet=)）。None なら毎回解析
+    """
+
+    def __init__(self, raw_df: Optional[pd.DataFrame] = None, header_row: int = 1,
+                 path: Optional[str] = None, undo_limit: int = 20):
+        self.path = path
+        self.raw_df = raw_df
+        self.header_row = int(header_row or 1)
+        self.current_df: Optional[pd.DataFrame] = None
+        self.header_vals: List[str] = []
+        self.source_columns: List[str] = []  # raw_df から作った元の列名（raw列と対応）
+        self.undo_stack: List[pd.DataFrame] = []
+        self.redo_stack: List[pd.DataFrame] = []
+        self.links: Dict[str, str] = {}
+        self._undo_links: List[Dict[str, str]] = []  # undo_stack / redo_stack と同じ並びのリンク列
+        self._redo_links: List[Dict[str, str]] = []
+        self.column_versions: List[int] = []
+        self._undo_versions: List[List[int]] = []  # undo_stack / redo_stack と同じ並びの列の版番号
+        self._redo_versions: List[List[int]] = []
+        self.undo_limit = undo_limit
+        self.source_sig: Optional[Tuple[int, int]] = None
+        self.usecols: Optional[List[int]] = None
+        self.sheet_name: Optional[str] = None
+        self.raw_cache = None
+        if raw_df is not None:
+            self.rebuild_table()
+
+    @classmethod
+    def from_file(cls, path: str, header_row: int = 1, **kwargs) -> "SearchDocument":
+        doc = cls(path=path, **kwargs)
+        doc.load(path, header_row)
+        return doc
+
+    # ---------------------
+    # 読み込み / 表の組み立て
+    # ---------------------
+    def load(self, path: str, header_row: int = 1, usecols: Optional[Sequence[int]] = None,
+             sheet_name: Optional[str] = None):
+        """ファイルを読み込み、見出し行から表を作る（Undo履歴はクリア）。
+        usecols を指定するとその列だけ解析する（保存時は読み込まなかった列を元ファイルから補う）。
+        sheet_name を省略すると最初のシート。
+        """
+        sig = file_signature(path)
+        self.usecols = sorted(int(c) for c in usecols) if usecols else None
+        self.sheet_name = sheet_name
+        self.raw_df = self._read_raw(path, sig, self.usecols)
+        self.path = path
+        self.source_sig = sig
+        self.header_row = int(header_row or 1)
+        self.rebuild_table()
+        self.clear_history()
+
+    def _read_raw(self, path: str, sig, usecols: Optional[Sequence[int]] = None) -> pd.DataFrame:
+        """raw_cache にあればそれを、無ければ解析して（全列ならキャッシュにも書いて）返す。"""
+        cache = self.raw_cache
+        if cache is not None:
+            df = cache.get(path, sig, usecols, sheet=self.sheet_name)
+            if df is not None:
+                return df
+        df = read_sheet_raw(path, usecols=usecols, sheet_name=self.sheet_name)
+        if cache is not None and not usecols:
+            cache.put(path, sig, df, sheet=self.sheet_name)
+        return df
+
+    def rebuild_table(self):
+        """raw_df(全行)と header_row から current_df(ヘッダ下の表)を作る。"""
+        self.links = {}
+        if self.raw_df is None:
+            self.current_df = None
+            self.column_versions = []
+            self.header_vals = []
+            self.source_columns = []
+            return
+        self.current_df, self.header_vals = build_table_from_raw(self.raw_df, self.header_row)
+        self.column_versions = new_column_versions(self.current_df.shape[1])
+        self.source_columns = list(self.current_df.columns)
+
+    def set_table(self, df: Optional[pd.DataFrame], links: Optional[Dict[str, str]] = None,
+                  versions: Optional[Sequence[int]] = None):
+        """current_df を df にし、リンク列を links（省略時は今の links）にする。
+        links は df にある列だけ残し、df.attrs[LINKS_ATTR] にも写す。
+        versions は df の列の版番号（省略時・列数が合わなければ全列を新しい番号にする）。
+        """
+        links = dict(self.links if links is None else links)
+        if df is not None:
+            links = {c: t for c, t in links.items() if c in df.columns}
+            df.attrs[LINKS_ATTR] = dict(links)
+        n = 0 if df is None else df.shape[1]
+        self.column_versions = list(versions) if versions is not None and len(versions) == n else new_column_versions(n)
+        self.current_df = df
+        self.links = links
+
+    def header_index(self) -> int:
+        if self.raw_df is None:
+            return max(0, self.header_row - 1)
+        return header_index(self.raw_df, self.header_row)
+
+    # ---------------------
+    # 操作
+    # ---------------------
+    def keyword_series(self, base_cols: Sequence[str], joiner: str = " ") -> pd.Series:
+        return build_keyword_series(self.current_df, base_cols, joiner)
+
+    def with_search_columns(self, base_cols: Sequence[str], **kwargs) -> pd.DataFrame:
+        """リンク列を作り直した DataFrame を返す（current_df は変えない。
+        確定は commit(before, df, links=link_templates(df))）。
+        """
+        return apply_search_columns(self.current_df, base_cols, **kwargs)
+
+    def sort(self, col_name: str, ascending: bool = True):
+        """current_df を並び替える（Undo 対象外）。"""
+        if self.current_df is None:
+            return
+        self.set_table(sort_table(self.current_df, col_name, ascending))
+
+    def mirror_to_raw(self, data_index: int, col_pos: int, value: str) -> bool:
+        """current_df のセル編集を raw_df（データ領域）にも反映する。
+        元の列（source_columns）に対応しない列（リンク列・追加列）は反映しない。
+        """
+        if self.raw_df is None or self.current_df is None:
+            return False
+        try:
+            name = self.current_df.columns[col_pos]
+        except IndexError:
+            return False
+        if name not in self.source_columns:
+            return False
+        raw_c = self.source_columns.index(name)
+        # 並び替え後も元の行に反映する（index = 読み込み時のデータ行番号）
+        try:
+            row = int(self.current_df.index[int(data_index)])
+        except (TypeError, ValueError, IndexError):
+            row = int(data_index)
+        raw_r = max(0, self.header_row - 1) + 1 + row
+        # rawの列数が足りなければ拡張
+        if raw_c >= self.raw_df.shape[1]:
+            for k in range(self.raw_df.shape[1], raw_c + 1):
+                self.raw_df[k] = ""
+        # rawが短い場合は行追加
+        while len(self.raw_df) <= raw_r:
+            self.raw_df.loc[len(self.raw_df)] = [""] * self.raw_df.shape[1]
+        self.raw_df.iat[raw_r, raw_c] = value
+        return True
+
+    @property
+    def projected(self) -> bool:
+        return bool(self.usecols)
+
+    def compose_output(self) -> pd.DataFrame:
+        if self.projected and self.raw_df is not None:
+            # 読み込まなかった列を元ファイルから補う（ここで元ファイルを1回全列解析する）
+            if not self.path or not os.path.exists(self.path):
+                raise FileNotFoundError(f"元ファイルが見つかりません（列を絞って読み込んだため必要）: {self.path}")
+            full_raw = self._read_raw(self.path, file_signature(self.path))
+            return compose_projected_output(full_raw, self.raw_df, self.current_df, self.header_row,
+                                            self.usecols, self.source_columns)
+        return compose_output_raw(self.raw_df, self.current_df, self.header_row)
+
+    def save(self, path: str):
+        write_output(self.compose_output(), path)
+        self.mark_saved(path)
+
+    def mark_saved(self, path: str):
+        """path が元ファイルなら、保存後の file_signature を覚え直す。"""
+        if self.path and os.path.abspath(path) == os.path.abspath(self.path):
+            self.source_sig = file_signature(path)
+
+    # ---------------------
+    # Undo / Redo
+    # ---------------------
+    def commit(self, before: pd.DataFrame, after: pd.DataFrame,
+               links: Optional[Dict[str, str]] = None) -> bool:
+        """変更があった時だけ Undo に積み、Redo をクリアして current_df を差し替える。
+        links はリンク列を作り直したときだけ渡す（省略時は今のリンク列のうち after にある列）。
+        """
+        old_links = dict(self.links)
+        new_links = dict(self.links if links is None else links)
+        new_links = {c: t for c, t in new_links.items() if c in after.columns}
+        # リンク列のテンプレートだけ変えた場合もセルの値（検索語句）は同じなのでリンク列も比べる
+        try:
+            changed = (not before.equals(after)) or new_links != old_links
+        except Exception:
+            changed = True
+        old_versions = list(self.column_versions)
+        self.set_table(after, new_links, carry_column_versions(before, after, old_versions))
+        if not changed:
+            return False
+        self.undo_stack.append(before.copy())
+        self._undo_links.append(old_links)
+        self._undo_versions.append(old_versions)
+        if len(self.undo_stack) > int(self.undo_limit or 20):
+            self.undo_stack.pop(0)
+            self._undo_links.pop(0)
+            self._undo_versions.pop(0)
+        self.redo_stack.clear()
+        self._redo_links.clear()
+        self._redo_versions.clear()
+        return True
+
+    def undo(self) -> bool:
+        if not self.undo_stack or self.current_df is None:
+            return False
+        self.redo_stack.append(self.current_df.copy())
+        self._redo_links.append(dict(self.links))
+        self._redo_versions.append(list(self.column_versions))
+        self.set_table(self.undo_stack.pop(), self._undo_links.pop(), self._undo_versions.pop())
+        return True
+
+    def redo(self) -> bool:
+        if not self.redo_stack or self.current_df is None:
+            return False
+        self.undo_stack.append(self.current_df.copy())
+        self._undo_links.append(dict(self.links))
+        self._undo_versions.append(list(self.column_versions))
+        self.set_table(self.redo_stack.pop(), self._redo_links.pop(), self._redo_versions.pop())
+        return True
+
+    def clear_history(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self._undo_links.clear()
+        self._redo_links.clear()
+        self._undo_versions.clear()
+        self._redo_versions.clear()
@@ -0,0 +1,325 @@
+"""AI検索ビューア：CSV / TSV の読み込み（文字コード・区切りの自動判定、Tk 非依存）
+
+- 文字コードと区切りはファイルの先頭（SNIFF_BYTES）だけ読んで判定する
+  文字コード: BOM（UTF-8 / UTF-16）→ UTF-8 → CP932（Shift_JIS）→ EUC-JP の順に、先頭をエラーなく読めるもの
+  本体は文字を置き換えずに読み、先頭より後ろで読めないバイトがあればファイル全体で判定し直す
+  （sniff_full_encoding）。どの文字コードでも読めないファイルだけ CP932 で置き換えて読む（警告をログへ）
+  区切り: .tsv はタブ。それ以外は , / タブ / ; / | のうち、各行の列数がいちばん揃うもの
+- read_sheet_raw の Excel と同じ形の raw_df（header=None・全セル文字列・空欄は NaN）を返す。
+  空行も1行として残す（見出し行の行番号が Excel で開いたときと同じになるように）
+- pyarrow があれば本体は pyarrow.csv で解析する（pandas の C エンジンの3倍ほど速く、列は Arrow の文字列のまま）。
+  pyarrow は全行が同じ列数でないと読めないため、列数の揃わない先頭の数行（タイトル・注記など）は csv で読み、
+  その続きのバイト位置から渡す。途中に列数の違う行・空行がある場合は C エンジンで読み直す
+- 大容量モード（SQLite）への取り込み用に、CHUNK_ROWS 行ずつ読む iter_text_rows も用意
+
+書き出しは元ファイルと同じ拡張子なら元の文字コード・区切りに合わせる（output_format）。
+"""
+from __future__ import annotations
+
+import codecs
+import csv
+import importlib.util
+import io
+import logging
+import os
+from collections import Counter
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+TEXT_EXTS = (".csv", ".tsv", ".txt")
+SNIFF_BYTES = 256 * 1024
+DELIMITERS = (",", "\t", ";", "|")
+ENCODINGS = ("utf-8", "cp932", "euc_jp")
+CHUNK_ROWS = 100_000
+DEFAULT_OUTPUT = ("utf-8-sig", ",")  # Excel で開いても文字化けしない
+
+
+def is_text_table(path: Optional[str]) -> bool:
+    return bool(path) and os.path.splitext(str(path))[1].lower() in TEXT_EXTS
+
+
+# =====================
+# 判定
+# =====================
+def sniff_encoding(head: bytes) -> str:
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    for enc in ENCODINGS:
+        try:
+            # final=False: 先頭で切ったため末尾の文字が途中で切れていてもエラーにしない
+            codecs.getincrementaldecoder(enc)().decode(head, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return "cp932"  # 先頭から読めない：ファイル全体で判定し直す（read_text_raw）
+
+
+def sniff_full_encoding(path: str, first: Optional[str] = None) -> Optional[str]:
+    """ファイル全体をエラーなく読める文字コード（first → ENCODINGS の順に試す）。どれでも読めなければ None。
+    BOM があればその文字コードだけ試す。
+    """
+    with open(path, "rb") as f:
+        bom = f.read(4)
+    if bom.startswith(codecs.BOM_UTF8):
+        candidates = ["utf-8-sig"]
+    elif bom.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        candidates = ["utf-16"]
+    else:
+        candidates = [first] if first else []
+        candidates += [e for e in ENCODINGS if e not in candidates]
+    for enc in candidates:
+        dec = codecs.getincrementaldecoder(enc)()
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    dec.decode(chunk)
+            dec.decode(b"", final=True)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+def _resniff(path: str, fmt: Tuple[str, str], err: UnicodeDecodeError) -> Tuple[Tuple[str, str], str]:
+    """先頭で判定した文字コードで読めなかった場合の (文字コード, 区切り) と encoding_errors。"""
+    enc, sep = fmt
+    full = sniff_full_encoding(path)
+    if full is not None and full != enc:
+        logging.info(f"Text table is not {enc} past the head, reading as {full}: {path} ({err})")
+        return (full, sep), "strict"
+    logging.warning(f"Text table has bytes no encoding can read, replacing them (cp932): {path} ({err})")
+    return ("cp932", sep), "replace"
+
+
+def sniff_delimiter(text: str, path: str = "") -> str:
+    """text（先頭の数百行）で各行の列数がいちばん揃う区切り。"""
+    if str(path).lower().endswith(".tsv"):
+        return "\t"
+    if "\n" in text:
+        text = text[: text.rindex("\n") + 1]  # 途中で切れた最後の行は使わない
+    best, best_score = ",", None
+    for sep in DELIMITERS:
+        counts = [len(r) for r in csv.reader(io.StringIO(text), delimiter=sep) if r]
+        multi = [c for c in counts if c > 1]
+        if not multi:
+            continue
+        width, freq = Counter(multi).most_common(1)[0]
+        score = (freq / len(counts), width)  # 揃っている行の割合 → 列数
+        if best_score is None or score > best_score:
+            best, best_score = sep, score
+    return best
+
+
+def _head(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read(SNIFF_BYTES)
+
+
+def sniff(path: str) -> Tuple[str, str]:
+    """(文字コード, 区切り)。"""
+    head = _head(path)
+    enc = sniff_encoding(head)
+    text = codecs.getincrementaldecoder(enc)(errors="replace").decode(head, final=False)
+    return enc, sniff_delimiter(text, path)
+
+
+def _sample_width(path: str, fmt: Tuple[str, str]) -> int:
+    """先頭部分の最大列数（C エンジンは1行目の列数で幅を決めるため、names で渡す）。"""
+    enc, sep = fmt
+    text = codecs.getincrementaldecoder(enc)(errors="replace").decode(_head(path), final=False)
+    return max([len(r) for r in csv.reader(io.StringIO(text), delimiter=sep)] + [1])
+
+
+def _full_width(path: str, fmt: Tuple[str, str], errors: str = "strict") -> int:
+    """ファイル全体の最大列数（先頭より後ろに列の多い行があった場合だけ使う）。"""
+    enc, sep = fmt
+    with open(path, encoding=enc, errors=errors, newline="") as f:
+        return max([len(r) for r in csv.reader(f, delimiter=sep)] + [1])
+
+
+def row_estimate(path: str) -> Optional[int]:
+    """行数の見積もり（ファイルサイズ / 先頭部分の1行の平均バイト数）。大容量モードの判定用。"""
+    try:
+        head = _head(path)
+        size = os.path.getsize(path)
+    except OSError:
+        return None
+    lines = head.count(b"\n")
+    if len(head) >= size:
+        return lines + (0 if head.endswith(b"\n") or not head else 1)
+    return int(size / (len(head) / max(1, lines)))
+
+
+# =====================
+# 読み込み
+# =====================
+def _read_options(fmt: Tuple[str, str], width: int, errors: str = "strict") -> dict:
+    enc, sep = fmt
+    return dict(
+        sep=sep, header=None, names=range(width), dtype=str, encoding=enc, encoding_errors=errors,
+        keep_default_na=False, na_values=[""], skip_blank_lines=False, engine="c",
+    )
+
+
+def _split_head(path: str, fmt: Tuple[str, str]) -> Optional[Tuple[List[List[str]], int, int]]:
+    """(列数の揃っていない先頭のレコード, 本体の開始バイト位置, 本体の列数)。先頭部分で本体が見えなければ None。"""
+    enc, sep = fmt
+    head = _head(path)
+    if len(head) < SNIFF_BYTES or enc == "utf-16":
+        return None  # 小さいファイルは C エンジンで十分
+    text = codecs.getincrementaldecoder(enc)(errors="replace").decode(head, final=False)
+    if "\n" not in text:
+        return None
+    lines = text[: text.rindex("\n") + 1].splitlines(keepends=True)
+    reader = csv.reader(lines, delimiter=sep)
+    recs, ends = [], []
+    for rec in reader:
+        recs.append(rec)
+        ends.append(reader.line_num)
+    recs, ends = recs[:-1], ends[:-1]  # 最後のレコードは引用符の途中で切れているかもしれない
+    if not recs:
+        return None
+    widths = [len(r) for r in recs]
+    width = Counter(widths).most_common(1)[0][0]
+    k = max((i + 1 for i, w in enumerate(widths) if w != width), default=0)
+    if width < 1 or k >= len(recs) - 1:
+        return None
+    prefix = "".join(lines[: ends[k - 1]]) if k else ""
+    raw = prefix.encode(enc)  # utf-8-sig は BOM を含む
+    if not head.startswith(raw):
+        return None  # 読めないバイトを置き換えていて位置が合わない
+    return recs[:k], len(raw), width
+
+
+def _read_arrow(path: str, fmt: Tuple[str, str], usecols: Optional[List[int]]):
+    """pyarrow.csv で読む。列数の違う行があるなど読めなければ None（C エンジンで読み直す）。"""
+    split = _split_head(path, fmt)
+    if split is None:
+        return None
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    top, offset, width = split
+    enc, sep = fmt
+    names = [str(i) for i in range(width)]
+    wanted = list(usecols) if usecols else list(range(max([width] + [len(r) for r in top])))
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            table = pacsv.read_csv(
+                f,
+                read_options=pacsv.ReadOptions(encoding="utf-8" if enc == "utf-8-sig" else enc, column_names=names),
+                parse_options=pacsv.ParseOptions(delimiter=sep, newlines_in_values=True, ignore_empty_lines=False),
+                convert_options=pacsv.ConvertOptions(
+                    column_types={n: pa.large_string() for n in names},
+                    null_values=[""], strings_can_be_null=True, quoted_strings_can_be_null=True,
+                    include_columns=[names[c] for c in wanted if c < width],
+                ),
+            )
+    except (pa.ArrowInvalid, UnicodeDecodeError) as e:
+        logging.info(f"Text table not rectangular, using the C engine: {path} ({e})")
+        return None
+    columns = []
+    for c in wanted:
+        head = pa.array([r[c] if c < len(r) and r[c] != "" else None for r in top], type=pa.large_string())
+        body = table.column(names[c]).chunks if c < width else [pa.nulls(table.num_rows, pa.large_string())]
+        columns.append(pa.chunked_array([head] + body, type=pa.large_string()))
+    df = pa.table(columns, names=[str(i) for i in range(len(columns))]).to_pandas()
+    df.columns = range(df.shape[1])
+    return df
+
+
+def read_text_raw(path: str, *, nrows: Optional[int] = None, usecols: Optional[Sequence[int]] = None,
+                  fmt: Optional[Tuple[str, str]] = None):
+    """CSV / TSV を read_sheet_raw と同じ形（header=None・全セル文字列・列ラベル 0..）で読む。
+    先頭で判定した文字コードで読めないバイトがあれば、ファイル全体で判定し直して読み直す。
+    """
+    fmt = fmt or sniff(path)
+    try:
+        return _read_text(path, nrows, usecols, fmt)
+    except UnicodeDecodeError as e:
+        fmt, errors = _resniff(path, fmt, e)
+        return _read_text(path, nrows, usecols, fmt, errors)
+
+
+def _read_text(path: str, nrows: Optional[int], usecols: Optional[Sequence[int]], fmt: Tuple[str, str],
+               errors: str = "strict"):
+    import pandas as pd
+
+    width = _sample_width(path, fmt)
+    cols = [c for c in usecols] if usecols else None
+    if nrows is None:
+        logging.info(f"Reading text table: {path} (encoding={fmt[0]}, sep={fmt[1]!r})")
+        if errors == "strict" and importlib.util.find_spec("pyarrow") is not None:
+            df = _read_arrow(path, fmt, cols)
+            if df is not None:
+                return _trim_columns(df) if cols is None else df
+    try:
+        df = pd.read_csv(path, nrows=nrows, **_read_options(fmt, max(width, max(cols or [0]) + 1), errors),
+                         usecols=cols)
+    except pd.errors.ParserError:
+        # 先頭より後ろに列の多い行がある：全体の列数を数えて読み直す
+        width = _full_width(path, fmt, errors)
+        df = pd.read_csv(path, nrows=nrows, **_read_options(fmt, max(width, max(cols or [0]) + 1), errors),
+                         usecols=cols)
+    df.columns = range(df.shape[1])
+    return _trim_columns(df) if cols is None else df
+
+
+def _trim_columns(df):
+    """全体で空の右端の列を落とす（列数は先頭部分の最大値で取っているため。Excel の読み込みと揃える）。"""
+    filled = df.notna().any(axis=0).tolist()
+    keep = len(filled)
+    while keep and not filled[keep - 1]:
+        keep -= 1
+    return df.iloc[:, :keep] if keep < len(filled) else df
+
+
+def iter_text_rows(path: str, fmt: Optional[Tuple[str, str]] = None,
+                   chunksize: int = CHUNK_ROWS) -> Iterator[List[str]]:
+    """CHUNK_ROWS 行ずつ解析して1行ずつ返す（値は文字列、空欄は ""）。大容量モードの取り込み用。"""
+    import pandas as pd
+
+    fmt = fmt or sniff(path)
+    width, full, skip, errors, resniffed = _sample_width(path, fmt), False, 0, "strict", False
+    while True:
+        done = 0
+        try:
+            with pd.read_csv(path, chunksize=chunksize, **_read_options(fmt, width, errors)) as reader:
+                for chunk in reader:
+                    for row in chunk.fillna("").itertuples(index=False, name=None):
+                        done += 1
+                        if done > skip:
+                            yield list(row)
+            return
+        except UnicodeDecodeError as e:
+            if resniffed:
+                raise
+            # 先頭より後ろに読めないバイトがある：ファイル全体で文字コードを判定し直し、返し済みの行は飛ばす
+            # （返し済みの行は判定し直す前の文字コードでエラーなく読めた行）
+            fmt, errors = _resniff(path, fmt, e)
+            resniffed, skip = True, max(skip, done)
+            if full:
+                width = _full_width(path, fmt, errors)
+        except pd.errors.ParserError:
+            if full:
+                raise
+            # 先頭より後ろに列の多い行がある：全体の列数で読み直し、返し済みの行は飛ばす
+            width, full, skip = _full_width(path, fmt, errors), True, max(skip, done)
+
+
+# =====================
+# 書き出し
+# =====================
+def output_format(path: str, source: Optional[str] = None) -> Tuple[str, str]:
+    """path に書くときの (文字コード, 区切り)。元ファイルと同じ拡張子（上書き・コピー）なら元の形式に合わせる。"""
+    ext = os.path.splitext(str(path))[1].lower()
+    if source and is_text_table(source) and os.path.splitext(str(source))[1].lower() == ext:
+        try:
+            enc, sep = sniff(source)
+            # 読み込みと同じく全体で読める文字コード（どれでも読めなければ文字化けしない既定の形式）
+            return sniff_full_encoding(source, enc) or DEFAULT_OUTPUT[0], sep
+        except OSError:
+            pass
+    return DEFAULT_OUTPUT[0], "\t" if ext == ".tsv" else DEFAULT_OUTPUT[1]
@@ -0,0 +1,256 @@
+"""AI検索ビューア：編集ジャーナル（クラッシュ時の復旧用、Tk 非依存）
+
+確定した操作（セル編集・上部行編集・列/行追加・列名変更・列一括編集・検索リンク更新・並び替え・Undo/Redo）を
+元ファイルごとのジャーナル（JSON Lines）に1行ずつ追記します。
+- 追記は write + flush のみ（1操作あたり数十µs）。fsync は sync_every 件ごと、または呼び出し側の定期 sync() で
+- 保存して未保存の変更が無くなったら reset()、ウィンドウを閉じたら close(discard=True) で消す
+- 次回起動時に残っていれば（＝異常終了）、元ファイルを読み直して replay() で再適用できる
+
+1行目はヘッダー {"op": "open", "path", "sheet", "sig", "header_row", "usecols"}、以降が操作レコードです。
+ジャーナルは元ファイルのシートごと（複数シートのブックはシートごとに別ファイル）。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aisv_core as core
+
+JOURNAL_DIRNAME = ".ai_search_viewer_journal"
+SYNC_EVERY = 32
+
+
+def journal_path(folder: str, source: str, sheet: Optional[str] = None) -> str:
+    key = os.path.normcase(os.path.abspath(source))
+    if sheet is not None:
+        key += "\0" + sheet
+    h = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(folder, f"{h}.jsonl")
+
+
+def _dumps(rec: Dict) -> str:
+    return json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+class EditJournal:
+    """1ファイルぶんの追記型ジャーナル。ファイルは最初の append() まで作りません。"""
+
+    def __init__(self, folder: str, *, sync_every: int = SYNC_EVERY):
+        self.folder = folder
+        self.sync_every = max(1, int(sync_every))
+        self.path: Optional[str] = None
+        self._header: Optional[Dict] = None
+        self._fh = None
+        self._unsynced = 0
+        self.count = 0
+
+    @property
+    def active(self) -> bool:
+        return self._header is not None
+
+    def begin(self, source: str, sig, header_row: int, usecols=None, sheet: Optional[str] = None):
+        """source の新しいジャーナルを始める（同じ元ファイル・シートの古いジャーナルは消す）。
+        usecols は列を絞って読み込んだ場合の元の列位置（復旧時に同じ列で読み直す）。
+        sheet はシート名（None は最初のシート）。
+        """
+        self.close(discard=True)
+        self.path = journal_path(self.folder, source, sheet)
+        self._header = {
+            "op": "open",
+            "path": os.path.abspath(source),
+            "sheet": sheet,
+            "sig": list(sig) if sig else None,
+            "header_row": int(header_row or 1),
+            "usecols": [int(c) for c in usecols] if usecols else None,
+            "time": time.time(),
+        }
+        self._remove_file()
+
+    def reset(self, sig=None):
+        """保存済みになった時：記録を捨ててヘッダーだけ残す（次の append で作り直す）。"""
+        if self._header is None:
+            return
+        self._close_file()
+        self._remove_file()
+        if sig is not None:
+            self._header["sig"] = list(sig)
+        self._header["time"] = time.time()
+        self.count = 0
+
+    def append(self, op: str, **fields):
+        if self._header is None:
+            return
+        if self._fh is None:
+            os.makedirs(self.folder, exist_ok=True)
+            self._fh = open(self.path, "a", encoding="utf-8")
+            if self._fh.tell() == 0:
+                self._fh.write(_dumps(self._header))
+        rec = {"op": op}
+        rec.update(fields)
+        self._fh.write(_dumps(rec))
+        self._fh.flush()  # プロセスが落ちても OS には渡っている
+        self.count += 1
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        """未 fsync の記録があればディスクへ（電源断への備え）。"""
+        if self._fh is None or self._unsynced == 0:
+            return
+        try:
+            os.fsync(self._fh.fileno())
+        except OSError as e:
+            logging.warning(f"Journal fsync failed: {e}")
+        self._unsynced = 0
+
+    def close(self, *, discard: bool = False):
+        self._close_file()
+        if discard:
+            self._remove_file()
+        self._header = None
+        self.path = None
+        self.count = 0
+
+    def _close_file(self):
+        if self._fh is not None:
+            try:
+                self.sync()
+                self._fh.close()
+            except Exception:
+                pass
+        self._fh = None
+        self._unsynced = 0
+
+    def _remove_file(self):
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+# =====================
+# 読み出し / 再適用
+# =====================
+def read_journal(path: str) -> Tuple[Optional[Dict], List[Dict]]:
+    """(ヘッダー, 操作レコード)。書きかけの最終行などの壊れた行はそこで打ち切る。"""
+    header = None
+    records: List[Dict] = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break
+                if header is None:
+                    if rec.get("op") != "open":
+                        return None, []
+                    header = rec
+                else:
+                    records.append(rec)
+    except OSError:
+        return None, []
+    return header, records
+
+
+def pending_journals(folder: str) -> List[Tuple[str, Dict, List[Dict]]]:
+    """操作が残っているジャーナル（新しい順）。"""
+    out = []
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return out
+    for name in names:
+        if not name.endswith(".jsonl"):
+            continue
+        p = os.path.join(folder, name)
+        header, records = read_journal(p)
+        if header and records:
+            out.append((p, header, records))
+    out.sort(key=lambda t: os.path.getmtime(t[0]), reverse=True)
+    return out
+
+
+def discard(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _commit(doc: core.SearchDocument, after) -> bool:
+    return doc.commit(doc.current_df.copy(), after)
+
+
+def apply_record(doc: core.SearchDocument, rec: Dict) -> bool:
+    """1操作を doc に適用する（GUI の操作と同じ結果になるように）。"""
+    op = rec.get("op")
+    cur = doc.current_df
+    if op == "pre":
+        try:
+            doc.raw_df.iat[int(rec["r"]), int(rec["c"])] = rec["v"]
+        except Exception:
+            pass
+        doc.rebuild_table()
+        return True
+    if cur is None:
+        return False
+    if op == "cell":
+        after = cur.copy()
+        after.iat[int(rec["r"]), int(rec["c"])] = rec["v"]
+        if _commit(doc, after):
+            doc.mirror_to_raw(int(rec["r"]), int(rec["c"]), rec["v"])
+        return True
+    if op == "add_col":
+        after = cur.copy()
+        after[rec["name"]] = ""
+        return _commit(doc, after)
+    if op == "add_row":
+        after = cur.copy()
+        after.loc[len(after)] = [""] * len(after.columns)
+        return _commit(doc, after)
+    if op == "rename":
+        return _commit(doc, cur.rename(columns={rec["old"]: rec["new"]}))
+    if op == "bulk":
+        after = cur.copy()
+        after[rec["col"]] = core.formula_column(rec["formula"], len(cur))
+        return _commit(doc, after)
+    if op == "links":
+        after = doc.with_search_columns(
+            list(rec["base_cols"]),
+            joiner=rec.get("joiner", " "),
+            generate_ai=bool(rec.get("generate_ai", True)),
+            generate_google=bool(rec.get("generate_google", True)),
+            ai_template=rec.get("ai_template", core.DEFAULT_AI_TEMPLATE),
+            google_template=rec.get("google_template", core.DEFAULT_GOOGLE_TEMPLATE),
+            insert_mode=rec.get("insert_mode", "fixed2"),
+            anchor_col=rec.get("anchor_col"),
+        )
+        return doc.commit(cur.copy(), after, links=core.link_templates(after))
+    if op == "sort":
+        doc.sort(rec["col"], bool(rec.get("asc", True)))
+        return True
+    if op == "undo":
+        return doc.undo()
+    if op == "redo":
+        return doc.redo()
+    logging.warning(f"Journal: unknown op {op!r}")
+    return False
+
+
+def replay(doc: core.SearchDocument, records: List[Dict]) -> int:
+    """records を順に適用し、適用できた件数を返す（失敗した操作はログに残して続行）。"""
+    n = 0
+    for rec in records:
+        try:
+            apply_record(doc, rec)
+            n += 1
+        except Exception as e:
+            logging.warning(f"Journal replay failed at {rec.get('op')}: {e}")
+    return n
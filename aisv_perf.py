@@ -0,0 +1,517 @@
+"""AI検索ビューア：処理時間の計測（Tk 非依存）
+
+重い操作（読み込み・見出し行の再構築・表示・検索リンク更新・並び替え・Undo用コピー・保存）を
+span で囲み、壁時計時間と行数・列数を記録します。
+StallMonitor は一定間隔のハートビートでイベントループの遅れ（フリーズ）を測り、
+その間に動いていた操作名と一緒に記録します。
+MemoryProfiler（任意・実行中に ON/OFF）は tracemalloc で操作ごとのピーク/残留メモリを測ります。
+ProfileCapture は「次の操作」1回だけを cProfile で囲み、.prof と上位関数の要約(.txt)を保存します。
+GUI の「表示 → パフォーマンス」で直近の記録と操作ごとのパーセンタイルを確認できます。
+"""
+import bisect
+import cProfile
+import functools
+import io
+import json
+import logging
+import math
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, List, Optional
+
+# この秒数以上かかった操作はログにも残す
+SLOW_LOG_SECONDS = 1.0
+
+# イベントループ遅延ヒストグラムの区切り（ミリ秒、上限側）
+LAG_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def percentile(sorted_vals: List[float], pct: float) -> float:
+    """昇順リストの pct パーセンタイル（最近傍順位法）。"""
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(pct / 100.0 * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+
+class Span:
+    """計測中の1操作。shape() で行数・列数を後から設定できます。"""
+
+    __slots__ = ("name", "rows", "cols", "detail")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows: Optional[int] = None
+        self.cols: Optional[int] = None
+        self.detail = ""
+
+    def shape(self, df):
+        try:
+            self.rows, self.cols = int(df.shape[0]), int(df.shape[1])
+        except Exception:
+            pass
+
+
+class PerfRecorder:
+    """直近 maxlen 件の計測記録を保持する。"""
+
+    def __init__(self, maxlen: int = 1000):
+        self.records: Deque[Dict] = deque(maxlen=maxlen)
+        self.active: List[str] = []  # 実行中の操作名（入れ子）
+        self.memory: Optional["MemoryProfiler"] = None  # メモリ計測モード（None なら計測しない）
+
+    @contextmanager
+    def span(self, name: str, shape_fn: Optional[Callable] = None):
+        """with で囲んだ処理の時間を記録する。
+        shape_fn を渡すと終了時に呼び、返った DataFrame の行数・列数を記録します。
+        """
+        sp = Span(name)
+        self.active.append(name)
+        # メモリ計測は一番外側の操作だけ（入れ子の二重計上を避ける）
+        mem_state = self.memory.before() if (self.memory is not None and len(self.active) == 1) else None
+        ok = True
+        t0 = time.perf_counter()
+        try:
+            yield sp
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            sec = time.perf_counter() - t0
+            try:
+                self.active.remove(name)
+            except ValueError:
+                pass
+            if sp.rows is None and shape_fn is not None:
+                try:
+                    df = shape_fn()
+                    if df is not None:
+                        sp.shape(df)
+                except Exception:
+                    pass
+            mem = None
+            if mem_state is not None and self.memory is not None:
+                try:
+                    mem = self.memory.after(mem_state)
+                except Exception:
+                    mem = None
+            self.add(name, sec, sp.rows, sp.cols, ok=ok, detail=sp.detail, start=t0, mem=mem)
+
+    def add(self, name: str, seconds: float, rows=None, cols=None, *, ok: bool = True, detail: str = "",
+            start: Optional[float] = None, mem: Optional[Dict] = None):
+        end = time.perf_counter()
+        rec = {
+            "time": time.strftime("%H:%M:%S"),
+            "name": name,
+            "seconds": seconds,
+            "rows": rows,
+            "cols": cols,
+            "ok": ok,
+            "detail": detail,
+            "start": start if start is not None else end - seconds,
+            "end": end,
+        }
+        if mem:
+            rec.update(mem)
+        self.records.append(rec)
+        if seconds >= SLOW_LOG_SECONDS:
+            logging.info(f"Perf: {name} {seconds:.3f}s (rows={rows}, cols={cols}{', failed' if not ok else ''})")
+
+    def current(self) -> str:
+        """いま実行中の操作名（最も内側）。無ければ空文字。"""
+        return self.active[-1] if self.active else ""
+
+    def spans_between(self, t_from: float, t_to: float) -> List[Dict]:
+        """[t_from, t_to]（perf_counter 値）と重なった記録（古い順）。"""
+        out = []
+        for r in reversed(self.records):
+            if r["end"] < t_from:
+                break
+            if r["start"] <= t_to:
+                out.append(r)
+        out.reverse()
+        return out
+
+    def recent(self, n: int = 200) -> List[Dict]:
+        return list(self.records)[-n:]
+
+    def summary(self) -> List[Dict]:
+        """操作ごとの件数・直近・p50/p90/p99・最大。"""
+        by_name: Dict[str, List[Dict]] = {}
+        for r in self.records:
+            by_name.setdefault(r["name"], []).append(r)
+        out = []
+        for name, recs in by_name.items():
+            secs = sorted(r["seconds"] for r in recs)
+            last = recs[-1]
+            out.append({
+                "name": name,
+                "count": len(recs),
+                "last": last["seconds"],
+                "p50": percentile(secs, 50),
+                "p90": percentile(secs, 90),
+                "p99": percentile(secs, 99),
+                "max": secs[-1],
+                "rows": last["rows"],
+                "cols": last["cols"],
+            })
+        out.sort(key=lambda d: d["max"], reverse=True)
+        return out
+
+    def memory_summary(self) -> List[Dict]:
+        """メモリ計測つきの記録を操作ごとに集計（バイト）。"""
+        by_name: Dict[str, List[Dict]] = {}
+        for r in self.records:
+            if "mem_peak" in r:
+                by_name.setdefault(r["name"], []).append(r)
+        out = []
+        for name, recs in by_name.items():
+            last = recs[-1]
+            out.append({
+                "name": name,
+                "count": len(recs),
+                "peak_max": max(r["mem_peak"] for r in recs),
+                "peak_last": last["mem_peak"],
+                "retained_last": last["mem_retained"],
+                "retained_total": sum(r["mem_retained"] for r in recs),
+                "df_delta_last": last.get("df_delta"),
+                "top": last.get("mem_top", []),
+            })
+        out.sort(key=lambda d: d["peak_max"], reverse=True)
+        return out
+
+    def clear(self):
+        self.records.clear()
+
+
+# =====================
+# メモリ計測（tracemalloc）
+# =====================
+def df_bytes(df) -> int:
+    """DataFrame の使用メモリ（文字列の中身も含む deep 計測）。"""
+    if df is None:
+        return 0
+    try:
+        return int(df.memory_usage(index=True, deep=True).sum())
+    except Exception:
+        return 0
+
+
+def fmt_bytes(n) -> str:
+    if n is None:
+        return ""
+    sign = "-" if n < 0 else ""
+    n = abs(float(n))
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{sign}{n:.0f}{unit}" if unit == "B" else f"{sign}{n:.1f}{unit}"
+        n /= 1024.0
+    return f"{sign}{n:.1f}GB"
+
+
+class MemoryProfiler:
+    """操作の前後で tracemalloc を使い、ピーク増分・残留増分・増えた場所（上位）を測る。
+
+    - df_fn を渡すと、その DataFrame の memory_usage(deep=True) の前後差も記録
+    - snapshots=True なら前後のスナップショット差分から残留の多い行を top_n 件記録
+    start() するまで何もしません（OFF の間は PerfRecorder.memory を None にしておく）。
+    """
+
+    def __init__(self, df_fn: Optional[Callable] = None, *, snapshots: bool = True, top_n: int = 5):
+        self.df_fn = df_fn
+        self.snapshots = snapshots
+        self.top_n = top_n
+        self._started_here = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_here = True
+
+    def stop(self):
+        if self._started_here and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started_here = False
+
+    def _df_bytes(self):
+        if self.df_fn is None:
+            return None
+        try:
+            return df_bytes(self.df_fn())
+        except Exception:
+            return None
+
+    @staticmethod
+    def _snapshot():
+        # tracemalloc 自身の確保は除外
+        return tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+
+    def before(self) -> Dict:
+        if not tracemalloc.is_tracing():
+            return {}
+        state = {"df": self._df_bytes()}
+        state["snap"] = self._snapshot() if self.snapshots else None
+        tracemalloc.reset_peak()
+        state["cur"] = tracemalloc.get_traced_memory()[0]
+        return state
+
+    def after(self, state: Dict) -> Optional[Dict]:
+        if not state or not tracemalloc.is_tracing():
+            return None
+        cur, peak = tracemalloc.get_traced_memory()
+        out = {
+            "mem_peak": max(0, peak - state["cur"]),
+            "mem_retained": cur - state["cur"],
+        }
+        df_after = self._df_bytes()
+        if df_after is not None and state.get("df") is not None:
+            out["df_delta"] = df_after - state["df"]
+        if state.get("snap") is not None:
+            try:
+                diff = self._snapshot().compare_to(state["snap"], "lineno")
+                out["mem_top"] = [
+                    f"{fmt_bytes(d.size_diff)} {os.path.basename(d.traceback[0].filename)}:{d.traceback[0].lineno}"
+                    for d in diff[: self.top_n] if d.size_diff > 0
+                ]
+            except Exception:
+                pass
+        return out
+
+
+# =====================
+# cProfile（次の操作を1回だけ）
+# =====================
+def log_dir() -> str:
+    """ログファイル（ai_search_viewer.log）のあるフォルダ。無ければカレント。"""
+    for h in logging.getLogger().handlers:
+        fn = getattr(h, "baseFilename", None)
+        if fn:
+            return os.path.dirname(os.path.abspath(fn))
+    return os.path.abspath(".")
+
+
+class ProfileCapture:
+    """arm() した後の最初の capture() だけを cProfile で計測して保存する。
+
+    保存先は out_dir（既定はログと同じフォルダ）:
+    - aisv_profile_YYYYmmdd_HHMMSS_<操作>.prof（snakeviz / pstats で開ける）
+    - 同名 .txt（累積時間の上位 top_n 関数と、自己時間の上位）
+    """
+
+    def __init__(self, out_dir: Optional[str] = None, *, top_n: int = 40,
+                 context_fn: Optional[Callable[[], Dict]] = None,
+                 on_done: Optional[Callable[[str, str], None]] = None):
+        self.out_dir = out_dir
+        self.top_n = top_n
+        self.context_fn = context_fn
+        self.on_done = on_done
+        self.armed = False
+        self._running = False
+        self.last_paths: List[str] = []
+
+    def arm(self):
+        self.armed = True
+
+    def disarm(self):
+        self.armed = False
+
+    @contextmanager
+    def capture(self, name: str):
+        """arm 済みなら name の処理を計測。そうでなければ何もしない（入れ子は外側だけ）。"""
+        if not self.armed or self._running:
+            yield
+            return
+        self.armed = False
+        self._running = True
+        prof = cProfile.Profile()
+        t0 = time.perf_counter()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            sec = time.perf_counter() - t0
+            self._running = False
+            try:
+                self._write(prof, name, sec)
+            except Exception as e:
+                logging.warning(f"Profile save failed: {e}")
+
+    def _write(self, prof: cProfile.Profile, name: str, seconds: float):
+        folder = self.out_dir or log_dir()
+        os.makedirs(folder, exist_ok=True)
+        safe = "".join(ch if (ch.isalnum() or ch in "-_") else "_" for ch in name)
+        base = os.path.join(folder, f"aisv_profile_{time.strftime('%Y%m%d_%H%M%S')}_{safe}")
+        prof_path = base + ".prof"
+        txt_path = base + ".txt"
+        prof.dump_stats(prof_path)
+
+        ctx = {}
+        if self.context_fn is not None:
+            try:
+                ctx = dict(self.context_fn() or {})
+            except Exception:
+                ctx = {}
+        buf = io.StringIO()
+        buf.write(f"操作: {name}\n所要時間: {seconds:.3f}s\n")
+        for k, v in ctx.items():
+            buf.write(f"{k}: {v}\n")
+        buf.write(f"python: {sys.version.split()[0]}  platform: {sys.platform}\n\n")
+        buf.write(f"=== 累積時間の上位 {self.top_n} ===\n")
+        st = pstats.Stats(prof, stream=buf)
+        st.strip_dirs().sort_stats("cumulative").print_stats(self.top_n)
+        buf.write("\n=== 自己時間の上位 20 ===\n")
+        st.sort_stats("tottime").print_stats(20)
+        with open(txt_path, "w", encoding="utf-8") as f:
+            f.write(buf.getvalue())
+
+        self.last_paths = [prof_path, txt_path]
+        logging.info(f"Profile saved: {prof_path} ({name}, {seconds:.3f}s)")
+        if self.on_done is not None:
+            try:
+                self.on_done(prof_path, txt_path)
+            except Exception:
+                pass
+
+
+def timed(name: str, shape_attr: str = "current_df"):
+    """メソッド用デコレータ。self.perf（PerfRecorder）があれば span で囲む。"""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            perf = getattr(self, "perf", None)
+            if perf is None:
+                return fn(self, *args, **kwargs)
+            with perf.span(name, shape_fn=lambda: getattr(self, shape_attr, None)):
+                return fn(self, *args, **kwargs)
+        return wrapper
+    return deco
+
+
+# =====================
+# イベントループ遅延（フリーズ）検出
+# =====================
+class StallMonitor:
+    """after() で interval_ms ごとにハートビートを予約し、予定より遅れた分を「遅延」として測る。
+
+    - 遅延はヒストグラム（LAG_BUCKETS_MS）に集計
+    - stall_ms 以上の遅延は「フリーズ」として、その間に動いていた操作（PerfRecorder の記録）と
+      その時点の文書サイズ（context_fn の戻り値）つきで記録
+    Tk に依存しないよう、予約関数（root.after 相当）は start() で受け取ります。
+    """
+
+    def __init__(self, perf: Optional[PerfRecorder] = None, *, interval_ms: int = 100, stall_ms: int = 250,
+                 context_fn: Optional[Callable[[], Dict]] = None, maxlen: int = 500):
+        self.perf = perf
+        self.interval_ms = max(10, int(interval_ms))
+        self.stall_ms = max(self.interval_ms, int(stall_ms))
+        self.context_fn = context_fn
+        self.counts = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self.lags: Deque[float] = deque(maxlen=5000)
+        self.stalls: Deque[Dict] = deque(maxlen=maxlen)
+        self.beats = 0
+        self.max_lag_ms = 0.0
+        self._after = None
+        self._last: Optional[float] = None
+        self._running = False
+
+    def start(self, after_fn: Callable):
+        """after_fn(ms, callback) でハートビートを開始する（Tk なら root.after）。"""
+        self._after = after_fn
+        self._running = True
+        self._last = time.perf_counter()
+        self._after(self.interval_ms, self._beat)
+
+    def stop(self):
+        self._running = False
+
+    def _beat(self):
+        if not self._running:
+            return
+        now = time.perf_counter()
+        self.tick(now)
+        try:
+            self._after(self.interval_ms, self._beat)
+        except Exception:
+            self._running = False
+
+    def tick(self, now: float):
+        """ハートビート1回分の処理（予定時刻からの遅れを記録）。"""
+        last = self._last if self._last is not None else now
+        self._last = now
+        lag_ms = max(0.0, (now - last) * 1000.0 - self.interval_ms)
+        self.beats += 1
+        self.lags.append(lag_ms)
+        self.counts[bisect.bisect_left(LAG_BUCKETS_MS, lag_ms)] += 1
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        if lag_ms >= self.stall_ms:
+            self._record_stall(last, now, lag_ms)
+
+    def _record_stall(self, t_from: float, t_to: float, lag_ms: float):
+        ops = []
+        if self.perf is not None:
+            for r in self.perf.spans_between(t_from, t_to):
+                ops.append({"name": r["name"], "seconds": round(r["seconds"], 4), "detail": r["detail"]})
+            for name in self.perf.active:
+                # ネストしたイベントループ（ダイアログ待ちなど）の中で検出した場合は実行中の操作
+                ops.append({"name": name, "seconds": None, "detail": "running"})
+        ctx = {}
+        if self.context_fn is not None:
+            try:
+                ctx = dict(self.context_fn() or {})
+            except Exception:
+                ctx = {}
+        rec = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "lag_ms": round(lag_ms, 1), "ops": ops}
+        rec.update(ctx)
+        self.stalls.append(rec)
+        names = ",".join(o["name"] for o in ops) or "-"
+        logging.info(f"UI stall: {lag_ms:.0f}ms during {names} (rows={ctx.get('rows')}, cols={ctx.get('cols')})")
+
+    def histogram(self) -> List[Dict]:
+        out = []
+        lo = 0
+        for i, hi in enumerate(LAG_BUCKETS_MS):
+            out.append({"range_ms": f"{lo}-{hi}", "count": self.counts[i]})
+            lo = hi
+        out.append({"range_ms": f"{lo}-", "count": self.counts[-1]})
+        return out
+
+    def summary(self) -> Dict:
+        lags = sorted(self.lags)
+        return {
+            "interval_ms": self.interval_ms,
+            "stall_ms": self.stall_ms,
+            "beats": self.beats,
+            "stalls": len(self.stalls),
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "p50_lag_ms": round(percentile(lags, 50), 1),
+            "p99_lag_ms": round(percentile(lags, 99), 1),
+        }
+
+    def to_dict(self) -> Dict:
+        d = {"summary": self.summary(), "histogram": self.histogram(), "stalls": list(self.stalls)}
+        if self.context_fn is not None:
+            try:
+                d["context"] = dict(self.context_fn() or {})
+            except Exception:
+                pass
+        return d
+
+    def export_json(self, path: str, extra: Optional[Dict] = None):
+        d = self.to_dict()
+        if extra:
+            d.update(extra)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(d, f, ensure_ascii=False, indent=2)
+
+    def reset(self):
+        self.counts = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self.lags.clear()
+        self.stalls.clear()
+        self.beats = 0
+        self.max_lag_ms = 0.0
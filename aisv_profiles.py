@@ -0,0 +1,170 @@
+"""AI検索ビューア：読み込みプロファイル（ファイル別 / テンプレート別、Tk 非依存）
+
+見出し行・読み込む列・検索語句列・区切り・リンク設定・列幅を覚えておき、次に同じファイル、または
+同じ見出し（仕入先テンプレートなど）のファイルを開いたときに読み込み設定ダイアログを省きます。
+
+- ファイル別: 絶対パス（最初以外のシートはシート名も）で引く。同じパスに見出しの違うファイルが置かれた場合に
+  古い設定で開かないよう、記録したときの見出しのハッシュ（header_sig）と一致するときだけ使う
+- テンプレート別: 見出し行の値の並びのハッシュ（header_signature）で引く。
+  判定には先頭の数行だけ読む（read_sheet_raw(nrows=...)）ので全体の読み込みは1回で済みます。
+保存先は ~/.ai_search_viewer_profiles.json（件数は MAX_ENTRIES まで、古いものから消す）。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aisv_core as core
+
+DEFAULT_PROFILES_NAME = ".ai_search_viewer_profiles.json"
+MAX_ENTRIES = 200
+
+# プロファイルに保存する項目（GUI の属性名と同じ）
+PROFILE_KEYS = (
+    "header_row",
+    "usecols",
+    "base_col_names",
+    "base_joiner",
+    "generate_ai",
+    "generate_google",
+    "ai_url_template",
+    "link_insert_mode",
+    "col_widths",
+)
+
+
+def header_signature(raw_df, header_row: int, usecols=None) -> Optional[str]:
+    """見出し行（1始まり）の値の並びから作るハッシュ。行が無い・全部空なら None。
+    usecols を渡すと全列で読んだ raw_df からその列だけを使う（列を絞って読み込んだ文書と比べるため）。
+    """
+    if raw_df is None or header_row < 1 or len(raw_df) < header_row:
+        return None
+    row = raw_df.iloc[header_row - 1].tolist()
+    if usecols:
+        row = [row[c] if c < len(row) else "" for c in usecols]
+    vals = [core.safe_text(v).strip() for v in row]
+    while vals and not vals[-1]:
+        vals.pop()
+    if not any(vals):
+        return None
+    return hashlib.sha1("\t".join(vals).encode("utf-8")).hexdigest()[:20]
+
+
+def _file_key(path: str, sheet: Optional[str] = None) -> str:
+    key = os.path.normcase(os.path.abspath(path))
+    return f"{key}::{sheet}" if sheet is not None else key
+
+
+def _template_key(header_row: int, sig: str, usecols=None) -> str:
+    key = f"{header_row}:{sig}"
+    return f"{key}:{core.format_column_spec(usecols)}" if usecols else key
+
+
+class ProfileStore:
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, Dict] = {}
+        self.templates: Dict[str, Dict] = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.files = dict(data.get("files") or {})
+            self.templates = dict(data.get("templates") or {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.warning(f"Profiles unreadable: {e}")
+
+    def save(self):
+        for table in (self.files, self.templates):
+            if len(table) > MAX_ENTRIES:
+                old = sorted(table, key=lambda k: table[k].get("used", 0))
+                for k in old[: len(table) - MAX_ENTRIES]:
+                    del table[k]
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files, "templates": self.templates}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+    # ---------------------
+    # 検索
+    # ---------------------
+    def for_file(self, path: str, sheet: Optional[str] = None) -> Optional[Dict]:
+        return self.files.get(_file_key(path, sheet))
+
+    def template_header_rows(self) -> List[int]:
+        return sorted({int(p.get("header_row") or 1) for p in self.templates.values()})
+
+    def _template_layouts(self) -> List[Tuple[int, Optional[Tuple[int, ...]]]]:
+        out = {(int(p.get("header_row") or 1), tuple(p["usecols"]) if p.get("usecols") else None)
+               for p in self.templates.values()}
+        return sorted(out, key=lambda t: (t[0], t[1] or ()))
+
+    def for_template(self, raw_head) -> Optional[Dict]:
+        """先頭行（header=None・全列で読んだもの）に一致するテンプレートのプロファイル。"""
+        for hr, usecols in self._template_layouts():
+            sig = header_signature(raw_head, hr, usecols)
+            if sig is None:
+                continue
+            prof = self.templates.get(_template_key(hr, sig, usecols))
+            if prof is not None:
+                return prof
+        return None
+
+    @staticmethod
+    def file_matches(prof: Dict, raw_head) -> bool:
+        """ファイル別のプロファイルが、今のファイルの見出し（先頭行・全列で読んだもの）と合うか。
+        header_sig の無い古い記録は確かめられないので合わない扱い（読み込み設定ダイアログで記録し直す）。
+        """
+        if "header_sig" not in prof:
+            return False
+        hr = int(prof.get("header_row") or 1)
+        return header_signature(raw_head, hr, prof.get("usecols")) == prof["header_sig"]
+
+    def find(self, path: str, sheet: Optional[str] = None) -> Optional[Dict]:
+        """ファイル別 → テンプレート別の順に探す。どちらも見出しの判定に先頭数行だけ読む。"""
+        prof = self.for_file(path, sheet)
+        rows = self.template_header_rows() + ([int(prof.get("header_row") or 1)] if prof is not None else [])
+        if not rows:
+            return None
+        try:
+            head = core.read_sheet_raw(path, nrows=max(rows), sheet_name=sheet)
+        except Exception:
+            return None
+        if prof is not None and self.file_matches(prof, head):
+            return dict(prof, match="file")
+        prof = self.for_template(head)
+        return dict(prof, match="template") if prof is not None else None
+
+    # ---------------------
+    # 記録
+    # ---------------------
+    def remember(self, path: str, raw_df, settings: Dict, sheet: Optional[str] = None):
+        """path（のシート）と、その見出しのテンプレートの両方に settings を記録する。
+        raw_df は文書の raw_df（列を絞って読み込んだ場合はその列だけのもの）。
+        """
+        prof = {k: settings[k] for k in PROFILE_KEYS if k in settings}
+        prof["header_row"] = int(prof.get("header_row") or 1)
+        prof["used"] = time.time()
+        sig = header_signature(raw_df, prof["header_row"])
+        self.files[_file_key(path, sheet)] = dict(prof, header_sig=sig)
+        if sig is not None:
+            key = _template_key(prof["header_row"], sig, prof.get("usecols"))
+            self.templates[key] = dict(prof, example=os.path.basename(path))
+
+    def forget(self, path: str, raw_df=None, header_row: int = 1, usecols=None, sheet: Optional[str] = None):
+        self.files.pop(_file_key(path, sheet), None)
+        sig = header_signature(raw_df, header_row)
+        if sig is not None:
+            self.templates.pop(_template_key(header_row, sig, usecols), None)
+
+    def clear(self):
+        self.files.clear()
+        self.templates.clear()
@@ -0,0 +1,116 @@
+"""AI検索ビューア：前回セッションのスナップショット（Tk 非依存）
+
+終了時に文書（raw_df / current_df / 見出し行）と表示状態（検索語句列・並び替え・列幅など）を
+pickle で1ファイルに保存し（複数シートのブックは開いたシートすべて）、次回起動時に元ファイルが変わっていなければ
+Excel を読み直さずにそのまま復元します（openpyxl を使わないので速い）。
+
+有効判定:
+- 形式バージョンと pandas のバージョンが一致
+- 元ファイルのパスが同じで、(サイズ, 更新時刻) が保存時の source_sig と一致
+自分のホームフォルダに自分で書いたファイルだけを読みます（pickle のため）。
+"""
+from __future__ import annotations
+
+import logging
+import os
+import pickle
+import time
+from typing import Dict, List, Optional
+
+import aisv_core as core
+
+SNAPSHOT_VERSION = 1
+DEFAULT_SNAPSHOT_NAME = ".ai_search_viewer_session.pkl"
+
+
+def _same_path(a: Optional[str], b: Optional[str]) -> bool:
+    if not a or not b:
+        return False
+    return os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+
+def doc_state(doc: core.SearchDocument) -> Dict:
+    """SearchDocument から保存する部分（Undo/Redo 履歴は含めない）。"""
+    return {
+        "path": doc.path,
+        "source_sig": doc.source_sig,
+        "raw_df": doc.raw_df,
+        "current_df": doc.current_df,
+        "links": dict(doc.links),
+        "header_row": doc.header_row,
+        "header_vals": list(doc.header_vals),
+        "source_columns": list(doc.source_columns),
+        "usecols": list(doc.usecols) if doc.usecols else None,
+        "sheet_name": doc.sheet_name,
+    }
+
+
+def restore_doc(doc: core.SearchDocument, state: Dict):
+    """doc_state() の内容を doc に戻す（履歴はクリア）。"""
+    doc.path = state["path"]
+    doc.source_sig = state["source_sig"]
+    doc.raw_df = state["raw_df"]
+    # links が無いのは links を持つ前のスナップショット（表の attrs に残っている）
+    links = state.get("links")
+    doc.set_table(state["current_df"], links if links is not None else core.link_templates(state["current_df"]))
+    doc.header_row = int(state.get("header_row") or 1)
+    doc.header_vals = list(state.get("header_vals") or [])
+    doc.source_columns = list(state.get("source_columns") or [])
+    doc.usecols = list(state["usecols"]) if state.get("usecols") else None
+    doc.sheet_name = state.get("sheet_name")
+    doc.clear_history()
+
+
+def save_snapshot(path: str, doc: core.SearchDocument, view: Optional[Dict] = None,
+                  others: Optional[List[Dict]] = None) -> bool:
+    """スナップショットを書く（一時ファイル→置き換え）。元ファイルの署名が無い文書は書かない。
+    others は同じブックの表示中以外のシート [{"doc": SearchDocument, "view": dict}]。
+    """
+    if doc.current_df is None or not doc.path or doc.source_sig is None:
+        return False
+    payload = {
+        "version": SNAPSHOT_VERSION,
+        "pandas": core.pd.__version__,
+        "saved_at": time.time(),
+        "doc": doc_state(doc),
+        "view": dict(view or {}),
+        "sheets": [{"doc": doc_state(o["doc"]), "view": dict(o.get("view") or {})}
+                   for o in (others or []) if o["doc"].current_df is not None],
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    return True
+
+
+def load_snapshot(path: str, source_path: Optional[str] = None) -> Optional[Dict]:
+    """有効なスナップショットなら payload を返す。無効・不一致・読めない場合は None。"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+    except Exception as e:
+        logging.warning(f"Session snapshot unreadable: {e}")
+        return None
+    if not isinstance(payload, dict) or payload.get("version") != SNAPSHOT_VERSION:
+        return None
+    if payload.get("pandas") != core.pd.__version__:
+        return None
+    state = payload.get("doc") or {}
+    src = state.get("path")
+    if source_path is not None and not _same_path(src, source_path):
+        return None
+    sig = core.file_signature(src)
+    if sig is None or tuple(state.get("source_sig") or ()) != tuple(sig):
+        logging.info(f"Session snapshot stale: {src}")
+        return None
+    return payload
+
+
+def discard_snapshot(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,804 @@
+"""AI検索ビューア：大容量モード（シートを SQLite に置く、Tk 非依存）
+
+数十万行を超えるシートでは raw_df + current_df + Undo 用コピーがメモリに載り切らないため、
+データ行をローカルの SQLite ファイルに流し込み、
+- 表示は「見えている範囲の行だけ」を主キーで引く（window）
+- 並び替え / 絞り込みは SQL で並び順テーブル（ord / fview）を作る（SQLite の外部ソートなのでメモリは一定）
+- セル編集は UPDATE、Undo/Redo は変更したセルの前後の値だけを持つ
+- 保存は1行ずつ書き出す（openpyxl の write_only / csv）
+リンク列（AI検索 / Google検索）は保存しておかず、表示では列名だけを出し、式は保存時に、URL はダブルクリックしたときに作ります。
+
+DB は元ファイルごとに ~/.ai_search_viewer_store/<hash>.sqlite。同じ元ファイル（サイズ/更新時刻）・
+同じ見出し行なら次回は取り込みを省き、未保存の編集もそのまま引き継ぎます。
+xlsx は 1,048,576 行までなので、それを超える表の保存は CSV のみです。
+"""
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import urllib.parse
+import zipfile
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import aisv_core as core
+import aisv_csv
+import aisv_workbook
+
+STORE_DIRNAME = ".ai_search_viewer_store"
+STORE_VERSION = 1
+BATCH_ROWS = 5000            # 取り込み時に1回の executemany で入れる行数
+EXCEL_MAX_ROWS = 1_048_576   # xlsx の最大行数
+MMAP_BYTES = 1 << 30         # DB を memory map で読む上限（複数のビューアで OS のページキャッシュを共有）
+
+
+def store_path(folder: str, source: str) -> str:
+    key = os.path.normcase(os.path.abspath(source))
+    h = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(folder, f"{h}.sqlite")
+
+
+# =====================
+# 取り込み元（xlsx を1行ずつ）
+# =====================
+def _first_sheet_part(z: zipfile.ZipFile) -> str:
+    """ブック内の最初のシート（pandas の sheet_name=0 と同じ）の XML パス。"""
+    parts = aisv_workbook.sheet_parts(z)
+    return parts[0][1] if parts else "xl/worksheets/sheet1.xml"
+
+
+def sheet_row_estimate(path: str) -> Optional[int]:
+    """xlsx の最初のシートの行数（<dimension ref="A1:T1000000"> の値。シートは解析しない）。
+    CSV / TSV はファイルサイズからの見積もり。それ以外・dimension が無い場合は None。
+    """
+    if aisv_csv.is_text_table(path):
+        return aisv_csv.row_estimate(path)
+    try:
+        with zipfile.ZipFile(path) as z:
+            with z.open(_first_sheet_part(z)) as f:
+                head = f.read(4096).decode("utf-8", "ignore")
+    except Exception:
+        return None
+    m = re.search(r"<(?:\w+:)?dimension\s+ref=\"[A-Z]+(\d+)(?::[A-Z]+(\d+))?\"", head)
+    if not m:
+        return None
+    return int(m.group(2) or m.group(1))
+
+
+def _cell_str(v) -> str:
+    """read_sheet_raw（pandas・dtype=str）と同じ文字列にする。"""
+    if v is None:
+        return ""
+    if isinstance(v, float):
+        if v != v:
+            return ""
+        if v.is_integer():
+            return str(int(v))
+    return str(v)
+
+
+def iter_xlsx_rows(path: str) -> Iterator[List[str]]:
+    """最初のシートを read_only で1行ずつ（値は文字列、空セルは ""）。"""
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[0]
+        for row in ws.iter_rows(values_only=True):
+            yield [_cell_str(v) for v in row]
+    finally:
+        wb.close()
+
+
+def _trim(row: Sequence[str]) -> List[str]:
+    row = list(row)
+    while row and not row[-1]:
+        row.pop()
+    return row
+
+
+def _as_number(v) -> Optional[float]:
+    """数値として読めれば float（sort_table の pd.to_numeric 相当）。"""
+    if v is None or v == "":
+        return None
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return None
+    return None if f != f else f
+
+
+# =====================
+# シート本体
+# =====================
+class SqliteSheet:
+    """SQLite に置いた1シート。行位置 pos は表示順（並び替え・絞り込み後）の 0 始まり。
+
+    テーブル:
+    - data(rid INTEGER PRIMARY KEY, c0, c1, ...): データ行。rid は読み込み時のデータ行番号
+    - ord(pos INTEGER PRIMARY KEY, rid): 並び替え後の順序（並び替えるまでは無く rid 順）
+    - fview(pos INTEGER PRIMARY KEY, rid): 絞り込み結果（絞り込み中のみ）
+    - meta(key, value): 見出しより上の行・列名・リンク設定など（JSON）
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.con = sqlite3.connect(db_path)
+        self.con.create_function("aisv_num", 1, _as_number, deterministic=True)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.execute("PRAGMA cache_size=-65536")  # 64MB
+        self.con.execute(f"PRAGMA mmap_size={MMAP_BYTES}")
+        self.con.execute("CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value TEXT)")
+        self.meta: Dict = {}
+        self.undo_stack: List[Tuple] = []
+        self.redo_stack: List[Tuple] = []
+        self.undo_limit = 20
+        self.filter_spec: Optional[Tuple[str, str]] = None
+        self._count: Optional[int] = None
+        self._load_meta()
+        # 絞り込みは開いている間だけ（前回の fview は使わない）
+        self.con.execute("DROP TABLE IF EXISTS fview")
+
+    # ---------------------
+    # meta
+    # ---------------------
+    def _load_meta(self):
+        self.meta = {k: json.loads(v) for k, v in self.con.execute("SELECT key, value FROM meta")}
+
+    def _set_meta(self, **kv):
+        self.meta.update(kv)
+        self.con.executemany(
+            "INSERT OR REPLACE INTO meta(key, value) VALUES(?, ?)",
+            [(k, json.dumps(v, ensure_ascii=False)) for k, v in kv.items()],
+        )
+        self.con.commit()
+
+    @property
+    def path(self) -> Optional[str]:
+        return self.meta.get("path")
+
+    @property
+    def source_sig(self) -> Optional[Tuple[int, int]]:
+        sig = self.meta.get("sig")
+        return tuple(sig) if sig else None
+
+    @property
+    def header_row(self) -> int:
+        return int(self.meta.get("header_row") or 1)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.meta.get("dirty"))
+
+    @property
+    def columns(self) -> List[str]:
+        """データ列の名前（表示順。リンク列は含まない）。"""
+        return [name for name, _ in self.meta.get("columns", [])]
+
+    @property
+    def links(self) -> Optional[Dict]:
+        return self.meta.get("links")
+
+    def _phys(self, name: str) -> str:
+        for n, p in self.meta.get("columns", []):
+            if n == name:
+                return p
+        raise KeyError(name)
+
+    def _has(self, table: str) -> bool:
+        return self.con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone() is not None
+
+    # ---------------------
+    # 取り込み / 再利用
+    # ---------------------
+    @classmethod
+    def import_rows(cls, db_path: str, rows: Iterable[Sequence[str]], *, header_row: int, source: str,
+                    sig=None, progress: Optional[Callable[[int], None]] = None,
+                    batch: int = BATCH_ROWS) -> "SqliteSheet":
+        """rows（header=None で読んだシートの各行）を流し込んで新しい DB を作る。
+        見出し行までは meta に、それより下は data に入れる。末尾の空行は捨てる（read_sheet_raw と同じ）。
+        """
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(db_path + suffix)
+            except OSError:
+                pass
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        sheet = cls(db_path)
+        con = sheet.con
+        con.execute("PRAGMA journal_mode=OFF")
+        con.execute("PRAGMA synchronous=OFF")
+
+        header_row = max(1, int(header_row or 1))
+        it = iter(rows)
+        top: List[List[str]] = []
+        for row in it:
+            top.append(_trim(row))
+            if len(top) >= header_row:
+                break
+        width = max([len(r) for r in top] + [0])
+        nphys = 0
+
+        def ensure_width(n: int):
+            nonlocal nphys
+            if nphys == 0:
+                cols = ", ".join(f"c{k} TEXT" for k in range(max(1, n)))
+                con.execute(f"CREATE TABLE data(rid INTEGER PRIMARY KEY, {cols})")
+                nphys = max(1, n)
+            for k in range(nphys, n):
+                con.execute(f"ALTER TABLE data ADD COLUMN c{k} TEXT")
+            nphys = max(nphys, n)
+
+        ensure_width(width)
+        rid = 0
+        buf: List[List[str]] = []
+        pending_empty = 0  # まだ書いていない空行（後ろに値のある行が来たら書く）
+
+        def flush():
+            if not buf:
+                return
+            ensure_width(max(len(r[1]) for r in buf))  # buf は [rid, 行の値]
+            ph = ", ".join("?" * (nphys + 1))
+            con.executemany(
+                f"INSERT INTO data VALUES({ph})",
+                [[r[0]] + r[1] + [""] * (nphys - len(r[1])) for r in buf],
+            )
+            buf.clear()
+
+        for row in it:
+            row = _trim(row)
+            if not row:
+                pending_empty += 1
+                continue
+            for _ in range(pending_empty):
+                buf.append([rid, []])
+                rid += 1
+            pending_empty = 0
+            width = max(width, len(row))
+            buf.append([rid, row])
+            rid += 1
+            if len(buf) >= batch:
+                flush()
+                if progress is not None:
+                    progress(rid)
+        flush()
+        con.commit()
+
+        # 見出し行（行数が足りなければ最後の行。core.header_index と同じ）
+        hdr_r = min(header_row - 1, max(0, len(top) - 1))
+        header_vals = (top[hdr_r] if top else []) + [""] * width
+        header_vals = header_vals[:width]
+        names = core.make_unique_headers(header_vals)
+        sheet._set_meta(
+            version=STORE_VERSION,
+            path=os.path.abspath(source),
+            sig=list(sig) if sig else None,
+            header_row=header_row,
+            width=width,
+            pre_rows=[r + [""] * (width - len(r)) for r in top],
+            columns=[[n, f"c{k}"] for k, n in enumerate(names)],
+            nphys=max(nphys, width),
+            links=None,
+            dirty=False,
+            count=rid,
+        )
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        if progress is not None:
+            progress(rid)
+        logging.info(f"SQLite store: imported {rid} rows x {width} cols into {db_path}")
+        return sheet
+
+    @classmethod
+    def open_existing(cls, db_path: str) -> Optional["SqliteSheet"]:
+        if not os.path.exists(db_path):
+            return None
+        try:
+            sheet = cls(db_path)
+        except sqlite3.Error as e:
+            logging.warning(f"SQLite store unreadable: {e}")
+            return None
+        if sheet.meta.get("version") != STORE_VERSION or not sheet._has("data"):
+            sheet.close()
+            return None
+        return sheet
+
+    @classmethod
+    def for_source(cls, folder: str, source: str, header_row: int, *,
+                   progress: Optional[Callable[[int], None]] = None) -> Tuple["SqliteSheet", bool]:
+        """source の DB を開く。同じ元ファイル・見出し行の DB が残っていれば取り込まずに使う。
+        戻り値: (sheet, 再利用したか)
+        """
+        db_path = store_path(folder, source)
+        sig = core.file_signature(source)
+        sheet = cls.open_existing(db_path)
+        if sheet is not None:
+            if sheet.source_sig == (tuple(sig) if sig else None) and sheet.header_row == int(header_row or 1):
+                if not sheet.dirty:
+                    sheet.reset_view()  # 未保存の編集が無ければ取り込み直後と同じ状態で開く
+                try:
+                    os.utime(db_path)  # prune_stores で古いものから消すときの目安
+                except OSError:
+                    pass
+                return sheet, True
+            sheet.close()
+        rows = aisv_csv.iter_text_rows(source) if aisv_csv.is_text_table(source) else iter_xlsx_rows(source)
+        sheet = cls.import_rows(db_path, rows, header_row=header_row,
+                                source=source, sig=sig, progress=progress)
+        return sheet, False
+
+    # ---------------------
+    # 表示
+    # ---------------------
+    def display_columns(self) -> List[str]:
+        """表示・保存する列（リンク列を設定の位置に入れたもの）。"""
+        cols = self.columns
+        cfg = self.links
+        if not cfg:
+            return cols
+        link_cols = self._link_cols(cfg)
+        pos = core.link_insert_position(cols, cfg.get("base_cols") or [], cfg.get("insert_mode", "fixed2"),
+                                        cfg.get("anchor_col"))
+        return cols[:pos] + link_cols + cols[pos:]
+
+    @staticmethod
+    def _link_cols(cfg: Dict) -> List[str]:
+        ai, google = bool(cfg.get("generate_ai", True)), bool(cfg.get("generate_google", True))
+        if not ai and not google:
+            ai = True  # apply_search_columns と同じ救済
+        return ([core.AI_COL] if ai else []) + ([core.GOOGLE_COL] if google else [])
+
+    def count(self) -> int:
+        """表示中の行数（絞り込み中は一致した行数）。"""
+        if self._count is None:
+            table = "fview" if self.filter_spec else ("ord" if self._has("ord") else "data")
+            self._count = int(self.con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0])
+        return self._count
+
+    def total_rows(self) -> int:
+        return int(self.con.execute("SELECT COUNT(*) FROM data").fetchone()[0])
+
+    def _order_source(self) -> Tuple[str, str]:
+        """(FROM 句, 並び順の式)。"""
+        if self.filter_spec:
+            return "fview v JOIN data d ON d.rid = v.rid", "v.pos"
+        if self._has("ord"):
+            return "ord v JOIN data d ON d.rid = v.rid", "v.pos"
+        return "data d", "d.rid"
+
+    def _select_list(self) -> str:
+        return ", ".join(["d.rid"] + [f"d.{p}" for _, p in self.meta.get("columns", [])])
+
+    def _row_builder(self, cols: List[str], disp: List[str], mode: str = "label") -> Callable[[Sequence], List[str]]:
+        """SELECT の1行（先頭は rid）を disp 順の値にする関数。リンク列のセルは mode で変わる：
+        "label" は列名（表示用。語句が空なら空欄）、"keyword" は検索語句、"formula" は =HYPERLINK 式（保存用）。
+        列位置・テンプレートは最初に1回だけ解決し、URL エンコードは "formula" のときだけ1行に1回行う。
+        """
+        cfg = self.links
+        if not cfg:
+            return lambda rec: ["" if v is None else v for v in rec[1:]]
+        idx = {c: i + 1 for i, c in enumerate(cols)}
+        joiner = cfg.get("joiner", " ")
+        joiner = "\t" if joiner == "\\t" else joiner
+        base = [idx[c] for c in (cfg.get("base_cols") or []) if c in idx] or ([1] if cols else [])
+        tpls = {c: core.url_template(t) for c, t in self._link_templates(cfg).items()}
+        plan = [(idx.get(c, 0), tpls.get(c)) for c in disp]
+
+        def build(rec: Sequence) -> List[str]:
+            kw = joiner.join(p for p in ((rec[i] or "").strip() for i in base) if p).strip()
+            q = urllib.parse.quote(kw) if kw and mode == "formula" else ""
+            out = []
+            for i, (src, tpl) in enumerate(plan):
+                if tpl is None:
+                    v = rec[src] if src else None
+                    out.append("" if v is None else v)
+                elif mode == "keyword":
+                    out.append(kw)
+                elif mode == "formula":
+                    out.append(f'=HYPERLINK("{tpl.replace("{q}", q)}","{disp[i]}")' if q and tpl else "")
+                else:
+                    out.append(disp[i] if kw and tpl else "")
+            return out
+
+        return build
+
+    @staticmethod
+    def _link_templates(cfg: Dict) -> Dict[str, str]:
+        return {
+            core.AI_COL: cfg.get("ai_template", core.DEFAULT_AI_TEMPLATE),
+            core.GOOGLE_COL: cfg.get("google_template", core.DEFAULT_GOOGLE_TEMPLATE),
+        }
+
+    def window(self, start: int, n: int) -> List[Tuple[int, List[str]]]:
+        """表示順 start から n 行ぶんの (rid, display_columns() 順の値)。"""
+        start = max(0, int(start))
+        src, key = self._order_source()
+        if key == "d.rid":
+            where = "d.rid >= ? AND d.rid < ?"  # rid は 0.. の連番（行の削除は無い）
+        else:
+            where = "v.pos >= ? AND v.pos < ?"
+            start += 1  # pos は 1 始まり
+        sql = f"SELECT {self._select_list()} FROM {src} WHERE {where} ORDER BY {key}"
+        build = self._row_builder(self.columns, self.display_columns())
+        return [(rec[0], build(rec)) for rec in self.con.execute(sql, (start, start + int(n)))]
+
+    def sample(self, n: int) -> List[List[str]]:
+        """全行から rid の等間隔に最大 n 行（display_columns() 順の値。並び順・絞り込みには関係なく）。列幅の自動調整用。"""
+        total = self.total_rows()
+        if total <= 0 or n <= 0:
+            return []
+        rids = list(range(0, total, max(1, -(-total // int(n)))))
+        build = self._row_builder(self.columns, self.display_columns())
+        out = []
+        for i in range(0, len(rids), 500):  # SQLite の変数の上限より少なく
+            part = rids[i:i + 500]
+            sql = f"SELECT {self._select_list()} FROM data d WHERE d.rid IN ({','.join('?' * len(part))})"
+            out.extend(build(rec) for rec in self.con.execute(sql, part))
+        return out
+
+    def rid_at(self, pos: int) -> Optional[int]:
+        table = "fview" if self.filter_spec else ("ord" if self._has("ord") else None)
+        if table is None:
+            return pos if 0 <= pos < self.count() else None
+        r = self.con.execute(f"SELECT rid FROM {table} WHERE pos = ?", (pos + 1,)).fetchone()
+        return int(r[0]) if r else None
+
+    def value(self, rid: int, col: str) -> str:
+        r = self.con.execute(f"SELECT {self._phys(col)} FROM data WHERE rid = ?", (rid,)).fetchone()
+        return "" if r is None or r[0] is None else str(r[0])
+
+    def cell_url(self, rid: int, col: str) -> Optional[str]:
+        """リンク列のセルを開く URL（ダブルクリックのときにその行の検索語句から作る）。リンク列でない・語句が空なら None。"""
+        cfg = self.links
+        if not cfg or col not in self._link_cols(cfg):
+            return None
+        rec = self.con.execute(f"SELECT {self._select_list()} FROM data d WHERE d.rid = ?", (rid,)).fetchone()
+        if rec is None:
+            return None
+        kw = self._row_builder(self.columns, [col], "keyword")(rec)[0]
+        return core.link_url(kw, self._link_templates(cfg)[col])
+
+    # ---------------------
+    # 並び替え / 絞り込み
+    # ---------------------
+    def is_numeric(self, col: str) -> bool:
+        p = self._phys(col)
+        if self.con.execute("SELECT 1 FROM data LIMIT 1").fetchone() is None:
+            return False
+        return self.con.execute(f"SELECT 1 FROM data WHERE aisv_num({p}) IS NULL LIMIT 1").fetchone() is None
+
+    def sort(self, col: str, ascending: bool = True):
+        """安定ソート（同じ値は今の順のまま。sort_table と同じく全セル数値なら数値順）。
+        結果は ord テーブル（pos → rid）。SQLite の外部ソートなので行数が多くてもメモリは一定。
+        """
+        p = self._phys(col)
+        key = f"aisv_num(d.{p})" if self.is_numeric(col) else f"d.{p}"
+        direction = "ASC" if ascending else "DESC"
+        has_ord = self._has("ord")
+        src = "data d JOIN ord o ON o.rid = d.rid" if has_ord else "data d"
+        tie = "o.pos" if has_ord else "d.rid"
+        con = self.con
+        con.execute("DROP TABLE IF EXISTS ord_new")
+        con.execute("CREATE TABLE ord_new(pos INTEGER PRIMARY KEY, rid INTEGER NOT NULL)")
+        con.execute(f"INSERT INTO ord_new(rid) SELECT d.rid FROM {src} ORDER BY {key} {direction}, {tie}")
+        con.execute("DROP TABLE IF EXISTS ord")
+        con.execute("ALTER TABLE ord_new RENAME TO ord")
+        con.commit()
+        if self.filter_spec:
+            self.filter(*self.filter_spec)
+        self._count = None
+
+    def filter(self, col: str, text: str):
+        """col に text を含む行だけを表示する（今の並び順のまま）。text が空なら解除。"""
+        if not text:
+            self.clear_filter()
+            return
+        p = self._phys(col)
+        src = "data d JOIN ord o ON o.rid = d.rid" if self._has("ord") else "data d"
+        key = "o.pos" if self._has("ord") else "d.rid"
+        con = self.con
+        con.execute("DROP TABLE IF EXISTS fview")
+        con.execute("CREATE TABLE fview(pos INTEGER PRIMARY KEY, rid INTEGER NOT NULL)")
+        con.execute(f"INSERT INTO fview(rid) SELECT d.rid FROM {src} WHERE instr(d.{p}, ?) > 0 ORDER BY {key}", (text,))
+        con.commit()
+        self.filter_spec = (col, text)
+        self._count = None
+
+    def reset_view(self):
+        """並び順・リンク設定を取り込み直後の状態に戻す（データは変えない）。"""
+        self.con.execute("DROP TABLE IF EXISTS ord")
+        self.con.commit()
+        self._set_meta(links=None)
+        self.clear_filter()
+
+    def clear_filter(self):
+        self.con.execute("DROP TABLE IF EXISTS fview")
+        self.con.commit()
+        self.filter_spec = None
+        self._count = None
+
+    # ---------------------
+    # 編集（Undo/Redo は変更した値だけ持つ）
+    # ---------------------
+    def _push(self, op: Tuple):
+        self.undo_stack.append(op)
+        if len(self.undo_stack) > int(self.undo_limit or 20):
+            self.undo_stack.pop(0)
+        self.redo_stack.clear()
+        if not self.dirty:
+            self._set_meta(dirty=True)
+
+    def set_cell(self, rid: int, col: str, value: str) -> bool:
+        if col in core.LINK_COLS:
+            return False
+        old = self.value(rid, col)
+        if old == value:
+            return False
+        self._write_cell(rid, self._phys(col), value)
+        self._push(("cell", rid, col, old, value))
+        return True
+
+    def _write_cell(self, rid: int, phys: str, value: str):
+        self.con.execute(f"UPDATE data SET {phys} = ? WHERE rid = ?", (value, rid))
+        self.con.commit()
+
+    def add_column(self, name: str) -> bool:
+        if name in self.columns or name in core.LINK_COLS:
+            return False
+        nphys = int(self.meta.get("nphys") or 0)
+        phys = f"c{nphys}"
+        self.con.execute(f"ALTER TABLE data ADD COLUMN {phys} TEXT DEFAULT ''")
+        self._set_meta(nphys=nphys + 1, columns=self.meta["columns"] + [[name, phys]])
+        self._push(("add_col", name, phys))
+        return True
+
+    def add_row(self) -> int:
+        """末尾に空行を足して、その rid を返す（並び替え・絞り込み中も最後に表示）。"""
+        rid = int(self.con.execute("SELECT COALESCE(MAX(rid), -1) + 1 FROM data").fetchone()[0])
+        self._insert_row(rid)
+        self._push(("add_row", rid))
+        return rid
+
+    def _insert_row(self, rid: int):
+        nphys = int(self.meta.get("nphys") or 1)
+        self.con.execute(f"INSERT INTO data VALUES({', '.join('?' * (nphys + 1))})", [rid] + [""] * nphys)
+        for table in ("ord", "fview"):
+            if self._has(table):
+                self.con.execute(f"INSERT INTO {table}(rid) VALUES(?)", (rid,))
+        self.con.commit()
+        self._count = None
+
+    def _delete_row(self, rid: int):
+        self.con.execute("DELETE FROM data WHERE rid = ?", (rid,))
+        for table in ("ord", "fview"):
+            if self._has(table):
+                self.con.execute(f"DELETE FROM {table} WHERE rid = ?", (rid,))
+                # 途中の行を消した場合は pos を詰める
+                mx, n = self.con.execute(f"SELECT COALESCE(MAX(pos), 0), COUNT(*) FROM {table}").fetchone()
+                if mx != n:
+                    self.con.execute(f"CREATE TABLE {table}_new(pos INTEGER PRIMARY KEY, rid INTEGER NOT NULL)")
+                    self.con.execute(f"INSERT INTO {table}_new(rid) SELECT rid FROM {table} ORDER BY pos")
+                    self.con.execute(f"DROP TABLE {table}")
+                    self.con.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+        self.con.commit()
+        self._count = None
+
+    def rename_column(self, old: str, new: str) -> bool:
+        if old == new or new in self.columns or new in core.LINK_COLS:
+            return False
+        self._rename(old, new)
+        self._push(("rename", old, new))
+        return True
+
+    def _rename(self, old: str, new: str):
+        cols = [[new if n == old else n, p] for n, p in self.meta["columns"]]
+        upd = {"columns": cols}
+        cfg = self.links
+        if cfg:
+            cfg = dict(cfg)
+            cfg["base_cols"] = [new if c == old else c for c in cfg.get("base_cols") or []]
+            if cfg.get("anchor_col") == old:
+                cfg["anchor_col"] = new
+            upd["links"] = cfg
+        self._set_meta(**upd)
+
+    def set_links(self, cfg: Optional[Dict], *, record: bool = True) -> bool:
+        """リンク列の設定（base_cols / joiner / generate_ai / generate_google / ai_template /
+        google_template / insert_mode / anchor_col）。式は表示・保存時に作る。
+        record=False は読み込み直後の初期設定用（Undo に積まず、未保存にもしない）。
+        """
+        old = self.links
+        cfg = dict(cfg) if cfg else None
+        if cfg == old:
+            return False
+        self._set_meta(links=cfg)
+        if record:
+            self._push(("links", old, cfg))
+        return True
+
+    def undo(self) -> bool:
+        if not self.undo_stack:
+            return False
+        op = self.undo_stack.pop()
+        self._apply(op, reverse=True)
+        self.redo_stack.append(op)
+        self._set_meta(dirty=True)
+        return True
+
+    def redo(self) -> bool:
+        if not self.redo_stack:
+            return False
+        op = self.redo_stack.pop()
+        self._apply(op, reverse=False)
+        self.undo_stack.append(op)
+        self._set_meta(dirty=True)
+        return True
+
+    def _apply(self, op: Tuple, *, reverse: bool):
+        kind = op[0]
+        if kind == "cell":
+            _, rid, col, old, new = op
+            self._write_cell(rid, self._phys(col), old if reverse else new)
+        elif kind == "add_col":
+            _, name, phys = op
+            cols = [c for c in self.meta["columns"] if c[1] != phys]
+            if not reverse:
+                cols.append([name, phys])
+            self._set_meta(columns=cols)
+        elif kind == "add_row":
+            if reverse:
+                self._delete_row(op[1])
+            else:
+                self._insert_row(op[1])
+        elif kind == "rename":
+            _, old, new = op
+            self._rename(new, old) if reverse else self._rename(old, new)
+        elif kind == "links":
+            _, old, new = op
+            self._set_meta(links=old if reverse else new)
+
+    # ---------------------
+    # 保存（1行ずつ書き出す）
+    # ---------------------
+    def iter_output_rows(self) -> Iterator[List[str]]:
+        """保存用の行（compose_output_raw と同じレイアウト）。絞り込みに関係なく全行を今の並び順で。"""
+        disp = self.display_columns()
+        width = int(self.meta.get("width") or 0)
+        out_n = max(width, len(disp))
+        pre = [list(r) for r in self.meta.get("pre_rows") or [[]]]
+        for r in pre[:-1]:
+            yield (r + [""] * out_n)[:out_n]
+        hdr = (pre[-1] + [""] * out_n)[:out_n]
+        yield [disp[i] if i < len(disp) else ("" if i >= width else hdr[i]) for i in range(out_n)]
+
+        src = "data d JOIN ord v ON v.rid = d.rid" if self._has("ord") else "data d"
+        key = "v.pos" if self._has("ord") else "d.rid"
+        build = self._row_builder(self.columns, disp, "formula")
+        cur = self.con.cursor()
+        cur.execute(f"SELECT {self._select_list()} FROM {src} ORDER BY {key}")
+        pad = [""] * (out_n - len(disp))
+        while True:
+            recs = cur.fetchmany(BATCH_ROWS)
+            if not recs:
+                break
+            for rec in recs:
+                yield build(rec) + pad
+
+    def iter_export_frames(self, batch: int = BATCH_ROWS * 20):
+        """Parquet / Feather 用の表（core.export_frame と同じ列）を batch 行ずつ。全行を今の並び順で。"""
+        disp = self.display_columns()
+        cfg = self.links or {}
+        base = [c for c in cfg.get("base_cols") or [] if c in self.columns]
+        src = "data d JOIN ord v ON v.rid = d.rid" if self._has("ord") else "data d"
+        key = "v.pos" if self._has("ord") else "d.rid"
+        build = self._row_builder(self.columns, disp, "keyword")
+        cur = self.con.cursor()
+        cur.execute(f"SELECT {self._select_list()} FROM {src} ORDER BY {key}")
+        sent = False
+        while True:
+            recs = cur.fetchmany(batch)
+            if not recs and sent:
+                break
+            # 空欄は pandas で読み込んだ表と同じく欠損値にする
+            df = core.pd.DataFrame([build(rec) for rec in recs], columns=disp, dtype="str").replace("", None)
+            # リンク列は検索語句の列なので、pandas の表と同じくテンプレートを attrs に付けて URL にしてもらう
+            df.attrs[core.LINKS_ATTR] = {c: t for c, t in self._link_templates(cfg).items() if c in disp}
+            yield core.export_frame(df, base, cfg.get("joiner", " "))
+            sent = True
+            if not recs:
+                break
+
+    def output_row_count(self) -> int:
+        """iter_output_rows() の行数（見出し行とそれより上の行を含む）。"""
+        return len(self.meta.get("pre_rows") or [[]]) + self.total_rows()
+
+    def save(self, path: str, *, progress: Optional[Callable[[int], None]] = None,
+             fmt: Optional[Tuple[str, str]] = None) -> int:
+        """拡張子に応じて xlsx / csv（tsv・txt）に書き出し、書いた行数を返す。fmt は CSV の (文字コード, 区切り)。"""
+        rows = self.output_row_count()
+        n = 0
+        if aisv_csv.is_text_table(path):
+            enc, sep = fmt or aisv_csv.output_format(path)
+            with open(path, "w", encoding=enc, newline="") as f:
+                w = csv.writer(f, delimiter=sep, lineterminator=os.linesep)
+                for row in self.iter_output_rows():
+                    w.writerow(row)
+                    n += 1
+                    if progress is not None and n % (BATCH_ROWS * 10) == 0:
+                        progress(n)
+            return n
+        if rows > EXCEL_MAX_ROWS:
+            raise ValueError(f"xlsx に保存できるのは {EXCEL_MAX_ROWS:,} 行までです（{rows:,} 行）。CSV で保存してください。")
+        import openpyxl
+
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet()
+        for row in self.iter_output_rows():
+            ws.append([v if v != "" else None for v in row])
+            n += 1
+            if progress is not None and n % (BATCH_ROWS * 10) == 0:
+                progress(n)
+        wb.save(path)
+        return n
+
+    def mark_saved(self, path: str):
+        """保存済みにする。元ファイルへ上書きした場合、この DB は元ファイルと一致しなくなる
+        （リンク列が実際の列になる）ので、次に開くときは取り込み直す。
+        """
+        upd = {"dirty": False}
+        if self.path and os.path.normcase(os.path.abspath(path)) == os.path.normcase(self.path):
+            upd["sig"] = None
+        self._set_meta(**upd)
+
+    def close(self, *, discard: bool = False):
+        try:
+            self.con.close()
+        except Exception:
+            pass
+        if discard:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(self.db_path + suffix)
+                except OSError:
+                    pass
+
+
+def prune_stores(folder: str, max_bytes: int, keep: Sequence[str] = ()) -> int:
+    """未保存の編集が無い DB（解析済みキャッシュとして残したもの）を、合計が max_bytes 以下になるまで
+    最終使用が古いものから消す。未保存の編集がある DB と keep は消さない。消した件数を返す。
+    """
+    try:
+        names = [n for n in os.listdir(folder) if n.endswith(".sqlite")]
+    except OSError:
+        return 0
+    entries = []
+    for name in names:
+        path = os.path.join(folder, name)
+        try:
+            size = sum(os.path.getsize(path + sfx) for sfx in ("", "-wal") if os.path.exists(path + sfx))
+            entries.append((os.path.getmtime(path), size, path))
+        except OSError:
+            continue
+    total = sum(e[1] for e in entries)
+    keep = {os.path.normcase(p) for p in keep}
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if os.path.normcase(path) in keep:
+            continue
+        sheet = SqliteSheet.open_existing(path)
+        if sheet is None or sheet.dirty:
+            if sheet is not None:
+                sheet.close()
+            continue
+        sheet.close(discard=True)
+        if not os.path.exists(path):
+            total -= size
+            removed += 1
+    return removed
@@ -0,0 +1,98 @@
+"""AI検索ビューア：起動の高速化（遅延 import と起動タイムライン、Tk 非依存）
+
+pandas / openpyxl の import は数秒かかる（exe では特に）ため、
+- LazyModule: 最初に属性へアクセスした時点で import する代理オブジェクト
+- preload_in_background: ウィンドウ表示後に別スレッドで先に import しておく
+- StartupTimeline: 起動からウィンドウ表示・pandas 準備完了・最初の行表示までの時刻を記録してログに出す
+を提供します。別スレッドの import 中に本体側が同じモジュールを使うと、
+Python の import ロックで完了まで待つだけなので二重に読み込まれることはありません。
+"""
+import importlib
+import logging
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+class LazyModule:
+    """import を最初の属性アクセスまで遅らせる（`pd = LazyModule("pandas")`）。"""
+
+    def __init__(self, name: str):
+        self.__dict__["_name"] = name
+        self.__dict__["_mod"] = None
+
+    def _load(self):
+        mod = self.__dict__["_mod"]
+        if mod is None:
+            mod = importlib.import_module(self.__dict__["_name"])
+            self.__dict__["_mod"] = mod
+        return mod
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_mod"] is not None else "not loaded"
+        return f"<LazyModule {self.__dict__['_name']} ({state})>"
+
+
+def is_loaded(name: str) -> bool:
+    return name in sys.modules
+
+
+def preload_in_background(names: Sequence[str],
+                          on_done: Optional[Callable[[float], None]] = None) -> threading.Thread:
+    """names を daemon スレッドで順に import する。終わったら on_done(所要秒) を呼ぶ（そのスレッド上）。"""
+
+    def _run():
+        t0 = time.perf_counter()
+        for n in names:
+            try:
+                importlib.import_module(n)
+            except Exception as e:
+                logging.warning(f"Preload failed: {n}: {e}")
+        if on_done is not None:
+            try:
+                on_done(time.perf_counter() - t0)
+            except Exception:
+                pass
+
+    th = threading.Thread(target=_run, name="aisv-preload", daemon=True)
+    th.start()
+    return th
+
+
+class StartupTimeline:
+    """起動時刻 t0（スクリプト先頭の perf_counter）からの経過秒を区間名ごとに記録する。"""
+
+    def __init__(self, t0: Optional[float] = None):
+        self.t0 = t0 if t0 is not None else time.perf_counter()
+        self.marks: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name: str, when: Optional[float] = None) -> float:
+        """最初の1回だけ記録（2回目以降は最初の値を返す）。"""
+        with self._lock:
+            if name not in self.marks:
+                self.marks[name] = (when if when is not None else time.perf_counter()) - self.t0
+            return self.marks[name]
+
+    def has(self, name: str) -> bool:
+        return name in self.marks
+
+    def get(self, name: str) -> Optional[float]:
+        return self.marks.get(name)
+
+    def items(self) -> List[tuple]:
+        with self._lock:
+            return sorted(self.marks.items(), key=lambda kv: kv[1])
+
+    def line(self) -> str:
+        return ", ".join(f"{k} {v:.3f}s" for k, v in self.items())
+
+    def log(self, prefix: str = "Startup"):
+        logging.info(f"{prefix}: {self.line()}")
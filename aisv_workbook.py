@@ -0,0 +1,257 @@
+"""AI検索ビューア：複数シートのブック（xlsx を zip のまま扱う、Tk 非依存）
+
+- sheet_names(): ブック内のシート名（並び順）。シートは解析しない（workbook.xml だけ読む）
+- write_workbook(): 元のブックをコピーし、指定したシートの XML だけを書き出した行で置き換える。
+  開かなかった（解析していない）シートや書式・共有文字列などの部品は元のバイト列のまま残る。
+
+置き換えたシートは pandas の to_excel と同じく値だけ（書式なし）で、文字列は共有文字列を使わずに
+セルに直接書く（他のシートが参照する sharedStrings.xml を変えないため）。"=" で始まる値は数式。
+置き換えたシートの図・テーブル・コメント・ハイパーリンク・書式は残らない（リンク列の挿入で列がずれるため、
+元の位置のまま残すと別のセルを指してしまう）。保存前に sheet_extras() で何が失われるかを確認できる。
+"""
+from __future__ import annotations
+
+import codecs
+import html
+import io
+import os
+import re
+import zipfile
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import aisv_core as core
+
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_ILLEGAL_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+# シートの関係（_rels）の種類 → 表示名。printerSettings（印刷設定）は失われても困らないので含めない
+_REL_KINDS = {
+    "drawing": "図・グラフ",
+    "table": "テーブル",
+    "comments": "コメント",
+    "threadedComment": "コメント",
+    "vmlDrawing": "コメント",
+    "hyperlink": "ハイパーリンク",
+    "pivotTable": "ピボットテーブル",
+    "oleObject": "埋め込みオブジェクト",
+    "control": "コントロール",
+}
+_IGNORED_RELS = {"printerSettings"}
+# シート XML の中の書式など（セル以外）→ 表示名
+_SHEET_TAGS = [
+    (re.compile(r'<(?:\w+:)?c\b[^>]*?\bs="[1-9]'), "書式"),
+    (re.compile(r"<(?:\w+:)?cols\b"), "列幅"),
+    (re.compile(r"<(?:\w+:)?mergeCells\b"), "セルの結合"),
+    (re.compile(r"<(?:\w+:)?conditionalFormatting\b"), "条件付き書式"),
+    (re.compile(r"<(?:\w+:)?dataValidations\b"), "入力規則"),
+    (re.compile(r"<(?:\w+:)?hyperlinks\b"), "ハイパーリンク"),
+    (re.compile(r"<(?:\w+:)?autoFilter\b"), "フィルター"),
+]
+
+
+# =====================
+# シート一覧
+# =====================
+def sheet_parts(z: zipfile.ZipFile) -> List[Tuple[str, str]]:
+    """[(シート名, シート XML のパス)]（ブックの並び順。pandas の sheet_name=0 が先頭）。"""
+    wb = z.read("xl/workbook.xml").decode("utf-8", "ignore")
+    rels = z.read("xl/_rels/workbook.xml.rels").decode("utf-8", "ignore")
+    targets = {}
+    for rel in re.finditer(r"<(?:\w+:)?Relationship\b[^>]*>", rels):
+        tag = rel.group(0)
+        rid = re.search(r'\bId="([^"]+)"', tag)
+        target = re.search(r'\bTarget="([^"]+)"', tag)
+        if rid and target:
+            t = target.group(1)
+            targets[rid.group(1)] = t.lstrip("/") if t.startswith("/") else "xl/" + t
+    out = []
+    for m in re.finditer(r"<(?:\w+:)?sheet\b[^>]*>", wb):
+        tag = m.group(0)
+        name = re.search(r'\bname="([^"]*)"', tag)
+        rid = re.search(r'\br:id="([^"]+)"', tag)
+        if name and rid and rid.group(1) in targets:
+            out.append((html.unescape(name.group(1)), targets[rid.group(1)]))
+    return out
+
+
+def sheet_names(path: str) -> List[str]:
+    """xlsx のシート名。xlsx でない・読めない場合は []。"""
+    try:
+        with zipfile.ZipFile(path) as z:
+            return [name for name, _ in sheet_parts(z)]
+    except Exception:
+        return []
+
+
+# =====================
+# 書き出し
+# =====================
+def _xml_text(v: str) -> str:
+    return html.escape(_ILLEGAL_XML.sub("", v), quote=False)
+
+
+def write_sheet_xml(fh, rows: Iterable[Sequence]) -> int:
+    """rows（1行 = 値の並び。None / NaN / "" は空セル）をシート XML として fh（バイナリ）に書く。行数を返す。"""
+    w = io.TextIOWrapper(fh, encoding="utf-8", newline="")
+    w.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<worksheet xmlns="{_MAIN_NS}"><sheetData>')
+    letters: List[str] = []
+    n = 0
+    for n, row in enumerate(rows, 1):
+        cells = []
+        for c, v in enumerate(row):
+            if v is None or (not isinstance(v, str) and core.pd.isna(v)):
+                continue
+            s = str(v)
+            if not s:
+                continue
+            while len(letters) <= c:
+                letters.append(core.get_excel_header(len(letters) + 1))
+            ref = f"{letters[c]}{n}"
+            if s.startswith("=") and len(s) > 1:
+                cells.append(f'<c r="{ref}"><f>{_xml_text(s[1:])}</f></c>')
+            else:
+                cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{_xml_text(s)}</t></is></c>')
+        if cells:
+            w.write(f'<row r="{n}">{"".join(cells)}</row>')
+    w.write("</sheetData></worksheet>")
+    w.flush()
+    w.detach()
+    return n
+
+
+def _rels_path(part: str) -> str:
+    folder, name = part.rsplit("/", 1)
+    return f"{folder}/_rels/{name}.rels"
+
+
+def _scan_sheet_tags(z: zipfile.ZipFile, part: str) -> List[str]:
+    """シート XML を少しずつ読み、_SHEET_TAGS のうち見つかったものの表示名を返す（全体は読み込まない）。"""
+    found: List[str] = []
+    todo = list(_SHEET_TAGS)
+    dec = codecs.getincrementaldecoder("utf-8")("ignore")
+    tail = ""
+    with z.open(part) as fh:
+        while todo:
+            chunk = fh.read(1 << 20)
+            text = tail + dec.decode(chunk, final=not chunk)
+            for pat, label in list(todo):
+                if pat.search(text):
+                    todo.remove((pat, label))
+                    if label not in found:
+                        found.append(label)
+            if not chunk:
+                break
+            tail = text[-256:]  # 境目にまたがるタグのため
+    return found
+
+
+def sheet_extras(path: str, names: Iterable[str]) -> Dict[str, List[str]]:
+    """write_workbook で置き換えると失われるもの（図・テーブル・コメント・書式など）をシートごとに返す。
+    失われるものが無いシートは含めない。読めない場合は {}。
+    """
+    out: Dict[str, List[str]] = {}
+    try:
+        with zipfile.ZipFile(path) as z:
+            parts = dict(sheet_parts(z))
+            members = set(z.namelist())
+            for name in names:
+                part = parts.get(name)
+                if part is None or part not in members:
+                    continue
+                labels: List[str] = []
+                rels = _rels_path(part)
+                if rels in members:
+                    text = z.read(rels).decode("utf-8", "ignore")
+                    for m in re.finditer(r'\bType="[^"]*/([^"/]+)"', text):
+                        kind = m.group(1)
+                        if kind in _IGNORED_RELS:
+                            continue
+                        label = _REL_KINDS.get(kind, "その他の部品")
+                        if label not in labels:
+                            labels.append(label)
+                for label in _scan_sheet_tags(z, part):
+                    if label not in labels:
+                        labels.append(label)
+                if labels:
+                    out[name] = labels
+    except Exception:
+        return {}
+    return out
+
+
+def _without_calc_chain(name: str, data: bytes) -> bytes:
+    """calcChain.xml（置き換えたシートのセルを指していると Excel が修復を求める）への参照を外す。"""
+    text = data.decode("utf-8")
+    if name == "[Content_Types].xml":
+        text = re.sub(r'<Override\b[^>]*PartName="/xl/calcChain\.xml"[^>]*/>', "", text)
+    else:
+        text = re.sub(r'<Relationship\b[^>]*Target="[^"]*calcChain\.xml"[^>]*/>', "", text)
+    return text.encode("utf-8")
+
+
+def _full_calc_on_load(data: bytes) -> bytes:
+    """開いたときに数式を計算し直させる（置き換えたシートの数式には計算済みの値が無いため）。"""
+    text = data.decode("utf-8")
+    m = re.search(r"<(\w+:)?calcPr\b[^>]*?(/?)>", text)
+    if m:
+        if "fullCalcOnLoad=" not in m.group(0):
+            tag = m.group(0)
+            cut = len(tag) - (2 if tag.endswith("/>") else 1)
+            text = text[: m.start()] + tag[:cut] + ' fullCalcOnLoad="1"' + tag[cut:] + text[m.end():]
+        return text.encode("utf-8")
+    prefix = re.search(r"<(\w+:)?workbook\b", text).group(1) or ""
+    for anchor in (f"</{prefix}definedNames>", f"</{prefix}externalReferences>", f"</{prefix}sheets>"):
+        i = text.find(anchor)
+        if i >= 0:
+            i += len(anchor)
+            return (text[:i] + f'<{prefix}calcPr fullCalcOnLoad="1"/>' + text[i:]).encode("utf-8")
+    return data
+
+
+def write_workbook(src: str, dst: str, sheets: Dict[str, Iterable[Sequence]]) -> int:
+    """src のブックを dst に書く。sheets（シート名 → 行）のシートだけ置き換え、他はそのまま。
+    dst が src と同じでもよい（一時ファイルに書いてから置き換える）。置き換えた行数の合計を返す。
+    """
+    tmp = os.path.join(os.path.dirname(os.path.abspath(dst)), f".~{os.path.basename(dst)}.tmp")
+    total = 0
+    try:
+        with zipfile.ZipFile(src) as zin:
+            parts = dict(sheet_parts(zin))
+            missing = [name for name in sheets if name not in parts]
+            if missing:
+                raise ValueError(f"シートが見つかりません: {', '.join(missing)}")
+            repl = {parts[name]: rows for name, rows in sheets.items()}
+            names = set(zin.namelist())
+            has_chain = "xl/calcChain.xml" in names
+            drop = {_rels_path(p) for p in repl} | {"xl/calcChain.xml"}
+            with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as zout:
+                for info in zin.infolist():
+                    name = info.filename
+                    if name in drop:
+                        continue
+                    if name in repl:
+                        out = zipfile.ZipInfo(name, date_time=info.date_time)
+                        out.compress_type = zipfile.ZIP_DEFLATED
+                        with zout.open(out, "w", force_zip64=True) as fh:
+                            total += write_sheet_xml(fh, repl[name])
+                        continue
+                    data = zin.read(name)
+                    if has_chain and name in ("[Content_Types].xml", "xl/_rels/workbook.xml.rels"):
+                        data = _without_calc_chain(name, data)
+                    elif name == "xl/workbook.xml" and repl:
+                        data = _full_calc_on_load(data)
+                    zout.writestr(info, data)
+        os.replace(tmp, dst)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return total
+
+
+def frame_rows(df) -> Iterable[List]:
+    """保存用 DataFrame（compose_output）を write_sheet_xml に渡す行にする。"""
+    for row in df.itertuples(index=False, name=None):
+        yield list(row)
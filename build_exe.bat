@@ -13,6 +13,8 @@ pyinstaller --onefile --noconsole ^
   --name AISearchViewer1.2 ^
   --icon AISearchViewer.ico ^
   --add-data "AISearchViewer.ico;." ^
+  --hidden-import pandas ^
+  --hidden-import openpyxl ^
   AISearchViewer.py
 
 echo.
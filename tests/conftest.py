@@ -0,0 +1,20 @@
+"""テスト共通：リポジトリ直下の aisv_*.py を import できるようにする。共通の fixture。"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def write_csv():
+    """write_csv(path, 行のリスト)：UTF-8 の CSV を書いてパス（文字列）を返す。フォルダが無ければ作る。"""
+    def _write(path, lines):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        return str(path)
+
+    return _write
@@ -0,0 +1,45 @@
+"""列幅の自動調整：表示幅（全角は半角の wide 倍）の最大値を、全セルを測った場合と同じに求める。"""
+import random
+
+import pandas as pd
+import pytest
+
+import aisv_core as core
+
+
+def test_text_width():
+    assert core.text_width("abc") == 3
+    assert core.text_width("全角ａ", 7, 14) == 42
+    assert core.text_width(None) == 0
+
+
+def mixed_values(n, seed=0):
+    rnd = random.Random(seed)
+    chars = "abcXYZ012 あいう漢字ｱｲｳ、。"
+    return ["".join(rnd.choice(chars) for _ in range(rnd.randint(0, 12))) for _ in range(n)]
+
+
+@pytest.mark.parametrize("dtype", ["str", object])
+@pytest.mark.parametrize("topk", [1, 256])
+def test_column_text_width_matches_every_cell(monkeypatch, dtype, topk):
+    monkeypatch.setattr(core, "AUTOFIT_TOPK", topk)  # 上位だけでは決まらず残りを測る場合も
+    vals = mixed_values(500)
+    s = pd.Series(vals + [None], dtype=dtype)
+    assert core.column_text_width(s, 7, 14) == max(core.text_width(v, 7, 14) for v in vals)
+
+
+def test_column_text_width_ascii_empty_and_cap():
+    assert core.column_text_width(pd.Series(["ab", "abcd", None], dtype="str"), 7, 14) == 28
+    assert core.column_text_width(pd.Series([], dtype="str")) == 0
+    s = pd.Series(["漢字" * 50, "a"], dtype="str")
+    assert core.column_text_width(s, 1, 2, cap=10) >= 10
+
+
+def test_display_cache_widths_and_clear():
+    df = pd.DataFrame({"a": ["x", "長い文字列です"], "b": ["1", "2"]}, dtype="str")
+    cache = core.DisplayCache()
+    assert cache.widths(df) == [core.text_width("長い文字列です"), 1]
+    cache.limit = 2
+    assert cache.widths(df)[0] == core.text_width("長い" + core.ELLIPSIS)
+    cache.clear()
+    assert cache.columns(None) == []
@@ -0,0 +1,111 @@
+"""コマンドライン一括処理：GUI の保存と同じ出力・失敗しても続行・出力先の重複・レポートの保存先。"""
+import json
+import os
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import aisv_cli
+import aisv_core as core
+
+SHOP = ["商品一覧", "メーカー,商品名,価格", "A社,りんご,120", "B社,みかん,80"]
+
+
+def gui_output(src, header_row, base_cols, **kw):
+    """GUI の保存（読み込み → リンク列 → compose_output_raw）と同じ手順の出力。"""
+    raw = core.read_sheet_raw(src)
+    df, _ = core.build_table_from_raw(raw, header_row)
+    df = core.apply_search_columns(df, base_cols, **kw)
+    return core.compose_output_raw(raw, df, header_row).values.tolist()
+
+
+def read_output(path):
+    if str(path).endswith(".xlsx"):
+        # 式のセルは式のまま（read_sheet_raw は計算済みの値を読むため）
+        ws = openpyxl.load_workbook(path).active
+        return [["" if c.value is None else str(c.value) for c in row] for row in ws.iter_rows()]
+    return core.read_sheet_raw(str(path)).fillna("").values.tolist()
+
+
+def test_expand_inputs_glob_dedup_and_order(tmp_path, write_csv):
+    a = write_csv(tmp_path / "a.csv", ["x"])
+    b = write_csv(tmp_path / "b.csv", ["x"])
+    assert aisv_cli.expand_inputs([b, str(tmp_path / "*.csv"), a]) == [b, a]
+
+
+def test_parse_args():
+    args = aisv_cli.parse_args(["x.csv", "--header-row", "AUTO", "--keyword-cols", "メーカー, 2",
+                                "--joiner", "\\t", "--workers", "0"])
+    assert args.header_row == "auto" and args.keyword_cols == ["メーカー", "2"]
+    assert args.joiner == "\t" and args.workers >= 1
+    with pytest.raises(SystemExit):
+        aisv_cli.parse_args(["x.csv", "--header-row", "0"])
+
+
+@pytest.mark.parametrize("fmt", ["csv", "xlsx"])
+def test_output_matches_gui_save(tmp_path, write_csv, fmt):
+    src = write_csv(tmp_path / "shop.csv", SHOP)
+    out = tmp_path / "out"
+    argv = [src, "--header-row", "2", "--keyword-cols", "メーカー,商品名", "--insert-mode", "after_base",
+            "--no-google", "--out-dir", str(out), "--format", fmt]
+    assert aisv_cli.main(argv) == 0
+    expected = gui_output(src, 2, ["メーカー", "商品名"], insert_mode="after_base", generate_google=False)
+    assert read_output(out / f"shop_links.{fmt}") == expected
+
+
+def test_auto_header_row_and_keyword_column(tmp_path, write_csv):
+    src = write_csv(tmp_path / "shop.csv", SHOP)
+    assert aisv_cli.main([src, "--header-row", "auto", "--keyword-cols", "auto", "--format", "csv"]) == 0
+    assert read_output(tmp_path / "shop_links.csv") == gui_output(src, 2, ["商品名"])
+
+
+def test_failed_file_does_not_stop_the_batch(tmp_path, write_csv):
+    good = write_csv(tmp_path / "good.csv", SHOP)
+    bad = write_csv(tmp_path / "bad.csv", ["タイトル", "品番,価格", "1,100"])  # 商品名 列が無い
+    out = tmp_path / "out"
+    code = aisv_cli.main([bad, good, "--header-row", "2", "--keyword-cols", "商品名", "--out-dir", str(out),
+                          "--format", "csv"])
+    assert code == 1
+    with open(out / "aisv_batch_report.json", encoding="utf-8") as f:
+        report = json.load(f)
+    assert [(r["input"], r["status"]) for r in report["files"]] == [(bad, "failed"), (good, "ok")]
+    assert report["summary"]["rows"] == 2
+
+
+def test_existing_output_is_skipped_unless_overwrite(tmp_path, write_csv):
+    src = write_csv(tmp_path / "shop.csv", SHOP)
+    dst = tmp_path / "shop_links.csv"
+    dst.write_text("old", encoding="utf-8")
+    assert aisv_cli.main([src, "--header-row", "2", "--format", "csv"]) == 0
+    assert dst.read_text(encoding="utf-8") == "old"
+    assert aisv_cli.main([src, "--header-row", "2", "--format", "csv", "--overwrite"]) == 0
+    assert dst.read_text(encoding="utf-8") != "old"
+
+
+def test_same_name_from_different_folders_gets_suffix(tmp_path, write_csv):
+    a = write_csv(tmp_path / "a" / "x.csv", ["商品名", "p"])
+    b = write_csv(tmp_path / "b" / "x.csv", ["商品名", "q"])
+    out = tmp_path / "out"
+    assert aisv_cli.main([a, b, "--out-dir", str(out), "--format", "csv", "--workers", "2"]) == 0
+    assert sorted(os.listdir(out)) == ["aisv_batch_report.json", "x_links.csv", "x_links_2.csv"]
+    first = pd.read_csv(out / "x_links.csv", header=None, dtype=str)
+    second = pd.read_csv(out / "x_links_2.csv", header=None, dtype=str)
+    assert first.iat[1, 0] == "p" and second.iat[1, 0] == "q"
+
+
+def test_plan_outputs_same_stem_other_extension(tmp_path):
+    jobs = aisv_cli.plan_outputs([str(tmp_path / "x.csv"), str(tmp_path / "x.tsv")], None, "_links", "xlsx")
+    assert [os.path.basename(d) for _, d in jobs] == ["x_links.xlsx", "x_links_2.xlsx"]
+
+
+def test_default_report_next_to_outputs(tmp_path, monkeypatch, write_csv):
+    src = write_csv(tmp_path / "data" / "x.csv", ["商品名", "p"])
+    cwd = tmp_path / "cwd"
+    cwd.mkdir()
+    monkeypatch.chdir(cwd)
+    assert aisv_cli.main([src, "--format", "csv"]) == 0
+    assert not os.listdir(cwd)
+    with open(tmp_path / "data" / "aisv_batch_report.json", encoding="utf-8") as f:
+        report = json.load(f)
+    assert report["summary"]["ok"] == 1
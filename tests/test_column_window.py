@@ -0,0 +1,16 @@
+"""列の窓：横スクロール位置と表示域の幅から、Treeview に入れる列の範囲を決める。"""
+import pytest
+
+import aisv_core as core
+
+
+@pytest.mark.parametrize("widths,first,avail,margin,expected", [
+    ([100] * 4, 0, 250, 1, (0, 3, 4)),
+    ([100] * 4, 1, 250, 0, (1, 4, 4)),
+    ([100] * 4, 3, 250, 0, (2, 4, 4)),  # 右端まで見えるときは表示域が余らないように先頭を戻す
+    ([100] * 4, 0, 1000, 2, (0, 4, 4)),
+    ([500, 100], 0, 200, 0, (0, 1, 1)),
+    ([], 5, 100, 1, (0, 0, 0)),
+])
+def test_column_window(widths, first, avail, margin, expected):
+    assert core.column_window(widths, first, avail, margin) == expected
@@ -0,0 +1,57 @@
+"""Tk 非依存のコア：表の組み立て・保存レイアウト・並び替え。"""
+import pandas as pd
+
+import aisv_core as core
+
+
+def test_build_table_from_raw_below_title_rows():
+    raw = pd.DataFrame([["タイトル", None], ["メーカー", None], ["A社", "x"]])
+    df, _ = core.build_table_from_raw(raw, 2)
+    assert list(df.columns) == ["メーカー", "列B"]
+    assert df.values.tolist() == [["A社", "x"]]
+
+
+def test_compose_output_raw_roundtrip_without_edits():
+    raw = pd.DataFrame([["タイトル", None], ["メーカー", "商品名"], ["A社", "x"]])
+    doc = core.SearchDocument(raw, header_row=2)
+    assert doc.compose_output().values.tolist() == raw.fillna("").values.tolist()
+
+
+def test_compose_output_raw_keeps_wider_raw_columns():
+    raw = pd.DataFrame([["注記", None, None, "右端"], ["a", "b", None, None], ["1", "2", None, None]])
+    df, _ = core.build_table_from_raw(raw, 2)
+    out = core.compose_output_raw(raw, df, 2)
+    assert out.shape[1] == max(raw.shape[1], df.shape[1])
+    assert out.iat[0, 3] == "右端" and out.iat[2, 1] == "2"
+
+
+def test_compose_output_raw_without_raw_is_empty():
+    assert core.compose_output_raw(None, None, 1).empty
+
+
+def test_sort_table_numeric_when_all_numeric():
+    df = pd.DataFrame({"n": ["10", "9", "100"], "s": ["b", "a", "c"]})
+    assert core.sort_table(df, "n")["n"].tolist() == ["9", "10", "100"]
+    assert core.sort_table(df, "n", ascending=False)["n"].tolist() == ["100", "10", "9"]
+
+
+def test_sort_table_text_order_and_stable():
+    df = pd.DataFrame({"k": ["b", "a", "10", "a"], "v": ["1", "2", "3", "4"]})
+    out = core.sort_table(df, "k")
+    assert out["k"].tolist() == ["10", "a", "a", "b"]
+    assert out["v"].tolist() == ["3", "2", "4", "1"]  # 同じ値は元の順
+    assert out.index.tolist() == [2, 1, 3, 0]  # index（元のデータ行番号）は保つ
+
+
+def test_document_cell_edit_undo_redo():
+    raw = pd.DataFrame([["メーカー"], ["A社"], ["B社"]])
+    doc = core.SearchDocument(raw, header_row=1)
+    before = doc.current_df.copy()
+    after = before.copy()
+    after.iat[0, 0] = "C社"
+    assert doc.commit(before, after)
+    assert doc.mirror_to_raw(0, 0, "C社") and doc.raw_df.iat[1, 0] == "C社"
+    assert not doc.commit(doc.current_df.copy(), doc.current_df.copy())  # 変更なしは積まない
+    assert doc.undo() and doc.current_df.iat[0, 0] == "A社"
+    assert doc.redo() and doc.current_df.iat[0, 0] == "C社"
+    assert not doc.redo()
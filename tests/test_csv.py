@@ -0,0 +1,59 @@
+"""CSV / TSV の読み込み：文字コード・区切りの判定と、先頭より後ろの文字コード違い。"""
+import pytest
+
+import aisv_csv
+import aisv_core as core
+
+
+def write_bytes(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.mark.parametrize("enc", ["utf-8", "utf-8-sig", "cp932", "euc_jp"])
+def test_sniff_encoding_and_delimiter(tmp_path, enc):
+    src = write_bytes(tmp_path / "a.csv", "タイトル\nメーカー;商品名\nA社;りんご\n".encode(enc))
+    assert aisv_csv.sniff(src) == (enc, ";")
+    raw = core.read_sheet_raw(src)
+    assert raw.iat[2, 1] == "りんご"
+
+
+def test_tsv_extension_uses_tab(tmp_path):
+    src = write_bytes(tmp_path / "a.tsv", "a,b\tc\n1,2\t3\n".encode("utf-8"))
+    assert aisv_csv.sniff(src)[1] == "\t"
+    assert core.read_sheet_raw(src).iat[1, 0] == "1,2"
+
+
+def test_blank_lines_keep_row_numbers(tmp_path):
+    src = write_bytes(tmp_path / "a.csv", "タイトル\n\nメーカー,商品名\nA社,x\n".encode("utf-8"))
+    raw = core.read_sheet_raw(src)
+    assert raw.shape == (4, 2) and raw.iat[2, 1] == "商品名"
+
+
+def ascii_head_then_cp932(tmp_path):
+    # 先頭 SNIFF_BYTES は ASCII だけ（UTF-8 と判定される）、後ろに CP932 の日本語
+    body = "".join(f"item{i},{i}\n" for i in range(aisv_csv.SNIFF_BYTES // 8))
+    data = ("name,n\n" + body).encode("ascii") + "りんご,1\n".encode("cp932")
+    return write_bytes(tmp_path / "late.csv", data)
+
+
+def test_late_non_utf8_bytes_are_read_strictly(tmp_path):
+    src = ascii_head_then_cp932(tmp_path)
+    assert aisv_csv.sniff(src)[0] == "utf-8"
+    raw = core.read_sheet_raw(src)
+    assert raw.iat[len(raw) - 1, 0] == "りんご"
+    assert aisv_csv.output_format(src, src) == ("cp932", ",")
+
+
+def test_late_non_utf8_bytes_in_iter_text_rows(tmp_path):
+    src = ascii_head_then_cp932(tmp_path)
+    rows = list(aisv_csv.iter_text_rows(src, chunksize=1000))
+    assert rows[0] == ["name", "n"] and rows[-1] == ["りんご", "1"]
+    assert len(rows) == len(core.read_sheet_raw(src))
+
+
+def test_undecodable_file_falls_back_to_replacement(tmp_path):
+    src = write_bytes(tmp_path / "bad.csv", b"a,b\n\x80\x81,\xff\xfe\xfd\n")
+    raw = core.read_sheet_raw(src)
+    assert raw.shape == (2, 2)
+    assert aisv_csv.output_format(src, src)[0] == aisv_csv.DEFAULT_OUTPUT[0]
@@ -0,0 +1,87 @@
+"""表示文字列のキャッシュ：変わっていない列は使い回し、変わった列・並び替え・表示文字数の変更では作り直す。"""
+import pandas as pd
+import pytest
+
+import aisv_core as core
+
+
+def arrow_frame():
+    df = pd.DataFrame({"a": ["x", "長い文字列です"], "b": ["1", "2"]}, dtype="str")
+    if core._array_key(df["a"])[0] is None:
+        pytest.skip("pyarrow の文字列列でない")
+    return df
+
+
+def object_doc():
+    """pyarrow でない列（object 型）の表の文書。"""
+    raw = pd.DataFrame([["メーカー", "商品名"], ["A社", "x"], ["B社", "y"]], dtype=object)
+    doc = core.SearchDocument(raw, header_row=1)
+    doc.set_table(doc.current_df.astype(object))
+    assert core._array_key(doc.current_df["商品名"])[0] is None
+    return doc
+
+
+def test_display_cache_reuses_unchanged_columns():
+    df = arrow_frame()
+    cache = core.DisplayCache()
+    first = cache.columns(df)
+    again = cache.columns(df.copy())
+    assert again[0] is first[0] and again[1] is first[1]
+
+    edited = df.copy()
+    edited.iat[0, 1] = "9"
+    cols = cache.columns(edited)
+    assert cols[0] is first[0]
+    assert cols[1] is not first[1] and cols[1].tolist() == ["9", "2"]
+
+
+def test_display_cache_rebuilds_on_sort_limit_and_links():
+    df = arrow_frame()
+    cache = core.DisplayCache()
+    first = cache.columns(df)
+    assert cache.columns(core.sort_table(df, "b", ascending=False))[0] is not first[0]
+
+    cache.limit = 2
+    assert cache.columns(df)[0].tolist() == ["x", "長い" + core.ELLIPSIS]
+
+    linked = core.apply_search_columns(df, ["a"], generate_google=False)
+    labels = cache.columns(linked)[list(linked.columns).index(core.AI_COL)]
+    assert labels.tolist() == [core.AI_COL, core.AI_COL]
+
+
+def test_object_columns_reused_by_version():
+    doc = object_doc()
+    cache = core.DisplayCache()
+    first = cache.columns(doc.current_df, doc.column_versions)
+    # 版番号が無ければ毎回作る
+    assert cache.columns(doc.current_df)[0] is not first[0]
+
+    first = cache.columns(doc.current_df, doc.column_versions)
+    before = doc.current_df.copy()
+    after = before.copy()
+    after.iat[0, 1] = "z"
+    assert doc.commit(before, after)
+    cols = cache.columns(doc.current_df, doc.column_versions)
+    assert cols[0] is first[0]
+    assert cols[1] is not first[1] and cols[1].tolist() == ["z", "y"]
+
+
+def test_object_column_versions_follow_sort_and_undo():
+    doc = object_doc()
+    cache = core.DisplayCache()
+    v0 = list(doc.column_versions)
+
+    after = doc.current_df.rename(columns={"メーカー": "maker"})
+    assert doc.commit(doc.current_df.copy(), after)
+    assert doc.column_versions == v0  # 列名を変えただけなら中身は同じ
+
+    doc.sort("商品名", ascending=False)
+    sorted_versions = list(doc.column_versions)
+    assert not set(sorted_versions) & set(v0)
+    assert cache.columns(doc.current_df, doc.column_versions)[1].tolist() == ["y", "x"]
+
+    assert doc.undo()
+    assert doc.column_versions == v0
+    assert cache.columns(doc.current_df, doc.column_versions)[1].tolist() == ["x", "y"]
+    assert doc.redo()  # 並び替えは Undo 対象外なので、並び替えた後の表に戻る
+    assert doc.column_versions == sorted_versions
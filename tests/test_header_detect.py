@@ -0,0 +1,29 @@
+"""見出し行の自動判定：タイトル行・空行の下の見出し、検索語句列の推定。"""
+import pandas as pd
+
+import aisv_core as core
+
+
+def test_detect_header_row_below_title_and_blank_rows():
+    raw = pd.DataFrame([
+        ["商品リスト 2024年版", None, None],
+        [None, None, None],
+        ["メーカー", "商品名", "価格"],
+        ["A社", "りんご", "120"],
+        ["B社", "みかん", "80"],
+        ["A社", "ぶどう", "300"],
+    ])
+    assert core.detect_header_row(raw) == 3
+    assert core.sniff_layout(raw) == (3, 2)
+
+
+def test_detect_header_row_first_row_and_empty():
+    raw = pd.DataFrame([["id", "name"], ["1", "x"], ["2", "y"]])
+    assert core.detect_header_row(raw) == 1
+    assert core.detect_header_row(pd.DataFrame(), default=4) == 4
+
+
+def test_guess_keyword_column_skips_numbers_and_links():
+    df = pd.DataFrame({"価格": ["120", "80"], "商品名": ["りんご 大", "みかん"], core.AI_COL: ["x", "y"]})
+    assert core.guess_keyword_column(df) == "商品名"
+    assert core.guess_keyword_column(pd.DataFrame()) is None
@@ -0,0 +1,80 @@
+"""編集ジャーナル：記録した操作を読み直した文書に再適用すると、編集していた文書と同じになる。"""
+import aisv_core as core
+import aisv_journal
+
+
+SOURCE = ["タイトル", "メーカー,商品名,価格", "A社,りんご,120", "B社,みかん,80", "C社,ぶどう,300"]
+
+
+def edit_and_record(doc, journal):
+    """GUI と同じく、確定した操作を doc に適用してジャーナルにも書く。"""
+    records = [
+        {"op": "pre", "r": 0, "c": 0, "v": "新しいタイトル"},
+        {"op": "cell", "r": 1, "c": 1, "v": "みかん 大"},
+        {"op": "links", "base_cols": ["メーカー", "商品名"], "joiner": " ", "insert_mode": "rightmost",
+         "generate_google": False},
+        {"op": "sort", "col": "価格", "asc": False},
+        {"op": "add_col", "name": "新規列_5"},
+        {"op": "bulk", "col": "新規列_5", "formula": "=C{ROW}*2"},
+        {"op": "add_row"},
+        {"op": "rename", "old": "メーカー", "new": "製造元"},
+        {"op": "undo"},
+        {"op": "undo"},
+        {"op": "redo"},
+    ]
+    for rec in records:
+        aisv_journal.apply_record(doc, rec)
+        fields = {k: v for k, v in rec.items() if k != "op"}
+        journal.append(rec["op"], **fields)
+    return records
+
+
+def test_replay_matches_live_document(tmp_path, write_csv):
+    src = write_csv(tmp_path / "a.csv", SOURCE)
+    live = core.SearchDocument.from_file(src, header_row=2)
+    journal = aisv_journal.EditJournal(str(tmp_path / "journal"))
+    journal.begin(src, live.source_sig, live.header_row)
+    records = edit_and_record(live, journal)
+    journal.close()  # 閉じても消さない（異常終了の代わり）
+
+    pending = aisv_journal.pending_journals(str(tmp_path / "journal"))
+    assert len(pending) == 1
+    _, header, got = pending[0]
+    assert header["path"].endswith("a.csv") and header["header_row"] == 2
+    assert got == records
+
+    doc = core.SearchDocument.from_file(header["path"], header_row=header["header_row"])
+    assert aisv_journal.replay(doc, got) == len(got)
+    assert doc.current_df.equals(live.current_df)
+    assert doc.links == live.links
+    assert doc.compose_output().equals(live.compose_output())
+    assert doc.compose_output().iat[0, 0] == "新しいタイトル"
+
+
+def test_truncated_last_line_is_ignored(tmp_path, write_csv):
+    src = write_csv(tmp_path / "a.csv", SOURCE)
+    journal = aisv_journal.EditJournal(str(tmp_path / "journal"))
+    journal.begin(src, core.file_signature(src), 2)
+    journal.append("add_row")
+    journal.append("add_col", name="x")
+    path = journal.path
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"op": "cell", "r": 0')  # 書きかけ
+    header, records = aisv_journal.read_journal(path)
+    assert header["op"] == "open"
+    assert [r["op"] for r in records] == ["add_row", "add_col"]
+
+
+def test_reset_and_discard(tmp_path, write_csv):
+    src = write_csv(tmp_path / "a.csv", SOURCE)
+    folder = str(tmp_path / "journal")
+    journal = aisv_journal.EditJournal(folder)
+    journal.begin(src, core.file_signature(src), 2)
+    journal.append("add_row")
+    journal.reset()
+    assert aisv_journal.pending_journals(folder) == []
+    journal.append("add_row")
+    assert len(aisv_journal.pending_journals(folder)) == 1
+    journal.close(discard=True)
+    assert aisv_journal.pending_journals(folder) == []
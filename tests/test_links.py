@@ -0,0 +1,147 @@
+"""リンク列のテンプレートは SearchDocument.links が正：表を差し替えるどの操作でも残る。"""
+import pandas as pd
+import pytest
+
+import aisv_core as core
+import aisv_journal
+import aisv_session
+
+AI_TPL = "https://ai.example/?q={q}"
+
+
+def make_doc():
+    raw = pd.DataFrame([["タイトル", None], ["メーカー", "商品名"], ["A社", "x"], ["B社", "y"]])
+    doc = core.SearchDocument(raw, header_row=2)
+    after = doc.with_search_columns(["商品名"], ai_template=AI_TPL)
+    doc.commit(doc.current_df.copy(), after, links=core.link_templates(after))
+    return doc
+
+
+def expected_links():
+    return {core.AI_COL: AI_TPL, core.GOOGLE_COL: core.DEFAULT_GOOGLE_TEMPLATE}
+
+
+def assert_links_kept(doc):
+    assert doc.links == expected_links()
+    # 表示・保存は表の attrs を見るので、写しも揃っていること
+    assert core.link_templates(doc.current_df) == expected_links()
+    out = doc.compose_output()
+    col = list(doc.current_df.columns).index(core.AI_COL)
+    assert str(out.iat[2, col]).startswith("=HYPERLINK(")
+
+
+def test_commit_sets_links():
+    assert_links_kept(make_doc())
+
+
+@pytest.mark.parametrize("op", ["add_row", "add_col", "rename", "cell", "bulk"])
+def test_links_survive_edits(op):
+    doc = make_doc()
+    cur = doc.current_df
+    if op == "add_row":
+        # 表の attrs を持たない行との concat（attrs が落ちる）
+        extra = pd.DataFrame([[""] * len(cur.columns)], columns=cur.columns)
+        after = pd.concat([cur, extra], ignore_index=True)
+        assert core.LINKS_ATTR not in after.attrs
+    elif op == "add_col":
+        after = cur.copy()
+        after["新規列_5"] = ""
+    elif op == "rename":
+        after = cur.rename(columns={"メーカー": "maker"})
+    elif op == "cell":
+        after = cur.copy()
+        after.iat[0, 0] = "C社"
+    else:
+        after = cur.copy()
+        after["メーカー"] = core.formula_column("=1", len(cur))
+    after.attrs.clear()
+    assert doc.commit(cur.copy(), after)
+    assert_links_kept(doc)
+
+
+def test_links_survive_sort():
+    doc = make_doc()
+    doc.sort("商品名", ascending=False)
+    assert_links_kept(doc)
+
+
+def test_rename_of_link_column_drops_template():
+    doc = make_doc()
+    doc.commit(doc.current_df.copy(), doc.current_df.rename(columns={core.AI_COL: "メモ"}))
+    assert doc.links == {core.GOOGLE_COL: core.DEFAULT_GOOGLE_TEMPLATE}
+
+
+def test_undo_redo_restores_links():
+    doc = make_doc()
+    cur = doc.current_df
+    extra = pd.DataFrame([[""] * len(cur.columns)], columns=cur.columns)
+    doc.commit(cur.copy(), pd.concat([cur, extra], ignore_index=True))
+    assert doc.undo()
+    assert_links_kept(doc)
+    assert doc.undo()
+    assert doc.links == {} and core.LINK_COLS[0] not in doc.current_df.columns
+    assert doc.redo()
+    assert_links_kept(doc)
+    assert doc.redo()
+    assert_links_kept(doc)
+    assert len(doc.current_df) == 3
+
+
+def test_template_only_change_is_undoable():
+    doc = make_doc()
+    after = doc.with_search_columns(["商品名"], ai_template="https://other/?q={q}")
+    assert doc.commit(doc.current_df.copy(), after, links=core.link_templates(after))
+    assert doc.links[core.AI_COL] == "https://other/?q={q}"
+    assert doc.undo()
+    assert_links_kept(doc)
+
+
+def test_journal_replay_keeps_links():
+    raw = pd.DataFrame([["タイトル", None], ["メーカー", "商品名"], ["A社", "x"], ["B社", "y"]])
+    doc = core.SearchDocument(raw, header_row=2)
+    records = [
+        {"op": "links", "base_cols": ["商品名"], "ai_template": AI_TPL},
+        {"op": "add_row"},
+        {"op": "add_col", "name": "新規列_5"},
+        {"op": "rename", "old": "メーカー", "new": "maker"},
+        {"op": "sort", "col": "商品名", "asc": False},
+        {"op": "undo"},
+        {"op": "redo"},
+    ]
+    assert aisv_journal.replay(doc, records) == len(records)
+    assert_links_kept(doc)
+
+
+def test_session_restore_keeps_links(tmp_path):
+    src = tmp_path / "a.csv"
+    src.write_text("タイトル\nメーカー,商品名\nA社,x\nB社,y\n", encoding="utf-8")
+    doc = core.SearchDocument.from_file(str(src), header_row=2)
+    after = doc.with_search_columns(["商品名"], ai_template=AI_TPL)
+    doc.commit(doc.current_df.copy(), after, links=core.link_templates(after))
+    snap = str(tmp_path / "s.pkl")
+    assert aisv_session.save_snapshot(snap, doc)
+
+    payload = aisv_session.load_snapshot(snap, str(src))
+    restored = core.SearchDocument()
+    aisv_session.restore_doc(restored, payload["doc"])
+    assert_links_kept(restored)
+
+    # links を持つ前のスナップショットは表の attrs から拾う
+    legacy = dict(payload["doc"])
+    del legacy["links"]
+    old = core.SearchDocument()
+    aisv_session.restore_doc(old, legacy)
+    assert_links_kept(old)
+
+
+def test_compose_output_raw_keeps_title_rows_and_inserts_links():
+    raw = pd.DataFrame([["タイトル", None, None], ["メーカー", "商品名", "価格"], ["A社", "x", "10"], ["B社", "y", "9"]])
+    doc = core.SearchDocument(raw, header_row=2)
+    after = doc.with_search_columns(["商品名"], insert_mode="after_base", generate_google=False, ai_template=AI_TPL)
+    doc.commit(doc.current_df.copy(), after, links=core.link_templates(after))
+    assert core.compose_output_raw(raw, doc.current_df, 2).values.tolist() == [
+        ["タイトル", "", "", ""],
+        ["メーカー", "商品名", core.AI_COL, "価格"],
+        ["A社", "x", f'=HYPERLINK("https://ai.example/?q=x","{core.AI_COL}")', "10"],
+        ["B社", "y", f'=HYPERLINK("https://ai.example/?q=y","{core.AI_COL}")', "9"],
+    ]
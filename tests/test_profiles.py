@@ -0,0 +1,48 @@
+"""読み込みプロファイル：ファイル別の記録は見出しが同じときだけ使う。"""
+import aisv_core as core
+import aisv_profiles
+
+
+SETTINGS = {"header_row": 2, "base_col_names": ["商品名"], "base_joiner": " "}
+
+
+def test_file_profile_found_when_header_unchanged(tmp_path, write_csv):
+    src = write_csv(tmp_path / "a.csv", ["タイトル", "メーカー,商品名", "A社,x"])
+    store = aisv_profiles.ProfileStore(str(tmp_path / "p.json"))
+    store.remember(src, core.read_sheet_raw(src), SETTINGS)
+    prof = store.find(src)
+    assert prof is not None and prof["match"] == "file" and prof["header_row"] == 2
+
+
+def test_file_profile_ignored_after_layout_change(tmp_path, write_csv):
+    src = write_csv(tmp_path / "a.csv", ["タイトル", "メーカー,商品名", "A社,x"])
+    store = aisv_profiles.ProfileStore(str(tmp_path / "p.json"))
+    store.remember(src, core.read_sheet_raw(src), SETTINGS)
+    # 同じパスに見出しの違うファイルを置く
+    write_csv(tmp_path / "a.csv", ["品番,品名,価格", "1,y,100"])
+    assert store.find(src) is None
+
+
+def test_file_profile_with_usecols(tmp_path, write_csv):
+    src = write_csv(tmp_path / "a.csv", ["タイトル", "メーカー,備考,商品名", "A社,-,x"])
+    store = aisv_profiles.ProfileStore(str(tmp_path / "p.json"))
+    projected = core.read_sheet_raw(src, usecols=[0, 2])
+    store.remember(src, projected, dict(SETTINGS, usecols=[0, 2]))
+    prof = store.find(src)
+    assert prof is not None and prof["match"] == "file" and prof["usecols"] == [0, 2]
+
+
+def test_legacy_file_profile_without_signature_is_not_used(tmp_path, write_csv):
+    src = write_csv(tmp_path / "a.csv", ["タイトル", "メーカー,商品名", "A社,x"])
+    store = aisv_profiles.ProfileStore(str(tmp_path / "p.json"))
+    store.files[aisv_profiles._file_key(src)] = dict(SETTINGS)
+    assert store.find(src) is None
+
+
+def test_template_profile_for_other_file_with_same_header(tmp_path, write_csv):
+    a = write_csv(tmp_path / "a.csv", ["タイトル", "メーカー,商品名", "A社,x"])
+    b = write_csv(tmp_path / "b.csv", ["別のタイトル", "メーカー,商品名", "B社,y"])
+    store = aisv_profiles.ProfileStore(str(tmp_path / "p.json"))
+    store.remember(a, core.read_sheet_raw(a), SETTINGS)
+    prof = store.find(b)
+    assert prof is not None and prof["match"] == "template"
@@ -0,0 +1,51 @@
+"""列を絞った読み込み：保存では読み込まなかった列を元ファイルから元の位置・元の行に戻す。"""
+import pytest
+
+import aisv_core as core
+
+SOURCE = ["タイトル", "メーカー,備考,商品名,価格", "A社,a,x,10", "B社,b,y,9"]
+
+
+def test_load_reads_only_selected_columns(tmp_path, write_csv):
+    doc = core.SearchDocument()
+    doc.load(write_csv(tmp_path / "p.csv", SOURCE), 2, usecols=[2, 0])
+    assert doc.usecols == [0, 2] and doc.projected
+    assert list(doc.current_df.columns) == ["メーカー", "商品名"]
+
+
+def test_projected_output_restores_unread_columns_after_sort(tmp_path, write_csv):
+    doc = core.SearchDocument()
+    doc.load(write_csv(tmp_path / "p.csv", SOURCE), 2, usecols=[0, 2])
+    after = doc.with_search_columns(["商品名"], insert_mode="after_base", generate_google=False)
+    doc.commit(doc.current_df.copy(), after, links=core.link_templates(after))
+    doc.sort("商品名", ascending=False)
+    link = '=HYPERLINK("https://www.perplexity.ai/search?q={}","AI検索")'
+    assert doc.compose_output().values.tolist() == [
+        ["タイトル", "", "", "", ""],
+        ["メーカー", "備考", "商品名", "AI検索", "価格"],
+        ["B社", "b", "y", link.format("y"), "9"],
+        ["A社", "a", "x", link.format("x"), "10"],
+    ]
+
+
+def test_projected_output_keeps_renamed_and_added_columns(tmp_path, write_csv):
+    doc = core.SearchDocument()
+    doc.load(write_csv(tmp_path / "p.csv", SOURCE), 2, usecols=[0, 2])
+    after = doc.current_df.rename(columns={"商品名": "品名"})
+    after["メモ"] = ["m1", "m2"]
+    doc.commit(doc.current_df.copy(), after)
+    assert doc.compose_output().values.tolist() == [
+        ["タイトル", "", "", "", ""],
+        ["メーカー", "備考", "品名", "メモ", "価格"],
+        ["A社", "a", "x", "m1", "10"],
+        ["B社", "b", "y", "m2", "9"],
+    ]
+
+
+def test_projected_output_needs_source_file(tmp_path, write_csv):
+    src = write_csv(tmp_path / "p.csv", ["a,b,c", "1,2,3"])
+    doc = core.SearchDocument()
+    doc.load(src, 1, usecols=[0])
+    (tmp_path / "p.csv").unlink()
+    with pytest.raises(FileNotFoundError):
+        doc.compose_output()
@@ -0,0 +1,146 @@
+"""大容量モード（SQLite）の取り込み・保存が pandas の経路（build_table_from_raw / compose_output_raw）と同じになること。"""
+import pandas as pd
+import pytest
+
+import aisv_core as core
+import aisv_sqlstore
+
+
+def raw_frame(rows):
+    """read_sheet_raw と同じ形（header=None・空欄は NaN）。"""
+    width = max(len(r) for r in rows)
+    return pd.DataFrame([[v if v != "" else None for v in r] + [None] * (width - len(r)) for r in rows])
+
+
+def pandas_table(rows, header_row):
+    raw = raw_frame(rows)
+    df, _ = core.build_table_from_raw(raw, header_row)
+    return raw, df
+
+
+@pytest.fixture
+def import_store(tmp_path):
+    opened = []
+
+    def _import(rows, header_row, **kw):
+        st = aisv_sqlstore.SqliteSheet.import_rows(
+            str(tmp_path / f"s{len(opened)}.db"), rows, header_row=header_row,
+            source=str(tmp_path / "src.xlsx"), **kw)
+        opened.append(st)
+        return st
+
+    yield _import
+    for st in opened:
+        st.close(discard=True)
+
+
+# (行, 見出し行)。列数の揃っていない行・途中の空行を含む
+RAGGED = [
+    ([["title"], ["a", "b"], ["1", "2", "3", "4"]], 2),
+    ([["タイトル", "", "注記"], [], ["メーカー", "商品名"], ["A社", "x"], [], ["B社", "y", "", "", "z"], ["C社"]], 3),
+    ([["h1", "h2", "h3"], ["1"], ["2", "", "3"]], 1),
+]
+
+
+@pytest.mark.parametrize("rows,header_row", RAGGED)
+@pytest.mark.parametrize("batch", [1, 1000])
+def test_import_matches_pandas_table(import_store, rows, header_row, batch):
+    raw, df = pandas_table(rows, header_row)
+    st = import_store(rows, header_row, batch=batch)
+    assert st.columns == list(df.columns)
+    got = [vals for _, vals in st.window(0, len(df) + 10)]
+    assert got == df.values.tolist()
+
+
+@pytest.mark.parametrize("rows,header_row", RAGGED)
+def test_output_rows_match_compose_output_raw(import_store, rows, header_row):
+    raw, df = pandas_table(rows, header_row)
+    st = import_store(rows, header_row)
+    expected = core.compose_output_raw(raw, df, header_row).values.tolist()
+    assert list(st.iter_output_rows()) == expected
+
+
+def test_row_wider_than_header_does_not_fail(import_store):
+    st = import_store([["title"], ["a", "b"], ["1", "2", "3", "4"]], 2)
+    assert st.columns == ["a", "b", "列C", "列D"]
+    assert st.meta["width"] == 4
+    assert st.window(0, 1) == [(0, ["1", "2", "3", "4"])]
+
+
+LINKS = {"base_cols": ["商品名"], "joiner": " ", "generate_ai": True, "generate_google": True,
+         "ai_template": core.DEFAULT_AI_TEMPLATE, "google_template": core.DEFAULT_GOOGLE_TEMPLATE,
+         "insert_mode": "after_base", "anchor_col": "商品名"}
+
+
+def edited_pair(import_store, rows, header_row):
+    """同じ編集（セル編集・リンク列・並び替え・列/行の追加・列名変更）をした SearchDocument と SqliteSheet。"""
+    raw, _ = pandas_table(rows, header_row)
+    doc = core.SearchDocument(raw, header_row=header_row)
+    st = import_store(rows, header_row)
+
+    before = doc.current_df.copy()
+    after = before.copy()
+    after.iat[1, 1] = "編集 後"
+    doc.commit(before, after)
+    doc.mirror_to_raw(1, 1, "編集 後")
+    st.set_cell(1, "商品名", "編集 後")
+
+    params = {k: v for k, v in LINKS.items() if k != "base_cols"}
+    linked = doc.with_search_columns(LINKS["base_cols"], **params)
+    doc.commit(doc.current_df.copy(), linked, links=core.link_templates(linked))
+    st.set_links(LINKS)
+
+    doc.sort("価格", ascending=False)
+    st.sort("価格", ascending=False)
+
+    after = doc.current_df.copy()
+    after["新規列"] = ""
+    doc.commit(doc.current_df.copy(), after)
+    st.add_column("新規列")
+
+    after = doc.current_df.copy()
+    after.loc[len(after)] = [""] * len(after.columns)
+    doc.commit(doc.current_df.copy(), after)
+    st.add_row()
+
+    doc.commit(doc.current_df.copy(), doc.current_df.rename(columns={"メーカー": "製造元"}))
+    st.rename_column("メーカー", "製造元")
+    return doc, st
+
+
+SHOP = [["商品一覧", "", "2024"], [], ["メーカー", "商品名", "価格"],
+        ["A社", "りんご", "120"], ["B社", "みかん 大", "80"], ["C社", "", "1000"], ["D社", "ぶどう"]]
+
+
+def test_edited_output_matches_pandas_path(import_store):
+    doc, st = edited_pair(import_store, SHOP, 3)
+    assert st.display_columns() == list(doc.current_df.columns)
+    assert list(st.iter_output_rows()) == doc.compose_output().values.tolist()
+
+
+@pytest.mark.parametrize("ext", ["csv", "xlsx"])
+def test_saved_file_matches_pandas_path(import_store, tmp_path, ext):
+    doc, st = edited_pair(import_store, SHOP, 3)
+    a, b = str(tmp_path / f"doc.{ext}"), str(tmp_path / f"store.{ext}")
+    core.write_output(doc.compose_output(), a)
+    st.save(b)
+    if ext == "csv":
+        with open(a, "rb") as fa, open(b, "rb") as fb:
+            assert fa.read() == fb.read()
+    else:
+        assert core.read_sheet_raw(a).fillna("").values.tolist() == core.read_sheet_raw(b).fillna("").values.tolist()
+
+
+def test_link_cells_show_label_and_open_url(import_store):
+    st = import_store(SHOP, 3)
+    st.set_links(LINKS)
+    disp = st.display_columns()
+    ai, google = disp.index(core.AI_COL), disp.index(core.GOOGLE_COL)
+    # 表示・列幅用の行は列名だけ（語句が空の行は空欄）。式は保存する行にだけ作る
+    rows = [vals for _, vals in st.window(0, 10)]
+    assert [r[ai] for r in rows] == [core.AI_COL, core.AI_COL, "", core.AI_COL]
+    assert all(r[ai] in (core.AI_COL, "") for r in st.sample(10))
+    saved = list(st.iter_output_rows())[3:]
+    assert saved[1][google] == core.make_hyperlink_formula("みかん 大", LINKS["google_template"], core.GOOGLE_COL)
+    assert st.cell_url(1, core.AI_COL) == core.link_url("みかん 大", LINKS["ai_template"])
+    assert st.cell_url(2, core.AI_COL) is None and st.cell_url(1, "商品名") is None
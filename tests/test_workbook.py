@@ -0,0 +1,67 @@
+"""複数シートのブック：置き換えたシート以外は残し、失われるものは保存前に分かる。"""
+import zipfile
+
+import openpyxl
+import pytest
+from openpyxl.comments import Comment
+from openpyxl.styles import Font
+from openpyxl.worksheet.table import Table
+
+import aisv_workbook
+
+
+@pytest.fixture
+def book(tmp_path):
+    wb = openpyxl.Workbook()
+    plain = wb.active
+    plain.title = "値だけ"
+    for row in [["h1", "h2"], ["1", "2"]]:
+        plain.append(row)
+    rich = wb.create_sheet("飾り")
+    for row in [["n", "m"], ["x", "y"]]:
+        rich.append(row)
+    rich["A1"].comment = Comment("メモ", "me")
+    rich["B1"].font = Font(bold=True)
+    rich["A2"].hyperlink = "https://example.com/"
+    rich.merge_cells("C1:D1")
+    rich.add_table(Table(displayName="T1", ref="A1:B2"))
+    path = str(tmp_path / "book.xlsx")
+    wb.save(path)
+    return path
+
+
+def test_sheet_extras_lists_what_is_lost(book):
+    extras = aisv_workbook.sheet_extras(book, ["値だけ", "飾り", "無いシート"])
+    assert list(extras) == ["飾り"]
+    assert {"コメント", "テーブル", "ハイパーリンク", "書式", "セルの結合"} <= set(extras["飾り"])
+
+
+def test_sheet_extras_unreadable_file(tmp_path):
+    path = tmp_path / "x.xlsx"
+    path.write_bytes(b"not a zip")
+    assert aisv_workbook.sheet_extras(str(path), ["Sheet1"]) == {}
+
+
+def test_write_workbook_keeps_other_sheets(book, tmp_path):
+    dst = str(tmp_path / "out.xlsx")
+    n = aisv_workbook.write_workbook(book, dst, {"値だけ": [["h1", "h2", "AI検索"], ["1", "2", "=1+1"]]})
+    assert n == 2
+    assert aisv_workbook.sheet_names(dst) == ["値だけ", "飾り"]
+    with zipfile.ZipFile(book) as zin, zipfile.ZipFile(dst) as zout:
+        parts = dict(aisv_workbook.sheet_parts(zin))
+        replaced = parts["値だけ"]
+        for name in zin.namelist():
+            if name not in (replaced, "xl/workbook.xml"):
+                assert zout.read(name) == zin.read(name), name
+    wb = openpyxl.load_workbook(dst)
+    rows = [[c.value for c in row] for row in wb["値だけ"].iter_rows()]
+    assert rows == [["h1", "h2", "AI検索"], ["1", "2", "=1+1"]]
+    assert wb["飾り"]["A1"].comment.text == "メモ" and wb["飾り"].tables["T1"].ref == "A1:B2"
+
+
+def test_write_workbook_in_place_and_missing_sheet(book):
+    with pytest.raises(ValueError):
+        aisv_workbook.write_workbook(book, book, {"無いシート": []})
+    aisv_workbook.write_workbook(book, book, {"飾り": [["n"], ["x"]]})
+    assert aisv_workbook.sheet_names(book) == ["値だけ", "飾り"]
+    assert aisv_workbook.sheet_extras(book, ["飾り"]) == {}